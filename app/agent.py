@@ -6,126 +6,684 @@ Date: 2026-04-17
 """
 
 import os
+import hashlib
 import json
 import re
-from typing import Iterator
+import asyncio
+import time
+from functools import partial
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
 from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
-try:
-    from anthropic import Anthropic
-except ImportError:
-    Anthropic = None
-
-from tools import (
-    load_profile,
-    get_profile_as_yaml_string,
-    append_lead_to_sheet,
-    simulate_lead_logging
+from tools import simulate_lead_logging
+from budget import (
+    INPUT_BUDGET_POLICY, INPUT_TOKEN_BUDGET, USER_MESSAGE_TOKEN_LIMIT, InputBudgetExceeded,
+    Preflight, get_estimator, trim_text, validate_policy,
 )
-from prompts import build_system_prompt
+from leads import DEFAULT_LEAD_PROFILE, get_lead_index, get_lead_sink
+from registry import get_compiled_profile
+from client import get_shared_client, get_shared_async_client
+from history import HistoryCompactor, extractive_summary, format_transcript, message_text
+from prompts import HISTORY_SUMMARY_PROMPT, build_history_summary_request
+from retrieval import PROFILE_RETRIEVAL, get_retriever
+from scheduler import PRIORITY_ACTIVE, PRIORITY_BACKGROUND, PRIORITY_NEW, QueueTimeout, get_scheduler
+from singleflight import SINGLE_FLIGHT_ENABLED, conversation_key, get_flight_group
+from tracing import current_span, span, traced
 
 
 MODEL_ID = "claude-sonnet-4-5-20250929"
 MAX_TOKENS = 1024
+SUMMARY_MODEL_ID = os.getenv('SUMMARY_MODEL_ID', MODEL_ID)
+SUMMARY_MAX_TOKENS = 300
+# the API allows 4 cache_control breakpoints per request; the system prompt uses one
+HISTORY_CACHE_BREAKPOINTS = 2
+# shortest prefix the model will cache (Sonnet); a shorter cache_control block is ignored
+MIN_CACHEABLE_TOKENS = 1024
+NOT_CONFIGURED_MESSAGE = "Error: Claude API not configured. Set ANTHROPIC_API_KEY in .env file."
+# callables invoked with (agent, usage dict) after every completed turn
+USAGE_LISTENERS = []
+# callables invoked with (agent, turn metrics dict) once a turn is fully finalized
+METRICS_LISTENERS = []
+LEAD_LOG_MARKER = "[[LEAD_LOG]]"
 LEAD_LOG_PATTERN = re.compile(r"\[\[LEAD_LOG\]\]\s*(\{.*?\})\s*$", re.DOTALL)
 
 
+class LeadLogScanner:
+    """Incremental scanner that withholds the [[LEAD_LOG]] tag from a text stream.
+
+    Each delta is inspected once: text that cannot be part of the marker is
+    released immediately, and only a suffix that could still start the marker
+    (at most len(marker) - 1 characters) is held back. Cost per delta is
+    proportional to the delta, not to the response so far.
+    """
+
+    def __init__(self, marker: str = LEAD_LOG_MARKER):
+        self.marker = marker
+        self.marker_seen = False
+        self._chunks = []
+        self._pending = ""
+
+    def feed(self, delta: str) -> str:
+        """Consume one delta and return the text that is safe to show now."""
+        self._chunks.append(delta)
+        if self.marker_seen:
+            return ""
+
+        text = self._pending + delta
+        index = text.find(self.marker)
+        if index != -1:
+            self.marker_seen = True
+            self._pending = ""
+            return text[:index]
+
+        held = self._partial_marker_length(text)
+        self._pending = text[len(text) - held:] if held else ""
+        return text[:len(text) - held]
+
+    def flush(self) -> str:
+        """Release held-back characters once the stream has ended."""
+        pending, self._pending = self._pending, ""
+        return "" if self.marker_seen else pending
+
+    def text(self) -> str:
+        """Full raw text seen so far, marker and tail included."""
+        return "".join(self._chunks)
+
+    def _partial_marker_length(self, text: str) -> int:
+        """Length of the longest suffix of text that is a proper prefix of the marker."""
+        for length in range(min(len(text), len(self.marker) - 1), 0, -1):
+            if text.endswith(self.marker[:length]):
+                return length
+        return 0
+
+
+def usage_to_dict(usage) -> dict:
+    """Flatten an SDK Usage object into plain token counts (missing fields -> 0)."""
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+    }
+
+
+class TurnStream:
+    """One turn's upstream stream, shared by chat_stream and achat_stream.
+
+    Filters deltas through a LeadLogScanner and marks the first token on the
+    upstream span; the sync and async paths only differ in how they iterate.
+    """
+
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.scanner = LeadLogScanner()
+        self.first_token_at = None
+
+    def feed(self, delta: str) -> str:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            self.upstream.add_event("first_token")
+        return self.scanner.feed(delta)
+
+    def flush(self) -> str:
+        return self.scanner.flush()
+
+    def text(self) -> str:
+        return self.scanner.text()
+
+
+def _with_cache_control(message: dict) -> dict:
+    """Copy of a message whose last content block carries an ephemeral cache breakpoint."""
+    content = message["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = [dict(block) for block in content]
+    blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    return {"role": message["role"], "content": blocks}
+
+
 class AgenticProfileAgent:
     """Interactive AI agent representing a professional profile."""
 
-    def __init__(self, profile_path: str = "profile.yaml"):
+    def __init__(self, profile_path: str = "profile.yaml", retrieval: str = PROFILE_RETRIEVAL,
+                 profile_slug: str = DEFAULT_LEAD_PROFILE):
         self.profile_path = profile_path
-        self.profile = load_profile(profile_path)
-        self.profile_yaml = get_profile_as_yaml_string(profile_path)
-        self.name = self.profile.get('name', 'Unknown')
+        # catalog slug: scopes lead dedupe and tags lead rows/emails
+        self.profile_slug = profile_slug
+        # shared, read-only across sessions — see registry.py
+        self.compiled = get_compiled_profile(profile_path)
+        if self.compiled.over_budget:
+            # the full prompt would blow the budget; retrieval never sends it
+            retrieval = 'bm25'
+        self.profile = self.compiled.profile
+        self.profile_yaml = self.compiled.profile_yaml
+        self.name = self.compiled.name
+        self.system_prompt = self.compiled.system_prompt
+        # retrieval mode: cache only the core header, add top-k sections per turn
+        self.retriever = None
+        self.retrieved = []
+        if retrieval == 'bm25':
+            self.retriever = get_retriever(self.compiled)
+            self.system_prompt = self.retriever.system_prompt
+        self.prompt_hash = self._prompt_hash()
 
-        self.system_prompt = build_system_prompt(self.profile_yaml, self.name)
-
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if not api_key or Anthropic is None:
-            self.client = None
-        else:
-            self.client = Anthropic(api_key=api_key)
+        # one pooled client per process, so new sessions start on warm connections
+        self.client = get_shared_client()
+        # async twin is resolved per event loop on first use unless injected
+        self.async_client = None
 
         self.history = []
+        # bumped whenever a turn lands in history; a turn that failed or was rejected never does
+        self.turns_committed = 0
+        # older turns are folded into a summary off the critical path
+        self.compactor = HistoryCompactor(summarize=self._summarize_history)
+        # token usage per completed turn, including prompt-cache reads/writes
+        self.turn_usage = []
+        # timings + usage per completed turn (see _record_metrics)
+        self.turn_metrics = []
+        self._turn_started = None
+        self._lead_seconds = 0.0
+        # pre-flight input budget (see budget.py); the estimator is shared per process
+        self.estimator = get_estimator()
+        self.input_budget = INPUT_TOKEN_BUDGET
+        self.user_message_limit = USER_MESSAGE_TOKEN_LIMIT
+        self.budget_policy = validate_policy(INPUT_BUDGET_POLICY)
+        self._request_raw_tokens = 0
+        # the retrieval-mode core header alone can be too short to cache; history breakpoints
+        # then cache it together with the conversation instead
+        self.cache_system_prompt = self.estimator.estimate(self.system_prompt) >= MIN_CACHEABLE_TOKENS
+        # identical concurrent first turns share one upstream stream (see singleflight.py)
+        self.single_flight = SINGLE_FLIGHT_ENABLED
+        self.flights = get_flight_group()
+        # every upstream call waits its turn in the process-wide scheduler (see scheduler.py);
+        # on_queue(position, eta seconds) is called while this session's turn is waiting
+        self.scheduler = get_scheduler()
+        self.on_queue = None
+        self._admission = None
+        self._queue_seconds = 0.0
         self.sheets_configured = bool(os.getenv('GOOGLE_SHEETS_ID'))
 
     def _system_blocks(self):
-        """System prompt packaged for prompt caching (ephemeral cache)."""
-        return [
-            {
-                "type": "text",
-                "text": self.system_prompt,
-                "cache_control": {"type": "ephemeral"},
-            }
-        ]
+        """System prompt packaged for prompt caching (ephemeral cache).
 
-    def chat(self, user_message: str) -> str:
-        """Non-streaming chat — used by example-question buttons."""
+        A rolling summary of compacted turns, when present, follows the cached
+        block so it never invalidates the profile prompt's cache entry.
+        Retrieved sections (retrieval mode) change every turn, so they go in
+        the newest user turn instead (see _history_with_breakpoints).
+        """
+        block = {"type": "text", "text": self.system_prompt}
+        if self.cache_system_prompt:
+            block["cache_control"] = {"type": "ephemeral"}
+        blocks = [block]
+        summary_block = self.compactor.system_block()
+        if summary_block:
+            blocks.append(summary_block)
+        return blocks
+
+    def _prompt_hash(self) -> str:
+        """Hash of everything but the question that shapes a first-turn answer.
+
+        Covers the model settings and the system prompt as sent (template,
+        profile and retrieval mode), plus the sections retrieval can inject.
+        """
+        sections = dict(self.compiled.sections) if self.retriever is not None else None
+        material = [MODEL_ID, MAX_TOKENS, self.system_prompt, sections]
+        return hashlib.sha256(json.dumps(material).encode('utf-8')).hexdigest()
+
+    def _summarize_history(self, previous_summary: str, messages: list,
+                           priority: int = PRIORITY_BACKGROUND) -> str:
+        """Summarizer for HistoryCompactor; falls back to an extractive summary.
+
+        Background compaction queues behind every visitor's turn; a turn that
+        waits on the summary (the 'compact' budget policy) passes its own priority.
+        """
         if not self.client:
-            return "Error: Claude API not configured. Set ANTHROPIC_API_KEY in .env file."
+            return extractive_summary(previous_summary, messages)
+        request = build_history_summary_request(previous_summary, format_transcript(messages))
+        response, ticket = self.scheduler.run(lambda: self.client.messages.create(
+            model=SUMMARY_MODEL_ID,
+            max_tokens=SUMMARY_MAX_TOKENS,
+            system=HISTORY_SUMMARY_PROMPT,
+            messages=[{"role": "user", "content": request}],
+        ), self.estimator.estimate(HISTORY_SUMMARY_PROMPT + request), priority)
+        counts = usage_to_dict(response.usage)
+        self.scheduler.settle(ticket, counts["input_tokens"] + counts["cache_creation_input_tokens"])
+        return response.content[0].text.strip()
+
+    def _history_with_breakpoints(self) -> list:
+        """History with rolling cache breakpoints on the most recent user turns.
+
+        The newest user message marks the prefix to write for the next turn;
+        the previous one marks the prefix written last turn, so it is read
+        back from cache. In retrieval mode this turn's sections are appended
+        to the newest user turn after its breakpoint, so they stay out of
+        every cached prefix. self.history itself is never modified.
+        """
+        messages = list(self.history)
+        user_positions = [i for i, m in enumerate(messages) if m["role"] == "user"]
+        for position in user_positions[-HISTORY_CACHE_BREAKPOINTS:]:
+            messages[position] = _with_cache_control(messages[position])
+        sections_block = self.retriever.sections_block(self.retrieved) if self.retriever else None
+        if sections_block and messages and messages[-1]["role"] == "user":
+            newest = _with_cache_control(messages[-1])
+            messages[-1] = {"role": "user", "content": newest["content"] + [sections_block]}
+        return messages
+
+    def _request_kwargs(self) -> dict:
+        """Arguments shared by every messages.create / messages.stream call."""
+        return {
+            "model": MODEL_ID,
+            "max_tokens": MAX_TOKENS,
+            "system": self._system_blocks(),
+            "messages": self._history_with_breakpoints(),
+        }
+
+    def _record_usage(self, usage) -> None:
+        counts = usage_to_dict(usage)
+        if self._admission is not None:
+            # cache reads don't count toward input-token rate limits
+            self.scheduler.settle(
+                self._admission, counts["input_tokens"] + counts["cache_creation_input_tokens"])
+            self._admission = None
+        self.turn_usage.append(counts)
+        actual = (counts["input_tokens"] + counts["cache_read_input_tokens"]
+                  + counts["cache_creation_input_tokens"])
+        self.estimator.observe(self._request_raw_tokens, actual)
+        self._request_raw_tokens = 0
+        for listener in USAGE_LISTENERS:
+            try:
+                listener(self, counts)
+            except Exception:
+                pass
+
+    @property
+    def last_usage(self) -> dict:
+        """Token usage of the most recent completed turn, or {} before the first."""
+        return self.turn_usage[-1] if self.turn_usage else {}
+
+    def _record_metrics(self, mode: str, first_token_at) -> None:
+        """Per-turn timings + token counts, after _finalize (so lead logging is included).
+
+        ttft is measured to the first text delta from the API; generation time
+        runs from the request to the end of the response.
+        """
+        ended = time.perf_counter()
+        started = self._turn_started or ended
+        usage = self.last_usage
+        generation = ended - started
+        streaming = (ended - first_token_at) if first_token_at else generation
+        metrics = {
+            "timestamp": time.time(),
+            "mode": mode,
+            "ttft_seconds": (first_token_at - started) if first_token_at else None,
+            "generation_seconds": generation,
+            "output_tokens_per_second": (
+                usage.get("output_tokens", 0) / streaming if streaming > 0 else 0.0
+            ),
+            "lead_log_seconds": self._lead_seconds,
+            "queue_seconds": self._queue_seconds,
+            **usage,
+        }
+        self.turn_metrics.append(metrics)
+        for listener in METRICS_LISTENERS:
+            try:
+                listener(self, metrics)
+            except Exception:
+                pass
+
+    @property
+    def last_metrics(self) -> dict:
+        """Metrics of the most recent completed turn, or {} before the first."""
+        return self.turn_metrics[-1] if self.turn_metrics else {}
+
+    def _request_texts(self, user_message=None):
+        """(system block texts, message texts) of the next request, for estimation."""
+        system = [block["text"] for block in self._system_blocks()]
+        if self.retriever is not None and self.retrieved:
+            system.append(self.retriever.sections_block(self.retrieved)["text"])
+        messages = [message_text(message) for message in self.history]
+        if user_message is not None:
+            messages.append(user_message)
+        return system, messages
+
+    def preflight(self, user_message: str) -> Preflight:
+        """Estimated size of sending user_message next, against the input budget.
+
+        Has no side effects, so the UI can call it to warn before a turn starts.
+        """
+        raw = self.estimator.raw_request(*self._request_texts(user_message))
+        return Preflight(
+            estimated_tokens=self.estimator.calibrated(raw),
+            user_tokens=self.estimator.estimate(user_message),
+            budget=self.input_budget,
+            user_limit=self.user_message_limit,
+            policy=self.budget_policy,
+        )
 
+    def _enforce_budget(self, user_message: str) -> str:
+        """Apply the budget policy; returns the message to send or raises InputBudgetExceeded.
+
+        An over-long message is trimmed to the per-message limit. If the whole
+        request is still over budget, 'compact' first folds older turns into
+        the summary synchronously; then the oldest exchanges are dropped and,
+        as a last resort, the message is trimmed to the room that is left.
+        """
+        check = self.preflight(user_message)
+        if check.action == 'ok':
+            return user_message
+        if check.action == 'reject':
+            raise InputBudgetExceeded(check.notice)
+        if check.user_over_limit:
+            user_message = trim_text(user_message, self.user_message_limit, self.estimator)
+            check = self.preflight(user_message)
+        if check.over_budget and self.budget_policy == 'compact':
+            self.compactor.wait()
+            # the visitor is waiting on this summary: queue it with the turn, not behind it
+            summarize = partial(self._summarize_history, priority=self._turn_priority())
+            self.compactor.compact(self.history, summarize=summarize)
+            check = self.preflight(user_message)
+        while check.over_budget and self.history:
+            # drop through the next user turn so history still opens with one
+            cut = next((i for i, m in enumerate(self.history) if i and m["role"] == "user"),
+                       len(self.history))
+            del self.history[:cut]
+            check = self.preflight(user_message)
+        if check.over_budget:
+            room = self.input_budget - (check.estimated_tokens - check.user_tokens)
+            if room <= 0:
+                raise InputBudgetExceeded(check.notice)
+            user_message = trim_text(user_message, room, self.estimator)
+        return user_message
+
+    def _begin_turn(self, user_message: str) -> None:
+        """Start a turn; raises InputBudgetExceeded, before touching history, on rejection."""
+        self._turn_started = time.perf_counter()
+        self._lead_seconds = 0.0
+        self._queue_seconds = 0.0
+        self._admission = None
+        # a summary finished in the background is folded in here, on this thread
+        self.compactor.apply(self.history)
+        if self.retriever is not None:
+            # include the previous question so follow-ups ("tell me more") keep context
+            previous = [m["content"] for m in self.history
+                        if m["role"] == "user" and isinstance(m["content"], str)][-1:]
+            self.retrieved = self.retriever.search(" ".join(previous + [user_message]))
+        user_message = self._enforce_budget(user_message)
         self.history.append({"role": "user", "content": user_message})
+        self._request_raw_tokens = self.estimator.raw_request(*self._request_texts())
+
+    def _abort_turn(self, error: Exception) -> str:
+        """Drop the unanswered user turn and describe the failure."""
+        self.history.pop()
+        if isinstance(error, QueueTimeout):
+            return str(error)
+        return f"Error communicating with Claude: {str(error)}"
+
+    def _turn_priority(self) -> int:
+        """Conversations already under way are admitted ahead of new ones."""
+        return PRIORITY_ACTIVE if len(self.history) > 1 else PRIORITY_NEW
+
+    def _admit(self, on_queue=None):
+        """Wait for the scheduler to admit this turn's request; returns the ticket."""
+        ticket = self.scheduler.admit(self.estimator.calibrated(self._request_raw_tokens),
+                                      self._turn_priority(), on_queue)
+        self._queue_seconds += ticket.waited
+        return ticket
+
+    def _scheduled(self, call, ticket=None, on_queue=None):
+        """call() for this turn once the process-wide scheduler admits it (see scheduler.py).
 
+        A 429/529 answer is not a failure: the scheduler pauses admissions for
+        the server's retry-after, and the call is retried after a jittered
+        backoff. The admitted ticket is settled against real usage in
+        _record_usage.
+        """
+        result, ticket = self.scheduler.run(
+            call, self.estimator.calibrated(self._request_raw_tokens), self._turn_priority(),
+            on_queue, ticket)
+        self._queue_seconds += ticket.waited
+        self._admission = ticket
+        return result
+
+    async def _ascheduled(self, call, on_queue=None):
+        """Async twin of _scheduled(); call() returns an awaitable."""
+        result, ticket = await self.scheduler.arun(
+            call, self.estimator.calibrated(self._request_raw_tokens), self._turn_priority(),
+            on_queue)
+        self._queue_seconds += ticket.waited
+        self._admission = ticket
+        return result
+
+    @contextmanager
+    def _admitted_stream(self, request: dict, ticket=None, on_queue=None):
+        """messages.stream(**request), opened once the scheduler admits it."""
+        with ExitStack() as stack:
+            yield self._scheduled(
+                lambda: stack.enter_context(self.client.messages.stream(**request)),
+                ticket=ticket, on_queue=on_queue)
+
+    @asynccontextmanager
+    async def _admitted_async_stream(self, client, request: dict, on_queue=None):
+        """Async twin of _admitted_stream."""
+        async with AsyncExitStack() as stack:
+            yield await self._ascheduled(
+                lambda: stack.enter_async_context(client.messages.stream(**request)), on_queue)
+
+    def _open_turn(self, turn, user_message: str):
+        """Begin the turn inside its span; returns the notice if the budget rejected it."""
         try:
-            response = self.client.messages.create(
-                model=MODEL_ID,
-                max_tokens=MAX_TOKENS,
-                system=self._system_blocks(),
-                messages=self.history,
-            )
-            raw_text = response.content[0].text
-        except Exception as error:
-            self.history.pop()
-            return f"Error communicating with Claude: {str(error)}"
-
-        return self._finalize(raw_text)
+            self._begin_turn(user_message)
+        except InputBudgetExceeded as error:
+            turn.set_attribute("rejected", True)
+            return str(error)
+        return None
+
+    def _fail_turn(self, turn, error: Exception) -> str:
+        """Abort the turn after an upstream failure; returns the text shown instead."""
+        turn.set_attribute("error", str(error))
+        return self._abort_turn(error)
+
+    def _settle_turn(self, turn, usage) -> None:
+        """Record the turn's token usage and copy it onto the turn span."""
+        self._record_usage(usage)
+        for field, count in self.last_usage.items():
+            turn.set_attribute(f"usage.{field}", count)
+
+    def chat(self, user_message: str) -> str:
+        """Non-streaming chat — used by example-question buttons."""
+        if not self.client:
+            return NOT_CONFIGURED_MESSAGE
+
+        with span("agent.chat", profile=self.name) as turn:
+            notice = self._open_turn(turn, user_message)
+            if notice is not None:
+                return notice
+            try:
+                request = self._request_kwargs()
+                with span("anthropic.messages.create", model=MODEL_ID):
+                    response = self._scheduled(lambda: self.client.messages.create(**request),
+                                               on_queue=self.on_queue)
+                raw_text = response.content[0].text
+            except Exception as error:
+                return self._fail_turn(turn, error)
+
+            self._settle_turn(turn, response.usage)
+            text = self._finalize(raw_text)
+            self._record_metrics("create", None)
+            return text
 
     def chat_stream(self, user_message: str) -> Iterator[str]:
         """Streaming chat — yields text deltas suitable for st.write_stream.
 
-        After the stream completes, the full text is parsed for a trailing
-        [[LEAD_LOG]] marker; that line is stripped from the user-visible
-        response and handled as a lead-logging side effect.
+        Deltas pass through a LeadLogScanner, so a trailing [[LEAD_LOG]] marker
+        never reaches the user. After the stream completes, the raw text is
+        handed to _finalize, which parses the marker and handles the
+        lead-logging side effect.
         """
         if not self.client:
-            yield "Error: Claude API not configured. Set ANTHROPIC_API_KEY in .env file."
+            yield NOT_CONFIGURED_MESSAGE
             return
 
-        self.history.append({"role": "user", "content": user_message})
-        buffered = []
-        lead_marker_seen = False
+        with span("agent.chat_stream", profile=self.name) as turn:
+            notice = self._open_turn(turn, user_message)
+            if notice is not None:
+                yield notice
+                return
+            if self.single_flight and len(self.history) == 1:
+                yield from self._coalesced_stream(turn)
+                return
+            try:
+                # includes time the consumer spends between chunks (rendering)
+                with span("anthropic.messages.stream", model=MODEL_ID) as upstream:
+                    streamed = TurnStream(upstream)
+                    with self._admitted_stream(self._request_kwargs(),
+                                               on_queue=self.on_queue) as stream:
+                        for text_delta in stream.text_stream:
+                            visible = streamed.feed(text_delta)
+                            if visible:
+                                yield visible
+                        final_message = stream.get_final_message()
+            except Exception as error:
+                yield "\n\n" + self._fail_turn(turn, error)
+                return
 
-        try:
-            with self.client.messages.stream(
-                model=MODEL_ID,
-                max_tokens=MAX_TOKENS,
-                system=self._system_blocks(),
-                messages=self.history,
-            ) as stream:
-                for text_delta in stream.text_stream:
-                    buffered.append(text_delta)
-                    combined = "".join(buffered)
-                    if "[[LEAD_LOG]]" in combined and not lead_marker_seen:
-                        lead_marker_seen = True
-                        visible_prefix = combined.split("[[LEAD_LOG]]")[0]
-                        emitted = "".join(buffered[:-1])
-                        tail_visible = visible_prefix[len(emitted):]
-                        if tail_visible:
-                            yield tail_visible
-                    elif not lead_marker_seen:
-                        yield text_delta
-        except Exception as error:
-            self.history.pop()
-            yield f"\n\nError communicating with Claude: {str(error)}"
+            tail_visible = streamed.flush()
+            if tail_visible:
+                yield tail_visible
+            self._settle_turn(turn, final_message.usage)
+            self._finalize(streamed.text(), already_streamed=True)
+            self._record_metrics("stream", streamed.first_token_at)
+
+    def _produce_flight(self, request: dict, flight, ticket) -> None:
+        """Flight producer (daemon thread): one upstream stream, visible chunks published.
+
+        The leader was admitted before joining; retries after a 429 wait here
+        without queue notices, since this thread cannot update the UI.
+        """
+        scanner = LeadLogScanner()
+        with self._admitted_stream(request, ticket=ticket) as stream:
+            for text_delta in stream.text_stream:
+                visible = scanner.feed(text_delta)
+                if visible:
+                    flight.publish(visible)
+            final_message = stream.get_final_message()
+        tail_visible = scanner.flush()
+        if tail_visible:
+            flight.publish(tail_visible)
+        flight.finish(scanner.text(), final_message.usage)
+
+    def _coalesced_stream(self, turn) -> Iterator[str]:
+        """chat_stream for a first turn: lead or join the flight for this exact request.
+
+        Only the leader records the flight's token usage, since followers cost
+        nothing upstream; every subscriber finalizes into its own history (and
+        logs its own lead, deduplicated as usual).
+        """
+        request = self._request_kwargs()
+        key = conversation_key(self.compiled.content_hash, request)
+        ticket = None
+        if not self.flights.joinable(key):
+            # queue in this thread, where on_queue can still reach the visitor
+            try:
+                ticket = self._admit(self.on_queue)
+            except QueueTimeout as error:
+                yield self._abort_turn(error)
+                return
+        flight, leader = self.flights.join(
+            key, lambda flight: self._produce_flight(request, flight, ticket))
+        if ticket is not None and not leader:
+            # an identical request took the lead while this one waited
+            self.scheduler.release(ticket)
+        turn.set_attribute("coalesced", not leader)
+        first_token_at = None
+        with span("anthropic.messages.stream", model=MODEL_ID, shared=not leader) as upstream:
+            for chunk in flight.follow():
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    upstream.add_event("first_token")
+                yield chunk
+        if flight.error is not None:
+            yield "\n\n" + self._fail_turn(turn, flight.error)
+            return
+        self._settle_turn(turn, flight.usage if leader else None)
+        self._finalize(flight.raw_text, already_streamed=True)
+        self._record_metrics("stream" if leader else "stream_shared", first_token_at)
+
+    async def achat(self, user_message: str) -> str:
+        """Async twin of chat(), on the loop's shared AsyncAnthropic client."""
+        client = self.async_client or get_shared_async_client()
+        if not client:
+            return NOT_CONFIGURED_MESSAGE
+
+        with span("agent.achat", profile=self.name) as turn:
+            notice = self._open_turn(turn, user_message)
+            if notice is not None:
+                return notice
+            try:
+                request = self._request_kwargs()
+                with span("anthropic.messages.create", model=MODEL_ID):
+                    response = await self._ascheduled(lambda: client.messages.create(**request),
+                                                      self.on_queue)
+                raw_text = response.content[0].text
+            except Exception as error:
+                return self._fail_turn(turn, error)
+
+            self._settle_turn(turn, response.usage)
+            # lead logging may block on network I/O; keep it off the event loop
+            text = await asyncio.to_thread(self._finalize, raw_text)
+            self._record_metrics("async_create", None)
+            return text
+
+    async def achat_stream(self, user_message: str) -> AsyncIterator[str]:
+        """Async twin of chat_stream(); one event loop can drive many of these at once."""
+        client = self.async_client or get_shared_async_client()
+        if not client:
+            yield NOT_CONFIGURED_MESSAGE
             return
 
-        full_text = "".join(buffered)
-        self._finalize(full_text, already_streamed=True)
+        with span("agent.achat_stream", profile=self.name) as turn:
+            notice = self._open_turn(turn, user_message)
+            if notice is not None:
+                yield notice
+                return
+            try:
+                with span("anthropic.messages.stream", model=MODEL_ID) as upstream:
+                    streamed = TurnStream(upstream)
+                    async with self._admitted_async_stream(client, self._request_kwargs(),
+                                                           self.on_queue) as stream:
+                        async for text_delta in stream.text_stream:
+                            visible = streamed.feed(text_delta)
+                            if visible:
+                                yield visible
+                        final_message = await stream.get_final_message()
+            except Exception as error:
+                yield "\n\n" + self._fail_turn(turn, error)
+                return
+
+            tail_visible = streamed.flush()
+            if tail_visible:
+                yield tail_visible
+            self._settle_turn(turn, final_message.usage)
+            await asyncio.to_thread(self._finalize, streamed.text(), True)
+            self._record_metrics("async_stream", streamed.first_token_at)
+
+    def replay_answer(self, user_message: str, answer: str) -> Iterator[str]:
+        """Serve a precomputed answer as this turn, recording it in history like a live one."""
+        try:
+            self._begin_turn(user_message)
+        except InputBudgetExceeded as error:
+            yield str(error)
+            return
+        self.history.append({"role": "assistant", "content": answer})
+        self.turns_committed += 1
+        yield answer
 
+    @traced("agent.finalize")
     def _finalize(self, raw_text: str, already_streamed: bool = False) -> str:
         """Strip LEAD_LOG marker, handle lead-logging side effect, return clean text."""
         match = LEAD_LOG_PATTERN.search(raw_text)
@@ -140,28 +698,64 @@ class AgenticProfileAgent:
             visible_text = raw_text.strip()
 
         self.history.append({"role": "assistant", "content": visible_text})
+        self.turns_committed += 1
 
         if lead_json:
+            lead_started = time.perf_counter()
             self._log_lead(lead_json)
+            self._lead_seconds = time.perf_counter() - lead_started
 
+        self.compactor.maybe_compact(self.history)
         return visible_text
 
+    @traced("agent.log_lead")
     def _log_lead(self, parsed: dict) -> None:
-        """Persist a captured lead via Google Sheets or the simulate fallback."""
-        company = parsed.get('company')
-        contact_name = parsed.get('contact_name')
-        contact_email = parsed.get('contact_email')
-        role_title = parsed.get('role_title')
-        notes = parsed.get('notes', '')
+        """Persist a captured lead via Google Sheets or the simulate fallback.
+
+        Repeats of a known lead (same email/company on this profile, across
+        turns, sessions and restarts) are merged in the dedupe index; only genuinely new leads, or
+        merged records with new information for Sheets, reach the backends.
+        """
+        outcome = get_lead_index().record(parsed, self.profile_slug)
+        current_span().set_attribute("lead.outcome", outcome['status'])
+        if outcome['status'] == 'duplicate':
+            return
+        lead = outcome['lead']
+        company = lead.get('company')
+        contact_name = lead.get('contact_name')
+        contact_email = lead.get('contact_email')
+        role_title = lead.get('role_title')
+        notes = lead.get('notes', '')
 
         if self.sheets_configured:
-            append_lead_to_sheet(company, contact_name, contact_email, role_title, notes)
-        else:
-            simulate_lead_logging(company, contact_name, contact_email, role_title, notes)
+            # queued + spooled; the Sheets append happens in a background batch
+            status = 'Updated' if outcome['status'] == 'updated' else 'New'
+            get_lead_sink().submit(company, contact_name, contact_email, role_title, notes, status,
+                                   self.profile_slug)
+        elif outcome['status'] != 'updated':
+            simulate_lead_logging(company, contact_name, contact_email, role_title, notes,
+                                  self.profile_slug)
 
     def reset_conversation(self):
         """Clear conversation history."""
         self.history = []
+        self.retrieved = []
+        self.turn_usage = []
+        self.turn_metrics = []
+        self.compactor.reset()
+
+    def load_history(self, messages: list, summary: str = "") -> None:
+        """Resume a stored conversation: the messages its summary does not cover, plus the summary.
+
+        A trailing unanswered user turn (the visitor left mid-response) is
+        dropped so the next request still alternates roles.
+        """
+        self.reset_conversation()
+        history = [{"role": m["role"], "content": m["content"]} for m in messages]
+        while history and history[-1]["role"] != "assistant":
+            history.pop()
+        self.history = history
+        self.compactor.summary = summary or ""
 
     def get_quick_intro(self) -> str:
         """Return a brief introduction based on profile data."""
@@ -0,0 +1,261 @@
+"""
+answers.py
+Purpose: Precomputed first-turn answers for the example-question buttons
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+
+Run as a script to (re)build the cache for the current profile:
+    python app/answers.py [--batch]
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+from agent import AgenticProfileAgent, LEAD_LOG_PATTERN
+
+
+EXAMPLE_QUESTIONS = [
+    "Tell me about your background",
+    "What's GLASS Build Team?",
+    "Describe your RAG system work",
+    "How does the KG guardrails project work?",
+    "Tell me about Ernst & Young",
+    "What's Claude Governance Enforcer?",
+    "Tell me about your publications",
+    "What's your email?"
+]
+
+# example buttons for hosted profiles other than the bundled one
+GENERIC_QUESTIONS = [
+    "Tell me about your background",
+    "What are your strongest skills?",
+    "Describe your most recent project",
+    "What's your email?"
+]
+
+ANSWER_CACHE_PATH = os.getenv(
+    'ANSWER_CACHE_PATH', str(Path(__file__).parent / '.answer_cache.json')
+)
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv('ANSWER_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv('ANSWER_CACHE_MAX_BYTES', str(1024 * 1024)))
+BATCH_POLL_SECONDS = 10.0
+
+
+def normalize_question(question: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive question key."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+class AnswerCache:
+    """Answers keyed by the agent's prompt hash + normalized question.
+
+    The prompt hash (AgenticProfileAgent.prompt_hash) changes with the
+    profile, the prompt template, the model settings and the retrieval mode,
+    so any of those edits retires old answers. Entries expire after
+    ttl_seconds; once the stored text exceeds max_bytes the least recently
+    used entries are evicted. Entries for any other prompt hash are
+    unreachable by construction and are purged on the next precompute.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        max_bytes: int = ANSWER_CACHE_MAX_BYTES,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> {"answer", "created_at", "prompt_hash"}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(prompt_hash: str, question: str) -> str:
+        return f"{prompt_hash}:{normalize_question(question)}"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, prompt_hash: str, question: str) -> Optional[str]:
+        key = self.key(prompt_hash, question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry['created_at'] > self.ttl_seconds:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry['answer']
+
+    def put(self, prompt_hash: str, question: str, answer: str,
+            created_at: Optional[float] = None) -> None:
+        key = self.key(prompt_hash, question)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'answer': answer,
+                'created_at': created_at if created_at is not None else time.time(),
+                'prompt_hash': prompt_hash,
+            }
+            self._bytes += len(answer.encode('utf-8'))
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_except(self, prompt_hash: str) -> None:
+        """Drop every entry built from a different prompt (profile, template or settings)."""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e['prompt_hash'] != prompt_hash]:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry['answer'].encode('utf-8'))
+
+    def load(self) -> "AnswerCache":
+        """Load entries from self.path if it exists; corrupt files are ignored."""
+        if not self.path or not Path(self.path).exists():
+            return self
+        try:
+            stored = json.loads(Path(self.path).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return self
+        for entry in stored.get('entries', []):
+            if 'prompt_hash' not in entry:
+                continue  # keyed by the profile file alone: from before prompt hashes
+            self.put(entry['prompt_hash'], entry['question'], entry['answer'],
+                     created_at=entry['created_at'])
+        return self
+
+    def save(self) -> None:
+        """Atomically write entries to self.path."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = [
+                {'question': key.split(':', 1)[1], **entry}
+                for key, entry in self._entries.items()
+            ]
+        tmp = Path(f"{self.path}.{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps({'entries': entries}), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+
+class LocalBatches:
+    """In-process stand-in for client.messages.batches.
+
+    Mirrors create / retrieve / results closely enough for precompute_answers,
+    running each request through messages.create. Useful for development and
+    tests, or for accounts without Message Batches access.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._batches = {}
+
+    def create(self, requests: list):
+        batch_id = f"localbatch_{uuid.uuid4().hex[:12]}"
+        results = []
+        for request in requests:
+            try:
+                message = self.client.messages.create(**request['params'])
+                result = _Namespace(type='succeeded', message=message)
+            except Exception as error:
+                result = _Namespace(type='errored', error=str(error))
+            results.append(_Namespace(custom_id=request['custom_id'], result=result))
+        self._batches[batch_id] = results
+        return _Namespace(id=batch_id, processing_status='ended')
+
+    def retrieve(self, batch_id: str):
+        return _Namespace(id=batch_id, processing_status='ended')
+
+    def results(self, batch_id: str):
+        return iter(self._batches[batch_id])
+
+
+class _Namespace:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def _clean_answer(raw_text: str) -> str:
+    match = LEAD_LOG_PATTERN.search(raw_text)
+    return (raw_text[: match.start()] if match else raw_text).strip()
+
+
+def precompute_answers(
+    profile_path: str,
+    cache: AnswerCache,
+    questions: Iterable[str] = EXAMPLE_QUESTIONS,
+    client=None,
+    use_batches: bool = False,
+    batches=None,
+    poll_seconds: float = BATCH_POLL_SECONDS,
+) -> dict:
+    """Build first-turn answers for questions and store them in cache.
+
+    Requests are exactly what a fresh session would send for its first turn, so
+    the answers match what a visitor would have streamed. With use_batches the
+    work goes through the Message Batches API (or the given stand-in).
+    Returns {'stored': n, 'failed': [questions]}.
+    """
+    agent = AgenticProfileAgent(profile_path)
+    client = client or agent.client
+    if client is None:
+        return {'stored': 0, 'failed': list(questions)}
+
+    prompt_hash = agent.prompt_hash
+    params = {}
+    for index, question in enumerate(questions):
+        agent.reset_conversation()
+        agent._begin_turn(question)
+        params[f"q{index}"] = (question, agent._request_kwargs())
+    agent.reset_conversation()
+
+    answers, failed = {}, []
+    if use_batches:
+        batches = batches or client.messages.batches
+        batch = batches.create(requests=[
+            {'custom_id': custom_id, 'params': request}
+            for custom_id, (_, request) in params.items()
+        ])
+        while batch.processing_status != 'ended':
+            time.sleep(poll_seconds)
+            batch = batches.retrieve(batch.id)
+        for entry in batches.results(batch.id):
+            question = params[entry.custom_id][0]
+            if entry.result.type == 'succeeded':
+                answers[question] = entry.result.message.content[0].text
+            else:
+                failed.append(question)
+    else:
+        for question, request in params.values():
+            try:
+                answers[question] = client.messages.create(**request).content[0].text
+            except Exception:
+                failed.append(question)
+
+    cache.invalidate_except(prompt_hash)
+    for question, raw_text in answers.items():
+        cache.put(prompt_hash, question, _clean_answer(raw_text))
+    cache.save()
+    return {'stored': len(answers), 'failed': failed}
+
+
+if __name__ == "__main__":
+    result = precompute_answers(
+        str(Path(__file__).parent / "profile.yaml"),
+        AnswerCache(ANSWER_CACHE_PATH).load(),
+        use_batches='--batch' in sys.argv,
+    )
+    print(f"[ANSWERS] stored={result['stored']} failed={result['failed']}")
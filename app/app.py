@@ -5,8 +5,6 @@ Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
 Date: 2026-04-17
 """
 
-import base64
-import time
 import streamlit as st
 from pathlib import Path
 import sys
@@ -16,16 +14,27 @@ app_path = Path(__file__).parent
 sys.path.insert(0, str(app_path))
 
 from agent import AgenticProfileAgent
-from tools import load_profile
+from answers import ANSWER_CACHE_PATH, EXAMPLE_QUESTIONS, GENERIC_QUESTIONS, AnswerCache
+from assets import get_asset
+from catalog import DEFAULT_PROFILE_SLUG, get_catalog
+from client import get_shared_client, prewarm_connection
+from conversations import CONVERSATION_WINDOW_MESSAGES, get_conversation_store
+from history import message_text
+from images import pick_variant, srcset
+from render import FrameCoalescer
+from scheduler import get_scheduler, queue_notice
+from sessions import AgentSlot, get_session_registry
+from telemetry import get_telemetry
+from tracing import span
+from warmer import CACHE_WARM_ENABLED, CacheWarmer
 
 
-PDF_PATH = app_path / "Gregory_E_Schwartz_Cv.pdf"
 STATIC_DIR = app_path / "static"
 LION_AVATAR = STATIC_DIR / "lion_avatar.png"
 LION_HERO = STATIC_DIR / "lion_hero.png"
 LION_COMPONENT_TEMPLATE_PATH = app_path / "lion_component.html"
-SEED_MESSAGE = (
-    "Hi! I'm Gregory's CV. You can ask me about his work and download his "
+SEED_TEMPLATE = (
+    "Hi! I'm {owner} CV. You can ask me about {their} work and download {their} "
     "formal PDF CV here."
 )
 
@@ -41,47 +50,261 @@ THINKING_HTML = (
 )
 
 
+def static_serving():
+    return bool(st.get_option("server.enableStaticServing"))
+
+
+def asset_src(asset):
+    """Static URL for an asset when the server serves app/static, else its data URI."""
+    if asset.published and static_serving():
+        return asset.url
+    return asset.data_uri
+
+
 def assistant_avatar():
-    """Return avatar path (as str) for assistant chat bubbles, or None."""
-    return str(LION_AVATAR) if LION_AVATAR.exists() else None
+    """Return the avatar for assistant chat bubbles (static URL or bytes), or None."""
+    if not LION_AVATAR.exists():
+        return None
+    # bubbles are tiny: the smallest @2x variant stays sharp on retina screens
+    asset = get_asset(pick_variant(LION_AVATAR, scale=2))
+    return asset.url if asset.published and static_serving() else asset.data
+
+
+def hero_image_html():
+    """<picture> markup for the sidebar hero, using the built WebP/PNG variants."""
+    alt = 'alt="Lion engineer mascot"'
+    fallback = get_asset(pick_variant(LION_HERO, scale=1, formats=("png",)))
+    sets = {fmt: [(get_asset(path), scale) for path, scale in srcset(LION_HERO, fmt)]
+            for fmt in ("webp", "png")}
+    served = static_serving() and all(
+        asset.published for asset, _ in sets["webp"] + sets["png"] + [(fallback, 1)]
+    )
+    if not served:
+        # inline one small variant rather than a data URI per candidate
+        inline = get_asset(pick_variant(LION_HERO, scale=2))
+        return f'<img class="lion-img" src="{inline.data_uri}" {alt} />'
+
+    def candidates(fmt):
+        return ", ".join(f"{asset.url} {scale}x" for asset, scale in sets[fmt])
+
+    webp = f'<source type="image/webp" srcset="{candidates("webp")}" />' if sets["webp"] else ""
+    png = f' srcset="{candidates("png")}"' if sets["png"] else ""
+    return f'<picture>{webp}<img class="lion-img" src="{fallback.url}"{png} {alt} /></picture>'
+
+
+@st.cache_resource(show_spinner=False)
+def lion_component_html(image_html, template_mtime):
+    """Component HTML for one hero image markup, built once per process."""
+    return LION_COMPONENT_TEMPLATE_PATH.read_text().replace("__HERO_IMG__", image_html)
 
 
 def render_interactive_lion():
     """Render the cursor-tracking lion mascot component into the sidebar."""
     if not (LION_HERO.exists() and LION_COMPONENT_TEMPLATE_PATH.exists()):
         return
-    b64 = base64.b64encode(LION_HERO.read_bytes()).decode()
-    html = LION_COMPONENT_TEMPLATE_PATH.read_text().replace("__B64__", b64)
+    html = lion_component_html(
+        hero_image_html(), LION_COMPONENT_TEMPLATE_PATH.stat().st_mtime_ns
+    )
     with st.sidebar:
         st.components.v1.html(html, height=420, scrolling=False)
 
 
-def pdf_bytes():
-    """Return the PDF as bytes, or None if the file is missing."""
-    if PDF_PATH.exists():
-        return PDF_PATH.read_bytes()
-    return None
+def selected_profile():
+    """Catalog entry for the ?profile= query parameter (default profile if unknown)."""
+    slug = st.query_params.get("profile") or DEFAULT_PROFILE_SLUG
+    entry = get_catalog().get(slug)
+    if entry is None:
+        st.query_params.pop("profile", None)
+        entry = get_catalog().get(DEFAULT_PROFILE_SLUG)
+    return entry
+
+
+def profile_voice(entry):
+    """(possessive owner, possessive pronoun) for the profile's UI copy."""
+    if entry.slug == DEFAULT_PROFILE_SLUG:
+        return "Gregory's", "his"
+    first_name = entry.compiled.name.split()[0] if entry.compiled.name else "this"
+    return f"{first_name}'s", "their"
+
+
+def seed_message(entry):
+    owner, their = profile_voice(entry)
+    return SEED_TEMPLATE.format(owner=owner, their=their)
+
+
+def example_questions(entry):
+    return EXAMPLE_QUESTIONS if entry.slug == DEFAULT_PROFILE_SLUG else GENERIC_QUESTIONS
+
+
+def pdf_asset():
+    """Return the selected profile's CV PDF Asset, or None if it has none."""
+    return st.session_state.profile_entry.pdf
+
+
+@st.cache_resource(show_spinner=False)
+def warm_api_connection():
+    """Open the shared client's first keep-alive connection once per process."""
+    return prewarm_connection()
+
+
+@st.cache_resource(show_spinner=False)
+def cache_warmer():
+    """Start the optional prompt-cache keep-alive scheduler once per process."""
+    if not CACHE_WARM_ENABLED:
+        return None
+    return CacheWarmer(str(app_path / "profile.yaml")).start()
+
+
+@st.cache_resource(show_spinner=False)
+def telemetry():
+    """Per-turn metrics aggregation (Prometheus /metrics, JSONL), installed once per process."""
+    return get_telemetry()
+
+
+@st.cache_resource(show_spinner=False)
+def session_registry():
+    """Idle-agent eviction and per-session memory gauges, started once per process."""
+    registry = get_session_registry().start()
+    telemetry().gauge_sources.append(registry.gauges)
+    return registry
+
+
+@st.cache_resource(show_spinner=False)
+def request_scheduler():
+    """Process-wide API admission control; its queue gauges join the telemetry export."""
+    scheduler = get_scheduler()
+    telemetry().gauge_sources.append(scheduler.gauges)
+    return scheduler
+
 
+@st.cache_resource(show_spinner=False)
+def example_answers():
+    """Precomputed example-question answers (see answers.py), loaded once per process."""
+    return AnswerCache(ANSWER_CACHE_PATH).load()
 
-def init_session_state():
-    """Initialize Streamlit session state variables."""
-    if 'agent' not in st.session_state:
-        profile_path = app_path / "profile.yaml"
-        st.session_state.agent = AgenticProfileAgent(str(profile_path))
+
+def response_stream(agent, prompt):
+    """Return (chunks, cached): a precomputed first-turn answer if one exists, else a live stream."""
+    if not agent.history:
+        answer = example_answers().get(agent.prompt_hash, prompt)
+        if answer:
+            return agent.replay_answer(prompt, answer), True
+    return agent.chat_stream(prompt), False
+
+
+@st.cache_resource(show_spinner=False)
+def conversation_store():
+    """Persistent conversation store (see conversations.py), or None when disabled."""
+    return get_conversation_store()
+
+
+def resume_conversation(entry):
+    """Adopt the ?c= conversation and return its recent window for the transcript.
+
+    ?c= holds a signed, expiring resume token (see conversations.py), so a
+    guessed or stale link resumes nothing. Only conversations of the same
+    profile resume; otherwise the session starts empty and a new conversation
+    is created on its first message. The agent picks the history up from the
+    store when it is built (build_agent).
+    """
+    store = conversation_store()
+    conversation_id = store.resolve(st.query_params.get("c")) if store is not None else None
+    if conversation_id is None or store.profile_of(conversation_id) != entry.slug:
+        st.query_params.pop("c", None)
+        return []
+    st.session_state.conversation_id = conversation_id
+    st.session_state.saved_summary = store.summary(conversation_id)
+    return store.recent(conversation_id)
+
+
+def build_agent():
+    """This session's agent with its conversation restored (first message, or after eviction)."""
+    entry = st.session_state.profile_entry
+    agent = AgenticProfileAgent(entry.profile_path, profile_slug=entry.slug)
+    store = conversation_store()
+    conversation_id = st.session_state.get("conversation_id")
+    if store is not None and conversation_id:
+        # the summary plus every message it does not cover, not just the visible window
+        agent.load_history(store.unsummarized(conversation_id), store.summary(conversation_id))
+    else:
+        committed = [m for m in st.session_state.messages[1:] if not m.get("failed")]
+        agent.load_history(committed, st.session_state.get("saved_summary", ""))
+    return agent
+
+
+def session_agent():
+    """The session's agent, built lazily; idle sessions lose theirs (see sessions.py)."""
+    return st.session_state.agent_slot.get()
+
+
+def add_message(role, content, failed=False):
+    """Append to the transcript; with a store, only the recent window stays in memory.
+
+    Without a conversation store the transcript is the only copy, so it is
+    kept whole. Failed turns (API errors, queue timeouts, budget rejections) are shown
+    but marked, so a rebuilt agent never sends them back as conversation.
+    """
+    messages = st.session_state.messages
+    messages.append({"role": role, "content": content, "failed": failed})
+    if conversation_store() is None:
+        return
+    # messages[0] is the seed; older turns remain in the store
+    excess = len(messages) - 1 - st.session_state.get("message_window", CONVERSATION_WINDOW_MESSAGES)
+    if excess > 0:
+        del messages[1:1 + excess]
+
+
+def persist_turn(agent):
+    """Store the turn the agent just committed, as it was sent (trimmed or not), plus the summary."""
+    store = conversation_store()
+    if store is None:
+        return
+    if not st.session_state.get("conversation_id"):
+        st.session_state.conversation_id = store.create(st.session_state.profile_slug)
+    conversation_id = st.session_state.conversation_id
+    for message in agent.history[-2:]:
+        store.append(conversation_id, message["role"], message_text(message))
+    # sliding expiry: each answer extends the resume link
+    token = store.resume_token(conversation_id)
+    if st.query_params.get("c") != token:
+        st.query_params["c"] = token
+    # compaction runs in the background, so the summary lands a turn or so later
+    summary = agent.compactor.summary
+    if summary != st.session_state.get("saved_summary", ""):
+        # everything stored before the agent's live history is folded into the summary
+        covered = store.count(conversation_id) - len(agent.history)
+        store.save_summary(conversation_id, summary, max(covered, 0))
+        st.session_state.saved_summary = summary
+
+
+def init_session_state(entry):
+    """Initialize Streamlit session state variables for the selected profile."""
+    st.session_state.profile_entry = entry
+    resumed = []
+    if st.session_state.get('profile_slug') != entry.slug:
+        # new session, or the visitor switched profiles: start a fresh conversation
+        st.session_state.agent_slot = session_registry().register(AgentSlot(build_agent))
+        st.session_state.profile_slug = entry.slug
+        st.session_state.conversation_id = None
+        st.session_state.pop('messages', None)
+        st.session_state.pop('message_window', None)
+        resumed = resume_conversation(entry)
 
     if 'messages' not in st.session_state:
         st.session_state.messages = [
-            {"role": "assistant", "content": SEED_MESSAGE},
-        ]
+            {"role": "assistant", "content": seed_message(entry)},
+        ] + resumed
 
     if 'lead_logged' not in st.session_state:
         st.session_state.lead_logged = False
 
+    # any rerun (scrolling the transcript, clicking) counts as activity
+    st.session_state.agent_slot.touch()
+
 
 def render_sidebar():
     """Render the sidebar with profile quick facts."""
-    agent = st.session_state.agent
-    profile = agent.profile
+    profile = st.session_state.profile_entry.compiled.profile
 
     render_interactive_lion()
     st.sidebar.markdown("---")
@@ -93,13 +316,13 @@ def render_sidebar():
     st.sidebar.markdown(f"**Location:** {profile.get('location', 'N/A')}")
     st.sidebar.markdown(f"**GitHub:** [{contact.get('github', '')}](https://{contact.get('github', '')})")
 
-    pdf = pdf_bytes()
+    pdf = pdf_asset()
     if pdf:
         st.sidebar.markdown("---")
         st.sidebar.download_button(
             label="Download PDF CV",
-            data=pdf,
-            file_name="Gregory_E_Schwartz_Cv.pdf",
+            data=pdf.data,
+            file_name=st.session_state.profile_entry.pdf_filename,
             mime="application/pdf",
             use_container_width=True,
         )
@@ -133,19 +356,39 @@ def render_sidebar():
     st.sidebar.markdown("---")
     if st.sidebar.button("Clear Conversation"):
         st.session_state.messages = [
-            {"role": "assistant", "content": SEED_MESSAGE},
+            {"role": "assistant", "content": seed_message(st.session_state.profile_entry)},
         ]
-        st.session_state.agent.reset_conversation()
+        agent = st.session_state.agent_slot.peek()
+        if agent is not None:
+            agent.reset_conversation()
+        store = conversation_store()
+        if store is not None and st.session_state.get("conversation_id"):
+            store.clear(st.session_state.conversation_id)
+        st.session_state.saved_summary = ""
+        st.session_state.pop("message_window", None)
         st.rerun()
 
 
 def render_chat_history():
     """Render the chat history (without input - input must be outside columns)."""
-    agent = st.session_state.agent
+    compiled = st.session_state.profile_entry.compiled
 
-    st.markdown(f"### Chat with {agent.name}")
+    st.markdown(f"### Chat with {compiled.name}")
     st.markdown("*Ask about background, projects, skills, or express hiring interest*")
 
+    # earlier turns of a long or resumed conversation load on demand
+    store = conversation_store()
+    conversation_id = st.session_state.get("conversation_id")
+    if store is not None and conversation_id:
+        window = st.session_state.get("message_window", CONVERSATION_WINDOW_MESSAGES)
+        shown = sum(1 for m in st.session_state.messages[1:] if not m.get("failed"))
+        hidden = store.count(conversation_id) - shown
+        if hidden > 0 and st.button(f"Show earlier messages ({hidden})"):
+            window += CONVERSATION_WINDOW_MESSAGES
+            st.session_state.message_window = window
+            st.session_state.messages = st.session_state.messages[:1] + store.recent(conversation_id, window)
+            st.rerun()
+
     # display chat history
     avatar = assistant_avatar()
     for message in st.session_state.messages:
@@ -164,49 +407,38 @@ def render_example_questions():
 
     col1, col2 = st.columns(2)
 
-    questions = [
-        "Tell me about your background",
-        "What's GLASS Build Team?",
-        "Describe your RAG system work",
-        "How does the KG guardrails project work?",
-        "Tell me about Ernst & Young",
-        "What's Claude Governance Enforcer?",
-        "Tell me about your publications",
-        "What's your email?"
-    ]
-
-    for i, question in enumerate(questions):
+    for i, question in enumerate(example_questions(st.session_state.profile_entry)):
         col = col1 if i % 2 == 0 else col2
         if col.button(question, key=f"q_{i}"):
-            st.session_state.messages.append({"role": "user", "content": question})
+            add_message("user", question)
             st.session_state.pending_prompt = question
             st.rerun()
 
 
-def render_banner(agent):
+def render_banner(entry):
     """Render the top banner with name, headline, and PDF download link."""
-    st.title(agent.name)
-    st.markdown(f"*{agent.profile.get('headline', '')}*")
+    st.title(entry.compiled.name)
+    st.markdown(f"*{entry.compiled.profile.get('headline', '')}*")
 
-    pdf = pdf_bytes()
+    owner, their = profile_voice(entry)
+    pdf = pdf_asset()
     if pdf:
-        b64 = base64.b64encode(pdf).decode()
         link = (
-            f'<a href="data:application/pdf;base64,{b64}" '
-            f'download="Gregory_E_Schwartz_Cv.pdf" '
+            f'<a href="{asset_src(pdf)}" '
+            f'download="{entry.pdf_filename}" '
             f'style="color:#A78BFA;font-weight:600;text-decoration:underline;">'
-            f'download his formal PDF CV here</a>'
+            f'download {their} formal PDF CV here</a>'
         )
         st.markdown(
             f"<div style='color:#A3B8CC;font-size:1rem;margin-top:0.25rem;'>"
-            f"Hi! I'm Gregory's CV. You can ask me about his work and {link}."
+            f"Hi! I'm {owner} CV. You can ask me about {their} work and {link}."
             f"</div>",
             unsafe_allow_html=True,
         )
     else:
         st.markdown(
             f"<div style='color:#A3B8CC;font-size:1rem;margin-top:0.25rem;'>"
-            f"{SEED_MESSAGE}"
+            f"{seed_message(entry)}"
             f"</div>",
             unsafe_allow_html=True,
         )
@@ -214,8 +446,9 @@ def render_banner(agent):
 
 def main():
     """Main application entry point."""
+    entry = selected_profile()
     st.set_page_config(
-        page_title="Agentic Profile - Gregory Schwartz",
+        page_title=f"Agentic Profile - {entry.compiled.name}",
         page_icon="",
         layout="wide",
         initial_sidebar_state="expanded"
@@ -355,14 +588,16 @@ def main():
     </style>
     """, unsafe_allow_html=True)
 
-    init_session_state()
-
-    agent = st.session_state.agent
+    warm_api_connection()
+    cache_warmer()
+    telemetry()
+    request_scheduler()
+    init_session_state(entry)
 
-    render_banner(agent)
+    render_banner(entry)
 
-    # check api status
-    if not agent.client:
+    # check api status (the agent itself is only built once there is a message)
+    if not get_shared_client():
         st.warning("Claude API not configured. Set ANTHROPIC_API_KEY in .env to enable chat.")
         st.info("You can still explore the profile structure in the sidebar.")
 
@@ -390,31 +625,52 @@ def main():
 
     # chat input must be outside columns
     if prompt := st.chat_input("Ask a question..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        add_message("user", prompt)
         st.session_state.pending_prompt = prompt
         st.rerun()
 
     # handle any pending prompt AFTER the rerun-redraw of history
     if st.session_state.get("pending_prompt"):
-        # Fixed-position toast: viewport-relative, cannot be scrolled off-screen
-        st.markdown(
-            '<div class="thinking-toast">⏳ Soldering a response…</div>',
-            unsafe_allow_html=True,
-        )
-        pending = st.session_state.pending_prompt
-        st.session_state.pending_prompt = None
-        with col_main:
-            with st.chat_message("assistant", avatar=assistant_avatar()):
-                # brief dwell so the toast is visible even when TTFT is fast
-                time.sleep(1.4)
-                placeholder = st.empty()
-                accumulated = ""
-                for chunk in st.session_state.agent.chat_stream(pending):
-                    accumulated += chunk
-                    placeholder.markdown(accumulated)
-                response = accumulated
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        with span("app.pending_prompt", profile=st.session_state.profile_slug) as turn:
+            # Fixed-position toast: viewport-relative, cannot be scrolled off-screen
+            toast = st.empty()
+            toast.markdown(
+                '<div class="thinking-toast">⏳ Soldering a response…</div>',
+                unsafe_allow_html=True,
+            )
+            pending = st.session_state.pending_prompt
+            st.session_state.pending_prompt = None
+            # estimate before the agent trims/compacts, so the visitor learns why
+            agent = session_agent()
+            # while the turn waits for the API scheduler, the toast shows its place in line
+            agent.on_queue = lambda position, wait: toast.markdown(
+                f'<div class="thinking-toast">⏳ {queue_notice(position, wait)}</div>',
+                unsafe_allow_html=True,
+            )
+            preflight = agent.preflight(pending)
+            turn.set_attribute("estimated_input_tokens", preflight.estimated_tokens)
+            turns_before = agent.turns_committed
+            chunks, cached = response_stream(agent, pending)
+            turn.set_attribute("cached_answer", cached)
+            with col_main:
+                if preflight.action in ('trim', 'compact'):
+                    st.warning(preflight.notice)
+                with st.chat_message("assistant", avatar=assistant_avatar()):
+                    placeholder = st.empty()
+                    placeholder.markdown(THINKING_HTML, unsafe_allow_html=True)
+                    # indicators stay up exactly until the first token arrives
+                    renderer = FrameCoalescer(placeholder.markdown, on_first_token=toast.empty)
+                    response = renderer.consume(chunks)
+            agent.on_queue = None
+            committed = agent.turns_committed > turns_before
+            if not committed:
+                st.session_state.messages[-1]["failed"] = True
+            add_message("assistant", response, failed=not committed)
+            if committed:
+                persist_turn(agent)
 
 
 if __name__ == "__main__":
-    main()
+    # one trace per script run; st.rerun() exits via a BaseException and is not an error
+    with span("app.rerun"):
+        main()
@@ -0,0 +1,118 @@
+"""
+assets.py
+Purpose: Content-hashed static assets loaded once per process and served by URL
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import base64
+import hashlib
+import mimetypes
+import os
+import threading
+import uuid
+from dataclasses import dataclass, field, replace
+from functools import cached_property
+from pathlib import Path
+from typing import Optional
+
+
+STATIC_DIR = Path(__file__).parent / "static"
+# hashed copies live under the Streamlit static root so /app/static can serve them
+PUBLISHED_DIR = STATIC_DIR / "_assets"
+# Streamlit serves <script dir>/static at /app/static when server.enableStaticServing is on
+STATIC_URL_PREFIX = "/app/static"
+
+
+@dataclass(frozen=True)
+class Asset:
+    """One file's bytes plus its content-addressed static filename."""
+    path: str
+    content_hash: str
+    mime: str
+    data: bytes = field(repr=False)
+    published: bool = True
+
+    @property
+    def filename(self) -> str:
+        source = Path(self.path)
+        return f"{source.stem}.{self.content_hash[:12]}{source.suffix}"
+
+    @property
+    def url(self) -> str:
+        """Static URL; the name changes whenever the content does, so it never goes stale."""
+        relative = PUBLISHED_DIR.relative_to(STATIC_DIR).as_posix()
+        return f"{STATIC_URL_PREFIX}/{relative}/{self.filename}"
+
+    @cached_property
+    def data_uri(self) -> str:
+        """Inline fallback for servers without static serving (encoded once)."""
+        return f"data:{self.mime};base64,{base64.b64encode(self.data).decode()}"
+
+
+_lock = threading.Lock()
+_entries = {}  # resolved path -> ((mtime_ns, size), Asset)
+
+
+def _publish(asset: Asset, published_dir: Path) -> bool:
+    """Write the hashed copy once; an existing file with that name already has these bytes."""
+    target = published_dir / asset.filename
+    if target.exists():
+        return True
+    try:
+        published_dir.mkdir(parents=True, exist_ok=True)
+        tmp = published_dir / f".{asset.filename}.{uuid.uuid4().hex}.tmp"
+        tmp.write_bytes(asset.data)
+        os.replace(tmp, target)
+    except OSError as error:
+        # read-only deploys still work through the data-URI fallback
+        print(f"[ASSETS] Could not publish {asset.filename}: {error}")
+        return False
+    return True
+
+
+def get_asset(file_path, published_dir: Path = PUBLISHED_DIR) -> Optional[Asset]:
+    """Return the process-wide Asset for a file, or None if it is missing.
+
+    Like the profile registry, a stat() decides whether the cached bytes are
+    current; the file is only re-read, re-hashed and re-published on change.
+    """
+    path = Path(file_path).resolve()
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    key = str(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _entries.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    with _lock:
+        cached = _entries.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        data = path.read_bytes()
+        asset = Asset(
+            path=key,
+            content_hash=hashlib.sha256(data).hexdigest(),
+            mime=mimetypes.guess_type(key)[0] or 'application/octet-stream',
+            data=data,
+        )
+        if not _publish(asset, published_dir):
+            asset = replace(asset, published=False)
+        _entries[key] = (signature, asset)
+    return asset
+
+
+def evict_asset(file_path) -> None:
+    """Drop one asset's cached bytes; its published copy stays servable."""
+    with _lock:
+        _entries.pop(str(Path(file_path).resolve()), None)
+
+
+def clear_assets() -> None:
+    """Forget every loaded asset (tests)."""
+    with _lock:
+        _entries.clear()
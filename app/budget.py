@@ -0,0 +1,172 @@
+"""
+budget.py
+Purpose: Calibrated local token estimator and pre-flight input budget enforcement
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from history import CHARS_PER_TOKEN
+
+
+INPUT_TOKEN_BUDGET = int(os.getenv('INPUT_TOKEN_BUDGET', '24000'))
+USER_MESSAGE_TOKEN_LIMIT = int(os.getenv('USER_MESSAGE_TOKEN_LIMIT', '4000'))
+# what to do with an oversized request: 'compact' history then trim, 'trim' only, or 'reject'
+INPUT_BUDGET_POLICY = os.getenv('INPUT_BUDGET_POLICY', 'compact').lower()
+BUDGET_POLICIES = ('compact', 'trim', 'reject')
+
+ESTIMATE_CACHE_SIZE = 4096
+CALIBRATION_ALPHA = 0.2
+CALIBRATION_BOUNDS = (0.5, 3.0)
+# per-message framing (role, block wrappers) the API counts on top of the text
+MESSAGE_OVERHEAD_TOKENS = 4
+TRIM_MARKER = "\n\n[... {count} tokens trimmed to fit the input budget ...]\n\n"
+REJECTED_CONVERSATION_MESSAGE = (
+    "This conversation has grown too long for me to continue (about {tokens:,} tokens; "
+    "the limit is {limit:,}). Please clear it and ask again."
+)
+REJECTED_MESSAGE = (
+    "That message is too long for me to answer in one go (about {tokens:,} tokens; "
+    "the limit is {limit:,}). Could you shorten it or send the key parts?"
+)
+PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class InputBudgetExceeded(ValueError):
+    """A request was rejected before calling the API; str() is shown to the visitor."""
+
+
+class TokenEstimator:
+    """Fast local token counts, scaled by a ratio learned from API usage.
+
+    The raw count is characters / CHARS_PER_TOKEN, but never fewer than one
+    per word or symbol (code, numbers and non-English text tokenize denser).
+    Raw counts are cached per text in a small LRU, so a conversation's
+    history and the system prompt are counted once. observe() folds each
+    (raw estimate, actual input_tokens) pair into an exponential moving
+    average of their ratio, which estimate() applies.
+    """
+
+    def __init__(self, cache_size: int = ESTIMATE_CACHE_SIZE, alpha: float = CALIBRATION_ALPHA):
+        self.cache_size = cache_size
+        self.alpha = alpha
+        self.ratio = 1.0
+        self.samples = 0
+        self._cache = OrderedDict()  # text -> raw count
+        self._lock = threading.Lock()
+
+    def raw_count(self, text: str) -> int:
+        with self._lock:
+            count = self._cache.get(text)
+            if count is not None:
+                self._cache.move_to_end(text)
+                return count
+        count = max(math.ceil(len(text) / CHARS_PER_TOKEN), len(PIECE_PATTERN.findall(text)))
+        with self._lock:
+            self._cache[text] = count
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return count
+
+    def raw_request(self, system_texts: Iterable[str], message_texts: Iterable[str]) -> int:
+        """Uncalibrated estimate for a whole request (system blocks + messages)."""
+        system = sum(self.raw_count(text) for text in system_texts)
+        return system + sum(self.raw_count(text) + MESSAGE_OVERHEAD_TOKENS for text in message_texts)
+
+    def calibrated(self, raw: int) -> int:
+        return math.ceil(raw * self.ratio)
+
+    def estimate(self, text: str) -> int:
+        return self.calibrated(self.raw_count(text))
+
+    def observe(self, raw: int, actual: int) -> None:
+        """Update the calibration ratio from one request's actual input token count."""
+        if raw <= 0 or actual <= 0:
+            return
+        low, high = CALIBRATION_BOUNDS
+        sample = min(max(actual / raw, low), high)
+        with self._lock:
+            alpha = 1.0 if self.samples == 0 else self.alpha
+            self.ratio += alpha * (sample - self.ratio)
+            self.samples += 1
+
+
+@dataclass(frozen=True)
+class Preflight:
+    """Size of the next request, checked against the input budget before sending."""
+    estimated_tokens: int  # whole request, calibrated
+    user_tokens: int
+    budget: int
+    user_limit: int
+    policy: str
+
+    @property
+    def user_over_limit(self) -> bool:
+        return self.user_tokens > self.user_limit
+
+    @property
+    def over_budget(self) -> bool:
+        return self.estimated_tokens > self.budget
+
+    @property
+    def action(self) -> str:
+        """'ok', or what enforcement will do: 'trim', 'compact' or 'reject'."""
+        if not (self.user_over_limit or self.over_budget):
+            return 'ok'
+        if self.policy == 'compact' and not self.over_budget:
+            return 'trim'  # only the message itself is long; there is nothing to compact
+        return self.policy
+
+    @property
+    def notice(self) -> str:
+        """One-line explanation for the UI, or '' when the request fits."""
+        action = self.action
+        if action == 'ok':
+            return ''
+        if action == 'reject':
+            if self.user_over_limit:
+                return REJECTED_MESSAGE.format(tokens=self.user_tokens, limit=self.user_limit)
+            return REJECTED_CONVERSATION_MESSAGE.format(tokens=self.estimated_tokens, limit=self.budget)
+        size = f"~{self.estimated_tokens:,} tokens against a {self.budget:,} budget"
+        if action == 'compact':
+            return f"Long conversation ({size}): older turns will be summarized before sending."
+        return f"Long message ({size}): it will be trimmed before sending."
+
+
+def trim_text(text: str, max_tokens: int, estimator: TokenEstimator) -> str:
+    """Keep the head and tail of text within max_tokens, marking the cut."""
+    tokens = estimator.estimate(text)
+    if tokens <= max_tokens:
+        return text
+    keep_chars = max(int(len(text) * max_tokens / tokens) - len(TRIM_MARKER) - 8, 0)
+    head = text[: keep_chars * 2 // 3]
+    tail = text[len(text) - keep_chars // 3:] if keep_chars // 3 else ""
+    return head + TRIM_MARKER.format(count=tokens - max_tokens) + tail
+
+
+_estimator = None
+_estimator_lock = threading.Lock()
+
+
+def get_estimator() -> TokenEstimator:
+    """Process-wide estimator, so every session shares one calibration."""
+    global _estimator
+    if _estimator is None:
+        with _estimator_lock:
+            if _estimator is None:
+                _estimator = TokenEstimator()
+    return _estimator
+
+
+def validate_policy(policy: Optional[str]) -> str:
+    policy = (policy or INPUT_BUDGET_POLICY).lower()
+    if policy not in BUDGET_POLICIES:
+        raise ValueError(f"Unknown input budget policy {policy!r}; expected one of {BUDGET_POLICIES}")
+    return policy
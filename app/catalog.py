@@ -0,0 +1,182 @@
+"""
+catalog.py
+Purpose: Lazily loaded, memory-capped LRU of hosted profiles selected by slug
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from assets import Asset, evict_asset, get_asset
+from compiler import PromptBudgetExceeded
+from registry import CompiledProfile, evict_profile, get_compiled_profile
+from retrieval import evict_retriever
+
+
+APP_DIR = Path(__file__).parent
+PROFILES_DIR = Path(os.getenv('PROFILES_DIR', str(APP_DIR / 'profiles')))
+DEFAULT_PROFILE_SLUG = 'default'
+PROFILE_CACHE_MAX_BYTES = int(os.getenv('PROFILE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+SLUG_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+@dataclass(frozen=True)
+class ProfileEntry:
+    """Everything one hosted profile needs at render time, shared by its sessions."""
+    slug: str
+    compiled: CompiledProfile
+    pdf: Optional[Asset]
+    size_bytes: int
+
+    @property
+    def profile_path(self) -> str:
+        return self.compiled.path
+
+    @property
+    def pdf_filename(self) -> Optional[str]:
+        return Path(self.pdf.path).name if self.pdf else None
+
+    @property
+    def over_budget(self) -> bool:
+        """Too large for the full prompt; its agents run in retrieval mode."""
+        return self.compiled.over_budget
+
+
+def _entry_size(compiled: CompiledProfile, pdf: Optional[Asset]) -> int:
+    """Approximate resident bytes: source + prompt + compiled sections + PDF."""
+    text = len(compiled.profile_yaml) + len(compiled.system_prompt)
+    text += sum(len(section) for section in compiled.sections.values())
+    # parsed profile dicts/strings cost a few times the raw text in CPython
+    return 4 * text + (len(pdf.data) if pdf else 0)
+
+
+class ProfileCatalog:
+    """Maps URL slugs to profiles on disk and keeps recently used ones loaded.
+
+    Layout: <root>/<slug>/profile.yaml plus an optional PDF CV in the same
+    directory; the default slug serves the bundled profile. Profiles load on
+    first request; once their approximate footprint exceeds max_bytes the least
+    recently used are evicted (their registry and asset entries too). Sessions
+    already holding an evicted profile keep working on their own reference.
+    With enforce_budget on, an over-budget profile is dropped (get() returns
+    None for its slug) while every other profile keeps serving.
+    """
+
+    def __init__(
+        self,
+        root: Path = PROFILES_DIR,
+        default_profile: Path = APP_DIR / 'profile.yaml',
+        default_pdf: Optional[Path] = APP_DIR / 'Gregory_E_Schwartz_Cv.pdf',
+        max_bytes: int = PROFILE_CACHE_MAX_BYTES,
+        enforce_budget: bool = False,
+    ):
+        self.root = Path(root)
+        self.enforce_budget = enforce_budget
+        self.default_profile = Path(default_profile)
+        self.default_pdf = Path(default_pdf) if default_pdf else None
+        self.max_bytes = max_bytes
+        self.stats = {'loads': 0, 'hits': 0, 'evictions': 0, 'rejected': 0}
+        self._entries = OrderedDict()  # slug -> ProfileEntry
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def paths(self, slug: str):
+        """(profile path, pdf path or None) for a slug, or None if unknown/invalid."""
+        if slug == DEFAULT_PROFILE_SLUG:
+            return self.default_profile, self.default_pdf
+        if not SLUG_PATTERN.match(slug):
+            return None
+        directory = self.root / slug
+        profile_path = directory / 'profile.yaml'
+        if not profile_path.is_file():
+            return None
+        pdfs = sorted(directory.glob('*.pdf'))
+        return profile_path, (pdfs[0] if pdfs else None)
+
+    def _compile(self, slug: str, profile_path: str) -> Optional[CompiledProfile]:
+        """Compiled profile, or None (logged and counted) if it is rejected over budget."""
+        try:
+            return get_compiled_profile(profile_path, enforce_budget=self.enforce_budget)
+        except PromptBudgetExceeded as error:
+            with self._lock:
+                self.stats['rejected'] += 1
+                if slug in self._entries:
+                    self._remove(slug, release=True)
+            print(f"[CATALOG ERROR] Dropping profile '{slug}': {error}")
+            return None
+
+    def get(self, slug: Optional[str]) -> Optional[ProfileEntry]:
+        """Loaded profile for slug (default when empty), or None if it does not exist or is rejected."""
+        slug = (slug or DEFAULT_PROFILE_SLUG).strip().lower()
+        with self._lock:
+            entry = self._entries.get(slug)
+        if entry is not None:
+            compiled = self._compile(slug, entry.profile_path)
+            if compiled is None:
+                return None
+            with self._lock:
+                if compiled is entry.compiled and self._entries.get(slug) is entry:
+                    self._entries.move_to_end(slug)
+                    self.stats['hits'] += 1
+                    return entry
+
+        paths = self.paths(slug)
+        if paths is None:
+            return None
+        profile_path, pdf_path = paths
+        # compile outside the lock so one slow profile does not stall the others
+        compiled = self._compile(slug, str(profile_path))
+        if compiled is None:
+            return None
+        pdf = get_asset(pdf_path) if pdf_path else None
+        entry = ProfileEntry(slug, compiled, pdf, _entry_size(compiled, pdf))
+
+        with self._lock:
+            if slug in self._entries:
+                self._remove(slug, release=False)
+            self._entries[slug] = entry
+            self._bytes += entry.size_bytes
+            self.stats['loads'] += 1
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)), release=True)
+                self.stats['evictions'] += 1
+        return entry
+
+    def _remove(self, slug: str, release: bool) -> None:
+        entry = self._entries.pop(slug)
+        self._bytes -= entry.size_bytes
+        if release:
+            evict_profile(entry.profile_path)
+            evict_retriever(entry.profile_path)
+            if entry.pdf:
+                evict_asset(entry.pdf.path)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def loaded_bytes(self) -> int:
+        return self._bytes
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> ProfileCatalog:
+    """Process-wide ProfileCatalog."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ProfileCatalog()
+    return _catalog
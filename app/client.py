@@ -0,0 +1,217 @@
+"""
+client.py
+Purpose: Process-wide pooled Anthropic client shared by every agent session
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Optional
+
+try:
+    from anthropic import (
+        Anthropic,
+        AsyncAnthropic,
+        DefaultAsyncHttpxClient,
+        DefaultHttpxClient,
+    )
+except ImportError:
+    Anthropic = None
+    AsyncAnthropic = None
+    DefaultAsyncHttpxClient = None
+    DefaultHttpxClient = None
+
+# the SDK's transport: httpx on most releases, httpx2 on newer ones
+try:
+    import httpx
+except ImportError:
+    try:
+        import httpx2 as httpx
+    except ImportError:
+        httpx = None
+
+
+POOL_SIZE = int(os.getenv('ANTHROPIC_POOL_SIZE', '20'))
+# one event loop multiplexes many streams, so the async pool is much wider
+ASYNC_POOL_SIZE = int(os.getenv('ANTHROPIC_ASYNC_POOL_SIZE', '256'))
+KEEPALIVE_SECONDS = float(os.getenv('ANTHROPIC_KEEPALIVE_SECONDS', '120'))
+CONNECT_TIMEOUT = float(os.getenv('ANTHROPIC_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.getenv('ANTHROPIC_READ_TIMEOUT', '120'))
+
+
+class ConnectionStats:
+    """Thread-safe counters for requests sent vs. TCP connections opened."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def record(self, event_name: str, info: dict = None) -> None:
+        """httpcore trace callback; counts new connections and sent requests."""
+        if event_name == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.new_connections += 1
+        elif event_name.endswith('send_request_headers.started'):
+            with self._lock:
+                self.requests += 1
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            requests, new_connections = self.requests, self.new_connections
+        return {
+            'requests': requests,
+            'new_connections': new_connections,
+            'reused_connections': max(requests - new_connections, 0),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.new_connections = 0
+
+
+connection_stats = ConnectionStats()
+
+_lock = threading.Lock()
+_clients = {}       # (api key, base url) -> Anthropic
+_http_clients = {}  # (api key, base url) -> pooled http client backing that Anthropic
+# async connections are bound to the loop that opened them: one client per loop
+_async_clients = weakref.WeakKeyDictionary()  # loop -> {(api key, base url): AsyncAnthropic}
+
+
+def _attach_trace(request) -> None:
+    """httpx request hook: route httpcore trace events into connection_stats."""
+    request.extensions.setdefault('trace', connection_stats.record)
+
+
+async def _record_async(event_name: str, info: dict = None) -> None:
+    connection_stats.record(event_name, info)
+
+
+async def _attach_trace_async(request) -> None:
+    """Async httpcore requires a coroutine trace callback."""
+    request.extensions.setdefault('trace', _record_async)
+
+
+def _pool_options(pool_size, keepalive_seconds, connect_timeout, read_timeout) -> dict:
+    return {
+        'limits': httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_seconds,
+        ),
+        'timeout': httpx.Timeout(read_timeout, connect=connect_timeout),
+    }
+
+
+def build_http_client(
+    pool_size: int = POOL_SIZE,
+    keepalive_seconds: float = KEEPALIVE_SECONDS,
+    connect_timeout: float = CONNECT_TIMEOUT,
+    read_timeout: float = READ_TIMEOUT,
+):
+    """Build the pooled HTTP client the shared Anthropic client rides on."""
+    if DefaultHttpxClient is None or httpx is None:
+        return None
+    return DefaultHttpxClient(
+        event_hooks={'request': [_attach_trace]},
+        **_pool_options(pool_size, keepalive_seconds, connect_timeout, read_timeout),
+    )
+
+
+def build_async_http_client(
+    pool_size: int = ASYNC_POOL_SIZE,
+    keepalive_seconds: float = KEEPALIVE_SECONDS,
+    connect_timeout: float = CONNECT_TIMEOUT,
+    read_timeout: float = READ_TIMEOUT,
+):
+    """Async counterpart of build_http_client, for AsyncAnthropic."""
+    if DefaultAsyncHttpxClient is None or httpx is None:
+        return None
+    return DefaultAsyncHttpxClient(
+        event_hooks={'request': [_attach_trace_async]},
+        **_pool_options(pool_size, keepalive_seconds, connect_timeout, read_timeout),
+    )
+
+
+def _client_key():
+    """(api key, base url) from the environment, or None if the API is not configured."""
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        return None
+    return api_key, os.getenv('ANTHROPIC_BASE_URL')
+
+
+def get_shared_client() -> Optional["Anthropic"]:
+    """Return the process-wide Anthropic client, or None if the API is not configured."""
+    key = _client_key()
+    if key is None or Anthropic is None:
+        return None
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = build_http_client()
+            # 429/529 retries belong to the scheduler (retry-after, priority, stats)
+            client = Anthropic(api_key=key[0], base_url=key[1], http_client=http_client,
+                               max_retries=0)
+            _clients[key] = client
+            _http_clients[key] = http_client
+    return client
+
+
+def get_shared_async_client() -> Optional["AsyncAnthropic"]:
+    """Return the AsyncAnthropic client shared by everything on the running event loop."""
+    key = _client_key()
+    if key is None or AsyncAnthropic is None:
+        return None
+
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _async_clients.setdefault(loop, {})
+        client = per_loop.get(key)
+        if client is None:
+            client = AsyncAnthropic(
+                api_key=key[0], base_url=key[1], http_client=build_async_http_client(),
+                max_retries=0,
+            )
+            per_loop[key] = client
+    return client
+
+
+def prewarm_connection() -> bool:
+    """Open a keep-alive connection to the API host so the first turn skips TCP/TLS setup."""
+    client = get_shared_client()
+    http_client = _http_clients.get(_client_key())
+    if client is None or http_client is None:
+        return False
+    try:
+        http_client.head(str(client.base_url))
+        return True
+    except Exception:
+        return False
+
+
+def reset_shared_client() -> None:
+    """Close and forget every shared client (tests and key rotation)."""
+    with _lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
+        _http_clients.clear()
+        _async_clients.clear()
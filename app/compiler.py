@@ -0,0 +1,165 @@
+"""
+compiler.py
+Purpose: Compile a parsed profile into canonical, token-minimal prompt text with a token budget
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+
+Run as a script to print the per-section token report for a profile:
+    python app/compiler.py [path/to/profile.yaml] [--exact]
+"""
+
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from history import estimate_tokens
+
+
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '12000'))
+INLINE_ITEM_CHARS = 40  # lists of short scalars (skills, tags) go on one line
+
+
+class PromptBudgetExceeded(ValueError):
+    """The compiled system prompt is larger than PROMPT_TOKEN_BUDGET."""
+
+
+def _scalar(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    text = re.sub(r"\s+", " ", str(value)).strip()
+    return text or None
+
+
+def _is_empty(value: Any) -> bool:
+    if isinstance(value, (dict, list, tuple)):
+        return not value
+    return _scalar(value) is None
+
+
+def _is_scalar(value: Any) -> bool:
+    return not isinstance(value, (dict, list, tuple))
+
+
+def _inline(items) -> bool:
+    return all(_is_scalar(item) and len(_scalar(item) or "") <= INLINE_ITEM_CHARS
+               for item in items)
+
+
+def _emit(value: Any, depth: int, lines: List[str], prefix: str = "") -> None:
+    """Append a YAML-like rendering of value: one-space indents, no quotes, no blanks."""
+    pad = " " * depth
+    if isinstance(value, dict):
+        first = True
+        for key, item in value.items():
+            if _is_empty(item):
+                continue
+            lead = prefix if first else " " * len(prefix)
+            first = False
+            if _is_scalar(item):
+                lines.append(f"{pad}{lead}{key}: {_scalar(item)}")
+            elif not isinstance(item, dict) and _inline(item):
+                lines.append(f"{pad}{lead}{key}: {_join(item)}")
+            else:
+                lines.append(f"{pad}{lead}{key}:")
+                _emit(item, depth + len(lead) + 1, lines)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            if _is_empty(item):
+                continue
+            if _is_scalar(item):
+                lines.append(f"{pad}- {_scalar(item)}")
+            else:
+                _emit(item, depth, lines, prefix="- ")
+    else:
+        lines.append(f"{pad}{prefix}{_scalar(value)}")
+
+
+def _join(items) -> str:
+    """Inline a list of scalars; ';' only when an item already contains a comma."""
+    texts = [text for text in (_scalar(item) for item in items) if text]
+    separator = "; " if any("," in text for text in texts) else ", "
+    return separator.join(texts)
+
+
+def canonical_section(key: str, value: Any) -> str:
+    lines = []
+    _emit({key: value}, 0, lines)
+    return "\n".join(lines)
+
+
+def compile_profile(profile: Dict[str, Any]) -> Dict[str, str]:
+    """Canonical text per top-level section, in authored order (empty sections dropped).
+
+    Comments, quoting and layout of the source YAML do not survive parsing, so
+    two files with the same data compile to byte-identical text.
+    """
+    return {
+        key: canonical_section(key, value)
+        for key, value in profile.items()
+        if not _is_empty(value)
+    }
+
+
+def profile_text(sections: Dict[str, str]) -> str:
+    return "\n".join(sections.values())
+
+
+def section_token_counts(sections: Dict[str, str]) -> Dict[str, int]:
+    return {key: estimate_tokens(text) for key, text in sections.items()}
+
+
+def check_budget(system_prompt: str, budget: int = PROMPT_TOKEN_BUDGET,
+                 sections: Optional[Dict[str, str]] = None) -> int:
+    """Return the prompt's estimated tokens; raise PromptBudgetExceeded over budget."""
+    tokens = estimate_tokens(system_prompt)
+    if budget and tokens > budget:
+        largest = ""
+        if sections:
+            counts = section_token_counts(sections)
+            top = sorted(counts, key=counts.get, reverse=True)[:3]
+            largest = " Largest sections: " + ", ".join(f"{key}={counts[key]}" for key in top)
+        raise PromptBudgetExceeded(
+            f"System prompt is ~{tokens} tokens, over PROMPT_TOKEN_BUDGET={budget}.{largest}"
+        )
+    return tokens
+
+
+def _exact_counts(sections: Dict[str, str]) -> Optional[Dict[str, int]]:
+    """Per-section counts from the count_tokens endpoint, or None without an API key."""
+    from client import get_shared_client
+    from agent import MODEL_ID
+
+    client = get_shared_client()
+    if client is None:
+        return None
+    counts = {}
+    for key, text in sections.items():
+        result = client.messages.count_tokens(
+            model=MODEL_ID, messages=[{"role": "user", "content": text}]
+        )
+        counts[key] = result.input_tokens
+    return counts
+
+
+if __name__ == "__main__":
+    from registry import get_compiled_profile
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    path = args[0] if args else str(Path(__file__).parent / "profile.yaml")
+    raw_tokens = estimate_tokens(Path(path).read_text(encoding='utf-8'))
+    try:
+        compiled = get_compiled_profile(path, enforce_budget=True)
+    except PromptBudgetExceeded as error:
+        print(f"[COMPILER ERROR] {error}")
+        sys.exit(1)
+    exact = _exact_counts(compiled.sections) if '--exact' in sys.argv else None
+    for key, tokens in compiled.section_tokens.items():
+        suffix = f" (exact {exact[key]})" if exact else ""
+        print(f"[COMPILER] {key:<16} ~{tokens} tokens{suffix}")
+    print(f"[COMPILER] profile ~{sum(compiled.section_tokens.values())} tokens "
+          f"(raw YAML ~{raw_tokens}); system prompt ~{compiled.prompt_tokens} "
+          f"of {PROMPT_TOKEN_BUDGET} budget")
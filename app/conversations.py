@@ -0,0 +1,261 @@
+"""
+conversations.py
+Purpose: Persistent conversation store so sessions resume with only their recent window loaded
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import hashlib
+import hmac
+import math
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+
+# 'sqlite' (default) persists conversations; 'off' keeps them in session memory only
+CONVERSATION_STORE = os.getenv('CONVERSATION_STORE', 'sqlite').lower()
+CONVERSATION_DB_PATH = os.getenv(
+    'CONVERSATION_DB_PATH', str(Path(__file__).parent / '.conversations.sqlite3')
+)
+# messages kept in memory per session; older ones stay on disk until asked for
+CONVERSATION_WINDOW_MESSAGES = int(os.getenv('CONVERSATION_WINDOW_MESSAGES', '20'))
+# signs the ?c= resume tokens; when unset, a random secret is generated once and kept in the store
+CONVERSATION_SECRET = os.getenv('CONVERSATION_SECRET', '')
+# how long a resume link stays valid (refreshed on every answer)
+CONVERSATION_RESUME_TTL_SECONDS = float(os.getenv('CONVERSATION_RESUME_TTL_SECONDS', '86400'))
+
+
+def sign_resume_token(secret: str, conversation_id: str, expires: int) -> str:
+    """'<id>.<expires>.<hmac>': resumes conversation_id until the unix time expires."""
+    payload = f"{conversation_id}.{expires}"
+    signature = hmac.new(secret.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()
+    return f"{payload}.{signature[:32]}"
+
+
+def verify_resume_token(secret: str, token: Optional[str], now: Optional[float] = None) -> Optional[str]:
+    """The conversation id of a valid, unexpired token, else None."""
+    try:
+        conversation_id, expires, _ = (token or '').split('.')
+        expires = int(expires)
+    except ValueError:
+        return None
+    expected = sign_resume_token(secret, conversation_id, expires)
+    if not hmac.compare_digest(expected, token):
+        return None
+    if expires < (time.time() if now is None else now):
+        return None
+    return conversation_id
+
+
+def _from_user_turn(messages: List[dict]) -> List[dict]:
+    while messages and messages[0]['role'] != 'user':
+        messages.pop(0)
+    return messages
+
+
+class ConversationStore:
+    """Interface for conversation backends; messages are {'role', 'content'} dicts.
+
+    Conversations are addressed by an opaque id and belong to one profile
+    slug. The page URL carries a signed, expiring resume token for the id
+    (resume_token/resolve), never the bare id. Writes are incremental, one message at a time,
+    and reads return only a recent window, so a resumed session never loads
+    the whole transcript.
+    """
+
+    def create(self, profile: str) -> str:
+        raise NotImplementedError
+
+    def profile_of(self, conversation_id: str) -> Optional[str]:
+        """Profile slug the conversation belongs to, or None if it does not exist."""
+        raise NotImplementedError
+
+    def append(self, conversation_id: str, role: str, content: str) -> None:
+        raise NotImplementedError
+
+    def recent(self, conversation_id: str, limit: int = CONVERSATION_WINDOW_MESSAGES) -> List[dict]:
+        """Up to limit newest messages, oldest first, starting at a user turn."""
+        raise NotImplementedError
+
+    def count(self, conversation_id: str) -> int:
+        raise NotImplementedError
+
+    def summary(self, conversation_id: str) -> str:
+        """Rolling history summary (see history.HistoryCompactor), '' if none."""
+        raise NotImplementedError
+
+    def save_summary(self, conversation_id: str, summary: str, covered: int = 0) -> None:
+        """Store the summary of the conversation's first covered messages."""
+        raise NotImplementedError
+
+    def unsummarized(self, conversation_id: str) -> List[dict]:
+        """Every message after those the summary covers, oldest first, from a user turn.
+
+        Together with summary() this is the whole conversation, which is what
+        a resumed agent needs; recent() is only the window shown on the page.
+        """
+        raise NotImplementedError
+
+    def clear(self, conversation_id: str) -> None:
+        """Forget a conversation's messages and summary; the id stays valid."""
+        raise NotImplementedError
+
+    secret = ''
+
+    def resume_token(self, conversation_id: str,
+                     ttl_seconds: float = CONVERSATION_RESUME_TTL_SECONDS) -> str:
+        # expiry rounded up to the hour, so the URL does not change on every answer
+        expires = int(math.ceil((time.time() + ttl_seconds) / 3600) * 3600)
+        return sign_resume_token(self.secret, conversation_id, expires)
+
+    def resolve(self, token: Optional[str]) -> Optional[str]:
+        """Conversation id for a resume token, or None if forged, expired or unknown."""
+        conversation_id = verify_resume_token(self.secret, token)
+        if conversation_id is None or self.profile_of(conversation_id) is None:
+            return None
+        return conversation_id
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteConversationStore(ConversationStore):
+    """ConversationStore on one SQLite file (WAL), shared by every session thread."""
+
+    def __init__(self, path: Optional[str] = CONVERSATION_DB_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS conversations ('
+            ' id TEXT PRIMARY KEY, profile TEXT, summary TEXT DEFAULT \'\','
+            ' created REAL, updated REAL, summary_seq INTEGER DEFAULT 0)'
+        )
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(conversations)')]
+        if 'summary_seq' not in columns:
+            self._db.execute('ALTER TABLE conversations ADD COLUMN summary_seq INTEGER DEFAULT 0')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS messages ('
+            ' conversation TEXT, seq INTEGER, role TEXT, content TEXT, created REAL,'
+            ' PRIMARY KEY (conversation, seq))'
+        )
+        self._db.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)')
+        self._db.execute(
+            'INSERT OR IGNORE INTO settings (key, value) VALUES (\'resume_secret\', ?)',
+            (secrets.token_hex(32),),
+        )
+        self._db.commit()
+        self.secret = CONVERSATION_SECRET or self._db.execute(
+            'SELECT value FROM settings WHERE key = \'resume_secret\''
+        ).fetchone()[0]
+
+    def create(self, profile: str) -> str:
+        conversation_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO conversations (id, profile, created, updated) VALUES (?, ?, ?, ?)',
+                (conversation_id, profile, now, now),
+            )
+            self._db.commit()
+        return conversation_id
+
+    def profile_of(self, conversation_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT profile FROM conversations WHERE id = ?', (conversation_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def append(self, conversation_id: str, role: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO messages (conversation, seq, role, content, created)'
+                ' SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM messages WHERE conversation = ?',
+                (conversation_id, role, content, now, conversation_id),
+            )
+            self._db.execute(
+                'UPDATE conversations SET updated = ? WHERE id = ?', (now, conversation_id)
+            )
+            self._db.commit()
+
+    def recent(self, conversation_id: str, limit: int = CONVERSATION_WINDOW_MESSAGES) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT role, content FROM messages WHERE conversation = ?'
+                ' ORDER BY seq DESC LIMIT ?',
+                (conversation_id, limit),
+            ).fetchall()
+        return _from_user_turn([{'role': role, 'content': content} for role, content in reversed(rows)])
+
+    def unsummarized(self, conversation_id: str) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT m.role, m.content FROM messages m JOIN conversations c ON c.id = m.conversation'
+                ' WHERE m.conversation = ? AND m.seq > c.summary_seq ORDER BY m.seq',
+                (conversation_id,),
+            ).fetchall()
+        return _from_user_turn([{'role': role, 'content': content} for role, content in rows])
+
+    def count(self, conversation_id: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM messages WHERE conversation = ?', (conversation_id,)
+            ).fetchone()[0]
+
+    def summary(self, conversation_id: str) -> str:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT summary FROM conversations WHERE id = ?', (conversation_id,)
+            ).fetchone()
+        return (row[0] or '') if row else ''
+
+    def save_summary(self, conversation_id: str, summary: str, covered: int = 0) -> None:
+        with self._lock:
+            self._db.execute(
+                'UPDATE conversations SET summary = ?, summary_seq = ? WHERE id = ?',
+                (summary, covered, conversation_id),
+            )
+            self._db.commit()
+
+    def clear(self, conversation_id: str) -> None:
+        with self._lock:
+            self._db.execute('DELETE FROM messages WHERE conversation = ?', (conversation_id,))
+            self._db.execute(
+                'UPDATE conversations SET summary = \'\', summary_seq = 0, updated = ? WHERE id = ?',
+                (time.time(), conversation_id),
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+# CONVERSATION_STORE value -> factory; register other backends here
+STORE_BACKENDS = {
+    'sqlite': SQLiteConversationStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> Optional[ConversationStore]:
+    """Process-wide store for CONVERSATION_STORE, or None when persistence is off."""
+    global _store
+    if CONVERSATION_STORE not in STORE_BACKENDS:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = STORE_BACKENDS[CONVERSATION_STORE]()
+    return _store
@@ -0,0 +1,182 @@
+"""
+history.py
+Purpose: Token-budgeted conversation history with background summarization
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import os
+import threading
+from typing import Callable, List, Optional
+
+
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', '6000'))
+HISTORY_KEEP_TURNS = int(os.getenv('HISTORY_KEEP_TURNS', '4'))
+CHARS_PER_TOKEN = 4
+EXTRACT_CHARS_PER_MESSAGE = 240
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English prose)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def message_text(message: dict) -> str:
+    """Plain text of a message whose content is a string or a list of text blocks."""
+    content = message["content"]
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content)
+
+
+def estimate_history_tokens(history: List[dict]) -> int:
+    return sum(estimate_tokens(message_text(message)) for message in history)
+
+
+def format_transcript(messages: List[dict]) -> str:
+    """Render messages as 'Visitor:' / 'Me:' lines for the summarizer."""
+    speakers = {"user": "Visitor", "assistant": "Me"}
+    return "\n".join(
+        f"{speakers.get(m['role'], m['role'])}: {message_text(m)}" for m in messages
+    )
+
+
+def extractive_summary(previous_summary: str, messages: List[dict]) -> str:
+    """Fallback summary when no model is available: clipped transcript lines."""
+    lines = [previous_summary] if previous_summary else []
+    for line in format_transcript(messages).splitlines():
+        if line.strip():
+            lines.append(line[:EXTRACT_CHARS_PER_MESSAGE])
+    return "\n".join(lines)
+
+
+class HistoryCompactor:
+    """Fold older turns into a rolling summary once history exceeds a token budget.
+
+    The summary is computed on a background thread after a turn completes, so
+    it never delays a response; the thread only sees a snapshot of history.
+    The owner applies the finished summary with apply() on its own thread
+    before it next touches history, which drops the folded messages. The
+    newest keep_recent_turns exchanges stay verbatim. Until a summary is
+    applied, requests simply carry the full history.
+    """
+
+    def __init__(
+        self,
+        summarize: Optional[Callable[[str, List[dict]], str]] = None,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        keep_recent_turns: int = HISTORY_KEEP_TURNS,
+    ):
+        self.summarize = summarize or extractive_summary
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.summary = ""
+        self._lock = threading.Lock()
+        self._worker = None
+        self._generation = 0
+        self._pending = None  # (summary, folded messages) waiting for apply()
+
+    def _fold_boundary(self, history: List[dict]) -> int:
+        """Index of the first message to keep verbatim (always a user turn)."""
+        boundary = max(len(history) - 2 * self.keep_recent_turns, 0)
+        while boundary < len(history) and history[boundary]["role"] != "user":
+            boundary += 1
+        return boundary if boundary < len(history) else 0
+
+    def needs_compaction(self, history: List[dict]) -> bool:
+        if self._fold_boundary(history) == 0:
+            return False
+        used = estimate_history_tokens(history) + estimate_tokens(self.summary)
+        return used > self.token_budget
+
+    def maybe_compact(self, history: List[dict], background: bool = True) -> bool:
+        """Start a compaction if the budget is exceeded; returns True if one started.
+
+        In the background the summary waits for apply(); in the foreground
+        it is applied to history before returning.
+        """
+        if not self.needs_compaction(history):
+            return False
+        if not background:
+            self.compact(history)
+            return True
+        with self._lock:
+            if self._pending is not None or (self._worker is not None and self._worker.is_alive()):
+                return False
+            snapshot = list(history)
+            self._worker = threading.Thread(
+                target=self._summarize, args=(snapshot, self._generation), daemon=True
+            )
+            self._worker.start()
+        return True
+
+    def _summarize(self, messages: List[dict], generation: int,
+                   summarize: Optional[Callable[[str, List[dict]], str]] = None):
+        """Summarize messages up to the fold boundary; never touches the live history."""
+        boundary = self._fold_boundary(messages)
+        if boundary == 0:
+            return None
+        folded = messages[:boundary]
+        try:
+            new_summary = (summarize or self.summarize)(self.summary, folded)
+        except Exception:
+            new_summary = extractive_summary(self.summary, folded)
+        with self._lock:
+            # the conversation may have been reset while we were summarizing
+            if generation != self._generation:
+                return None
+            self._pending = (new_summary, folded)
+        return self._pending
+
+    def apply(self, history: List[dict]) -> bool:
+        """Fold a finished background summary into history; call on the owner's thread.
+
+        The summary is discarded if the messages it covers are no longer the
+        start of history (they were trimmed or replaced in the meantime).
+        """
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return False
+        new_summary, folded = pending
+        if len(history) < len(folded) or any(a is not b for a, b in zip(history, folded)):
+            return False
+        self.summary = new_summary
+        del history[:len(folded)]
+        return True
+
+    def compact(self, history: List[dict],
+                summarize: Optional[Callable[[str, List[dict]], str]] = None) -> None:
+        """Summarize history up to the fold boundary and drop those messages now.
+
+        summarize overrides the compactor's summarizer for this call (e.g. a
+        caller waiting on the result submits it at its own priority).
+        """
+        self.apply(history)
+        if self._fold_boundary(history) and self._summarize(list(history), self._generation, summarize):
+            self.apply(history)
+
+    def system_block(self) -> Optional[dict]:
+        """Summary as an extra system block (after the cached profile prompt), if any."""
+        if not self.summary:
+            return None
+        return {
+            "type": "text",
+            "text": (
+                "=== EARLIER IN THIS CONVERSATION (summary) ===\n"
+                f"{self.summary}\n"
+                "=== END SUMMARY ==="
+            ),
+        }
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until any in-flight compaction finishes (tests, shutdown)."""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._pending = None
+            self.summary = ""
@@ -0,0 +1,205 @@
+"""
+images.py
+Purpose: Build-time resized/recompressed image variants and runtime variant lookup
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+
+Run as a script after changing an image in app/static (requires Pillow):
+    python app/images.py
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+STATIC_DIR = Path(__file__).parent / "static"
+VARIANTS_DIR = STATIC_DIR / "variants"
+MANIFEST_PATH = VARIANTS_DIR / "manifest.json"
+
+# source image -> CSS width (px) it is displayed at
+IMAGE_DISPLAY_WIDTHS = {
+    'lion_avatar.png': 32,   # chat bubble avatar (Streamlit renders 2rem)
+    'lion_hero.png': 320,    # sidebar mascot component
+}
+IMAGE_SCALES = (1, 2)
+IMAGE_FORMATS = ('webp', 'png')
+WEBP_QUALITY = 82
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _encode(image, fmt: str, target: Path) -> None:
+    if fmt == 'webp':
+        image.save(target, 'WEBP', quality=WEBP_QUALITY, method=6)
+    else:
+        # palette PNGs are a fraction of the size for flat illustration art
+        image.quantize(colors=256, dither=0).save(target, 'PNG', optimize=True)
+
+
+def build_variants(
+    display_widths: Dict[str, int] = IMAGE_DISPLAY_WIDTHS,
+    source_dir: Path = STATIC_DIR,
+    variants_dir: Path = VARIANTS_DIR,
+    scales: Iterable[int] = IMAGE_SCALES,
+    formats: Iterable[str] = IMAGE_FORMATS,
+) -> dict:
+    """Write every (scale, format) variant of each source image plus the manifest.
+
+    Variants are never upscaled past the source; the manifest records the
+    source's sha256 so a stale manifest is ignored at runtime.
+    """
+    try:
+        from PIL import Image
+    except ImportError as error:
+        raise RuntimeError("Building image variants requires Pillow (pip install Pillow)") from error
+
+    variants_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for name, display_width in display_widths.items():
+        source = source_dir / name
+        if not source.exists():
+            continue
+        with Image.open(source) as original:
+            image = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+        source_hash = _sha256(source)
+        entries = []
+        for scale in scales:
+            width = min(display_width * scale, image.width)
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                filename = f"{source.stem}.{source_hash[:8]}.{width}w.{fmt}"
+                _encode(resized, fmt, variants_dir / filename)
+                entries.append({
+                    'file': filename,
+                    'format': fmt,
+                    'scale': scale,
+                    'width': width,
+                    'height': height,
+                    'bytes': (variants_dir / filename).stat().st_size,
+                })
+        manifest[name] = {
+            'source_hash': source_hash,
+            'source_bytes': source.stat().st_size,
+            'display_width': display_width,
+            'variants': entries,
+        }
+
+    # remove variants of older source versions
+    keep = {entry['file'] for item in manifest.values() for entry in item['variants']}
+    for stale in variants_dir.iterdir():
+        if stale.name != MANIFEST_PATH.name and stale.name not in keep:
+            stale.unlink()
+
+    manifest_path = variants_dir / MANIFEST_PATH.name
+    tmp = variants_dir / f".{uuid.uuid4().hex}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding='utf-8')
+    os.replace(tmp, manifest_path)
+    return manifest
+
+
+_lock = threading.Lock()
+_manifests = {}    # manifest path -> ((mtime_ns, size), manifest)
+_source_hashes = {}  # source path -> ((mtime_ns, size), sha256)
+
+
+def _signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_manifest(manifest_path: Path = MANIFEST_PATH) -> dict:
+    """Parsed manifest, re-read only when the file changes; {} if missing or corrupt."""
+    signature = _signature(manifest_path)
+    if signature is None:
+        return {}
+    cached = _manifests.get(str(manifest_path))
+    if cached and cached[0] == signature:
+        return cached[1]
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        manifest = {}
+    with _lock:
+        _manifests[str(manifest_path)] = (signature, manifest)
+    return manifest
+
+
+def _source_hash(source: Path) -> Optional[str]:
+    signature = _signature(source)
+    if signature is None:
+        return None
+    cached = _source_hashes.get(str(source))
+    if cached and cached[0] == signature:
+        return cached[1]
+    digest = _sha256(source)
+    with _lock:
+        _source_hashes[str(source)] = (signature, digest)
+    return digest
+
+
+def variants_for(source: Path, manifest_path: Path = MANIFEST_PATH) -> List[dict]:
+    """Manifest variants of source that still match its bytes (newest build), else []."""
+    entry = load_manifest(manifest_path).get(source.name)
+    if not entry or entry.get('source_hash') != _source_hash(source):
+        return []
+    directory = manifest_path.parent
+    return [
+        dict(variant, path=directory / variant['file'])
+        for variant in entry['variants']
+        if (directory / variant['file']).exists()
+    ]
+
+
+def pick_variant(
+    source: Path,
+    scale: int = 1,
+    formats: Iterable[str] = IMAGE_FORMATS,
+    manifest_path: Path = MANIFEST_PATH,
+) -> Path:
+    """Smallest variant of source at scale in one of formats, or source itself."""
+    formats = tuple(formats)
+    candidates = [
+        variant for variant in variants_for(source, manifest_path)
+        if variant['scale'] == scale and variant['format'] in formats
+    ]
+    if not candidates:
+        return source
+    return min(candidates, key=lambda variant: variant['bytes'])['path']
+
+
+def srcset(
+    source: Path,
+    fmt: str,
+    manifest_path: Path = MANIFEST_PATH,
+) -> List[Tuple[Path, int]]:
+    """[(variant path, scale)] of one format, for building an <img srcset>."""
+    return sorted(
+        ((variant['path'], variant['scale'])
+         for variant in variants_for(source, manifest_path) if variant['format'] == fmt),
+        key=lambda item: item[1],
+    )
+
+
+def clear_image_caches() -> None:
+    """Forget cached manifests and source hashes (tests)."""
+    with _lock:
+        _manifests.clear()
+        _source_hashes.clear()
+
+
+if __name__ == "__main__":
+    built = build_variants()
+    for name, item in built.items():
+        sizes = ", ".join(f"{v['file']}={v['bytes']}B" for v in item['variants'])
+        print(f"[IMAGES] {name} ({item['source_bytes']}B): {sizes}")
@@ -0,0 +1,448 @@
+"""
+leads.py
+Purpose: Non-blocking, batched lead sink for Google Sheets with an on-disk spool
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import json
+import os
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from tools import build_lead_row, get_sheets_service, validate_email
+from tracing import traced
+
+
+LEAD_SPOOL_PATH = os.getenv(
+    'LEAD_SPOOL_PATH', str(Path(__file__).parent / '.lead_spool.jsonl')
+)
+# batches that exhaust LEAD_MAX_ATTEMPTS land here (default: next to the spool)
+LEAD_DEAD_LETTER_PATH = os.getenv('LEAD_DEAD_LETTER_PATH', '')
+LEAD_MAX_ATTEMPTS = int(os.getenv('LEAD_MAX_ATTEMPTS', '10'))
+LEAD_INDEX_PATH = os.getenv(
+    'LEAD_INDEX_PATH', str(Path(__file__).parent / '.leads.sqlite3')
+)
+LEAD_FIELDS = ('company', 'contact_name', 'contact_email', 'role_title', 'notes')
+COMPANY_SUFFIXES = {'inc', 'incorporated', 'llc', 'ltd', 'limited', 'corp',
+                    'corporation', 'co', 'company', 'gmbh', 'plc'}
+# slug of the bundled profile (catalog.DEFAULT_PROFILE_SLUG)
+DEFAULT_LEAD_PROFILE = 'default'
+LEAD_BATCH_SIZE = 50
+LEAD_LINGER_SECONDS = 0.5
+LEAD_BACKOFF_BASE_SECONDS = 1.0
+LEAD_BACKOFF_MAX_SECONDS = 300.0
+SHEETS_RANGE = 'Leads!A:H'
+
+
+class LeadSink:
+    """Queue lead rows and append them to Sheets in batches from one worker thread.
+
+    submit() writes the row to an append-only spool file and returns at once.
+    The worker groups queued rows into a single values.append call, retries
+    failures with jittered exponential backoff, and records an ack in the spool
+    after each successful batch. Rows without an ack are re-queued on start, so
+    leads survive restarts and Sheets outages. A batch that still fails after
+    max_attempts is moved to a dead-letter file, so it cannot block the queue
+    forever. The spool is truncated whenever everything written to it has been
+    acked.
+    """
+
+    def __init__(
+        self,
+        spool_path: Optional[str] = LEAD_SPOOL_PATH,
+        service_factory: Callable = get_sheets_service,
+        sheet_id: Optional[str] = None,
+        batch_size: int = LEAD_BATCH_SIZE,
+        linger_seconds: float = LEAD_LINGER_SECONDS,
+        backoff_base: float = LEAD_BACKOFF_BASE_SECONDS,
+        backoff_max: float = LEAD_BACKOFF_MAX_SECONDS,
+        max_attempts: int = LEAD_MAX_ATTEMPTS,
+        dead_letter_path: Optional[str] = LEAD_DEAD_LETTER_PATH,
+    ):
+        self.spool_path = Path(spool_path) if spool_path else None
+        if dead_letter_path:
+            self.dead_letter_path = Path(dead_letter_path)
+        else:
+            self.dead_letter_path = self.spool_path.with_suffix('.dead.jsonl') if self.spool_path else None
+        self.service_factory = service_factory
+        self.sheet_id = sheet_id or os.getenv('GOOGLE_SHEETS_ID')
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_attempts = max_attempts
+        self.stats = {'submitted': 0, 'appended': 0, 'batches': 0, 'failures': 0,
+                      'dead_lettered': 0}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._next_seq = 1
+        self._acked = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._recover()
+
+    def _recover(self) -> None:
+        """Re-queue spooled rows that were never acked."""
+        if not self.spool_path or not self.spool_path.exists():
+            return
+        rows, acked = {}, 0
+        with open(self.spool_path, 'r', encoding='utf-8') as spool:
+            for line in spool:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from a crash mid-write
+                if 'ack' in record:
+                    acked = max(acked, record['ack'])
+                else:
+                    rows[record['seq']] = record['row']
+        self._acked = acked
+        for seq in sorted(rows):
+            if seq > acked:
+                self._queue.put((seq, rows[seq]))
+        self._next_seq = max([acked, *rows]) + 1
+
+    def _spool(self, record: dict, path: Optional[Path] = None) -> None:
+        path = path or self.spool_path
+        if not path:
+            return
+        with open(path, 'a', encoding='utf-8') as spool:
+            spool.write(json.dumps(record) + '\n')
+            spool.flush()
+            os.fsync(spool.fileno())
+
+    @traced("leads.sink_submit")
+    def submit(
+        self,
+        company: Optional[str],
+        contact_name: Optional[str],
+        contact_email: Optional[str],
+        role_title: Optional[str],
+        notes: Optional[str],
+        status: str = 'New',
+        profile: str = ''
+    ) -> dict:
+        """Spool and enqueue one lead row; never blocks on the Sheets API."""
+        if contact_email and not validate_email(contact_email):
+            return {'status': 'error', 'message': f'Invalid email format: {contact_email}'}
+
+        row = build_lead_row(company, contact_name, contact_email, role_title, notes, status, profile)
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._spool({'seq': seq, 'row': row})
+            self.stats['submitted'] += 1
+            # enqueue in seq order: the worker acks by high-water mark
+            self._queue.put((seq, row))
+        return {'status': 'ok', 'message': 'Lead queued', 'seq': seq}
+
+    @traced("leads.sheets_append")
+    def _append(self, rows: list) -> None:
+        service = self.service_factory()
+        if service is None:
+            raise RuntimeError('Google Sheets service not available')
+        service.spreadsheets().values().append(
+            spreadsheetId=self.sheet_id,
+            range=SHEETS_RANGE,
+            valueInputOption='USER_ENTERED',
+            insertDataOption='INSERT_ROWS',
+            body={'values': rows}
+        ).execute()
+
+    def _next_batch(self) -> list:
+        try:
+            batch = [self._queue.get(timeout=0.2)]
+        except queue.Empty:
+            return []
+        # linger briefly so a burst of leads shares one append call
+        deadline = time.monotonic() + self.linger_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, batch: list) -> bool:
+        """Append a batch, retrying with backoff; dead-letter it after max_attempts.
+
+        Returns False only if the sink stopped first (the batch stays spooled).
+        """
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                self._append([row for _, row in batch])
+            except Exception as error:
+                attempt += 1
+                with self._lock:
+                    self.stats['failures'] += 1
+                if attempt >= self.max_attempts:
+                    self._dead_letter(batch, error)
+                    break
+                delay = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+                print(f"[LEADS] append failed ({error}); retry {attempt} in {delay:.1f}s")
+                self._stop.wait(delay * random.uniform(0.5, 1.0))
+                continue
+            with self._lock:
+                self.stats['appended'] += len(batch)
+                self.stats['batches'] += 1
+            break
+        else:
+            return False
+        with self._lock:
+            self._acked = max(self._acked, batch[-1][0])
+            self._spool({'ack': self._acked})
+            self._after_ack()
+        return True
+
+    def _dead_letter(self, batch: list, error: Exception) -> None:
+        """Park a batch that keeps failing, so the rows behind it can still be delivered."""
+        with self._lock:
+            for seq, row in batch:
+                self._spool({'seq': seq, 'row': row, 'error': str(error)}, self.dead_letter_path)
+            self.stats['dead_lettered'] += len(batch)
+        print(f"[LEADS ERROR] {len(batch)} lead(s) moved to {self.dead_letter_path} "
+              f"after {self.max_attempts} attempts: {error}")
+
+    def _after_ack(self) -> None:
+        """Truncate a fully acked spool and wake flush() waiters (lock held)."""
+        if self.spool_path and self._acked == self._next_seq - 1:
+            self.spool_path.write_text('', encoding='utf-8')
+        self._idle.notify_all()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._deliver(batch)
+
+    def start(self) -> "LeadSink":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every submitted row has been appended."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._acked < self._next_seq - 1:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush what can be flushed, then stop; unacked rows stay in the spool."""
+        self.flush(timeout)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def pending(self) -> int:
+        return self._next_seq - 1 - self._acked
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_lead_sink() -> LeadSink:
+    """Process-wide started LeadSink."""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = LeadSink().start()
+    return _sink
+
+
+def normalize_email(email: Optional[str]) -> str:
+    return (email or '').strip().lower()
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return " ".join((name or '').casefold().split())
+
+
+def normalize_company(company: Optional[str]) -> str:
+    """'Acme, Inc.' and 'ACME' both -> 'acme'."""
+    words = re.sub(r"[^\w\s]", " ", (company or '').casefold()).split()
+    while words and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+class LeadIndex:
+    """Persistent dedupe index over captured leads (SQLite, mirrored in memory).
+
+    Leads are scoped to the hosted profile they came in on, so a recruiter
+    writing to two people is two leads. Within a profile, a lead matches an existing one with the same normalized contact email whose
+    company agrees (or is unknown on either side); failing that, or without an
+    email, it matches on company among email-less leads whose contact name
+    agrees (or is unknown on either side), so a company named first and an
+    email given a turn later stay one lead, while a colleague at the same
+    company gets a lead of their own. Matches are merged:
+    empty fields are filled and new notes appended. Lookups hit in-memory dicts, so record() is
+    O(1) on the _log_lead path; SQLite (WAL) only makes the index outlive the
+    process.
+    """
+
+    def __init__(self, path: Optional[str] = LEAD_INDEX_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS leads ('
+            ' id INTEGER PRIMARY KEY, email_key TEXT, company_key TEXT,'
+            ' company TEXT, contact_name TEXT, contact_email TEXT, role_title TEXT,'
+            ' notes TEXT, first_seen TEXT, last_seen TEXT, times_seen INTEGER,'
+            f' profile TEXT DEFAULT \'{DEFAULT_LEAD_PROFILE}\')'
+        )
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(leads)')]
+        if 'profile' not in columns:
+            # leads captured before profiles were hosted all came from the default one
+            self._db.execute(
+                f'ALTER TABLE leads ADD COLUMN profile TEXT DEFAULT \'{DEFAULT_LEAD_PROFILE}\''
+            )
+        self._db.commit()
+        self._leads = {}        # id -> lead dict
+        self._by_email = {}     # (profile, email key) -> [ids]
+        self._by_company = {}   # (profile, company key) -> [ids] (email-less leads only)
+        columns = ('id', 'profile', 'email_key', 'company_key') + LEAD_FIELDS + ('times_seen',)
+        for row in self._db.execute(f"SELECT {', '.join(columns)} FROM leads"):
+            self._remember(dict(zip(columns, row)))
+
+    def _remember(self, lead: dict) -> None:
+        self._leads[lead['id']] = lead
+        if lead['email_key']:
+            self._by_email.setdefault((lead['profile'], lead['email_key']), []).append(lead['id'])
+        elif lead['company_key']:
+            self._by_company.setdefault((lead['profile'], lead['company_key']), []).append(lead['id'])
+
+    def _match(self, profile: str, email_key: str, company_key: str,
+               name_key: str) -> Optional[dict]:
+        if email_key:
+            for lead_id in self._by_email.get((profile, email_key), []):
+                lead = self._leads[lead_id]
+                if not company_key or not lead['company_key'] or lead['company_key'] == company_key:
+                    return lead
+        if company_key:
+            # email-less leads of the same (or an unnamed) contact only
+            for lead_id in self._by_company.get((profile, company_key), []):
+                lead = self._leads[lead_id]
+                known = normalize_name(lead['contact_name'])
+                if not name_key or not known or known == name_key:
+                    return lead
+        return None
+
+    def _rekey(self, lead: dict, email_key: str) -> None:
+        """Move an email-less lead that just learned its email to the email index."""
+        company = (lead['profile'], lead['company_key'])
+        self._by_company[company].remove(lead['id'])
+        if not self._by_company[company]:
+            del self._by_company[company]
+        lead['email_key'] = email_key
+        self._by_email.setdefault((lead['profile'], email_key), []).append(lead['id'])
+
+    @staticmethod
+    def _merge(existing: dict, incoming: dict) -> list:
+        changed = []
+        for field in LEAD_FIELDS:
+            value = (incoming.get(field) or '').strip()
+            if not value:
+                continue
+            current = existing.get(field) or ''
+            if field == 'notes':
+                if value.casefold() not in current.casefold():
+                    existing['notes'] = f"{current}; {value}" if current else value
+                    changed.append(field)
+            elif not current:
+                existing[field] = value
+                changed.append(field)
+        return changed
+
+    @traced("leads.index_record")
+    def record(self, lead: dict, profile: str = DEFAULT_LEAD_PROFILE) -> dict:
+        """Insert or merge a lead captured on a profile; returns {'status', 'lead', 'changed'}.
+
+        status is 'new', 'updated' (merged new information), 'duplicate'
+        (nothing new) or 'unkeyed' (no email or company to dedupe on).
+        """
+        email_key = normalize_email(lead.get('contact_email'))
+        company_key = normalize_company(lead.get('company'))
+        if not email_key and not company_key:
+            return {'status': 'unkeyed', 'lead': dict(lead), 'changed': list(LEAD_FIELDS)}
+
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            existing = self._match(profile, email_key, company_key,
+                                   normalize_name(lead.get('contact_name')))
+            if existing is None:
+                fields = {f: (lead.get(f) or '').strip() for f in LEAD_FIELDS}
+                cursor = self._db.execute(
+                    'INSERT INTO leads (profile, email_key, company_key, company, contact_name,'
+                    ' contact_email, role_title, notes, first_seen, last_seen, times_seen)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)',
+                    (profile, email_key, company_key, *(fields[f] for f in LEAD_FIELDS), now, now),
+                )
+                self._db.commit()
+                created = {'id': cursor.lastrowid, 'profile': profile, 'email_key': email_key,
+                           'company_key': company_key, 'times_seen': 1, **fields}
+                self._remember(created)
+                return {'status': 'new', 'lead': dict(created), 'changed': list(LEAD_FIELDS)}
+
+            changed = self._merge(existing, lead)
+            existing['times_seen'] += 1
+            if not existing['company_key'] and company_key:
+                existing['company_key'] = company_key
+            if email_key and not existing['email_key']:
+                self._rekey(existing, email_key)
+            self._db.execute(
+                'UPDATE leads SET email_key = ?, company_key = ?, company = ?, contact_name = ?,'
+                ' contact_email = ?, role_title = ?, notes = ?, last_seen = ?,'
+                ' times_seen = ? WHERE id = ?',
+                (existing['email_key'], existing['company_key'],
+                 *(existing[f] for f in LEAD_FIELDS), now,
+                 existing['times_seen'], existing['id']),
+            )
+            self._db.commit()
+            status = 'updated' if changed else 'duplicate'
+            return {'status': status, 'lead': dict(existing), 'changed': changed}
+
+    def __len__(self) -> int:
+        return len(self._leads)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_lead_index() -> LeadIndex:
+    """Process-wide LeadIndex backed by LEAD_INDEX_PATH."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LeadIndex()
+    return _index
@@ -0,0 +1,249 @@
+"""
+mailer.py
+Purpose: Bounded SMTP worker with connection reuse and digest batching for lead emails
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import os
+import queue
+import smtplib
+import threading
+import time
+from datetime import datetime
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, List, Optional
+
+from tracing import traced
+
+
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '465'))
+EMAIL_QUEUE_SIZE = 100
+EMAIL_PUT_TIMEOUT_SECONDS = 0.1
+EMAIL_DIGEST_WINDOW_SECONDS = float(os.getenv('EMAIL_DIGEST_WINDOW_SECONDS', '5'))
+EMAIL_DIGEST_MAX = 25
+EMAIL_IDLE_SECONDS = 120.0
+
+LEAD_EMAIL_FOOTER = "---\nThis lead was captured from your HuggingFace demo."
+
+
+def _lead_lines(lead: dict) -> str:
+    return (
+        f"Timestamp: {lead.get('timestamp')}\n"
+        f"Company: {lead.get('company') or 'Not provided'}\n"
+        f"Contact Name: {lead.get('contact_name') or 'Not provided'}\n"
+        f"Contact Email: {lead.get('contact_email') or 'Not provided'}\n"
+        f"Role/Position: {lead.get('role_title') or 'Not provided'}\n"
+        f"Notes: {lead.get('notes') or 'None'}\n"
+        + (f"Profile: {lead['profile']}\n" if lead.get('profile') else "")
+    )
+
+
+def make_lead(
+    company: Optional[str],
+    contact_name: Optional[str],
+    contact_email: Optional[str],
+    role_title: Optional[str],
+    notes: Optional[str],
+    profile: Optional[str] = None
+) -> dict:
+    return {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'company': company,
+        'contact_name': contact_name,
+        'contact_email': contact_email,
+        'role_title': role_title,
+        'notes': notes,
+        'profile': profile,
+    }
+
+
+def _message(sender: str, recipient: str, subject: str, body: str) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+def build_lead_email(lead: dict, sender: str, recipient: str) -> MIMEMultipart:
+    """Notification email for a single lead."""
+    body = (
+        "\nNew lead from Interactive AI Agent Demo!\n\n"
+        f"{_lead_lines(lead)}\n{LEAD_EMAIL_FOOTER}\n"
+    )
+    subject = f"New Lead: {lead.get('company') or 'Unknown Company'}"
+    return _message(sender, recipient, subject, body)
+
+
+def build_digest_email(leads: List[dict], sender: str, recipient: str) -> MIMEMultipart:
+    """One email summarizing a burst of leads."""
+    sections = "\n".join(f"Lead {i}\n{_lead_lines(lead)}" for i, lead in enumerate(leads, 1))
+    companies = ", ".join(sorted({lead.get('company') or 'Unknown' for lead in leads}))
+    body = (
+        f"\n{len(leads)} new leads from Interactive AI Agent Demo!\n\n"
+        f"{sections}\n{LEAD_EMAIL_FOOTER}\n"
+    )
+    return _message(sender, recipient, f"{len(leads)} New Leads: {companies}", body)
+
+
+def default_connect() -> smtplib.SMTP:
+    return smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=30)
+
+
+class EmailWorker:
+    """Single-connection SMTP worker fed by a bounded queue.
+
+    One thread owns one authenticated SMTP connection and reuses it across
+    messages, reconnecting only when the server drops it and closing it after
+    idle_seconds without mail. Leads that arrive within digest_window of each
+    other go out as one digest email. When the queue is full, submit() gives
+    up after a short wait instead of spawning more work.
+    """
+
+    def __init__(
+        self,
+        sender: Optional[str] = None,
+        password: Optional[str] = None,
+        recipient: Optional[str] = None,
+        connect: Callable[[], smtplib.SMTP] = default_connect,
+        queue_size: int = EMAIL_QUEUE_SIZE,
+        put_timeout: float = EMAIL_PUT_TIMEOUT_SECONDS,
+        digest_window: float = EMAIL_DIGEST_WINDOW_SECONDS,
+        digest_max: int = EMAIL_DIGEST_MAX,
+        idle_seconds: float = EMAIL_IDLE_SECONDS,
+    ):
+        self.sender = sender or os.getenv('SMTP_EMAIL')
+        self.password = password or os.getenv('SMTP_PASSWORD')
+        self.recipient = recipient or os.getenv('NOTIFICATION_EMAIL', self.sender)
+        self.connect = connect
+        self.put_timeout = put_timeout
+        self.digest_window = digest_window
+        self.digest_max = digest_max
+        self.idle_seconds = idle_seconds
+        self.stats = {'queued': 0, 'rejected': 0, 'emails': 0, 'digests': 0,
+                      'leads_sent': 0, 'connections': 0, 'failures': 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._connection = None
+        self._last_used = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.sender and self.password)
+
+    def submit(self, lead: dict) -> dict:
+        """Queue a lead notification; returns immediately (or after put_timeout if full)."""
+        if not self.configured:
+            return {'status': 'error', 'message': 'Email not configured'}
+        try:
+            self._queue.put(lead, timeout=self.put_timeout)
+        except queue.Full:
+            self.stats['rejected'] += 1
+            print("[EMAIL ERROR] Queue full, lead email dropped")
+            return {'status': 'error', 'message': 'Email queue full'}
+        self.stats['queued'] += 1
+        return {'status': 'ok', 'message': 'Email queued'}
+
+    def _open(self) -> smtplib.SMTP:
+        connection = self.connect()
+        connection.login(self.sender, self.password)
+        self.stats['connections'] += 1
+        return connection
+
+    def _close_connection(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except Exception:
+                pass
+            self._connection = None
+
+    @traced("mailer.smtp_send")
+    def _send(self, msg) -> None:
+        """Send on the open connection, reconnecting once if the server dropped it."""
+        for attempt in (1, 2):
+            if self._connection is None:
+                self._connection = self._open()
+            try:
+                self._connection.send_message(msg)
+                self._last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self._connection = None
+                if attempt == 2:
+                    raise
+
+    def _collect(self, first: dict) -> list:
+        leads = [first]
+        deadline = time.monotonic() + self.digest_window
+        while len(leads) < self.digest_max:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                leads.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return leads
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._connection and time.monotonic() - self._last_used > self.idle_seconds:
+                    self._close_connection()
+                continue
+            leads = self._collect(first)
+            if len(leads) == 1:
+                msg = build_lead_email(leads[0], self.sender, self.recipient)
+            else:
+                msg = build_digest_email(leads, self.sender, self.recipient)
+            try:
+                self._send(msg)
+            except Exception as error:
+                self.stats['failures'] += 1
+                print(f"[EMAIL ERROR] {str(error)}")
+            else:
+                self.stats['emails'] += 1
+                self.stats['digests'] += len(leads) > 1
+                self.stats['leads_sent'] += len(leads)
+                print(f"[EMAIL] Sent {len(leads)} lead(s) to {self.recipient}")
+            finally:
+                for _ in leads:
+                    self._queue.task_done()
+        self._close_connection()
+
+    def start(self) -> "EmailWorker":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def flush(self) -> None:
+        """Block until every queued lead has been sent or has failed."""
+        self._queue.join()
+
+    def close(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_email_worker() -> EmailWorker:
+    """Process-wide started EmailWorker."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = EmailWorker().start()
+    return _worker
@@ -16,7 +16,7 @@ CRITICAL RULES:
 2. If asked about something not in your profile, say "That's not something I have documented, but I'd be happy to discuss [related topic from profile]."
 3. Speak naturally and conversationally, but stay factual.
 4. Be professional, confident, and enthusiastic about your work.
-5. If someone asks for contact info or wants to connect, just give your email: gregory.e.schwartz@gmail.com
+5. If someone asks for contact info or wants to connect, just give your email: {email}
 6. Keep responses concise — 2 to 4 short paragraphs unless asked for depth.
 
 RESPONSE FORMAT:
@@ -36,6 +36,40 @@ Remember: You ARE {name}. Speak as yourself. Be helpful, professional, and accur
 """
 
 
-def build_system_prompt(profile_yaml: str, name: str) -> str:
+def build_system_prompt(profile_yaml: str, name: str, email: str = None) -> str:
     """Build the system prompt with profile data injected."""
-    return SYSTEM_PROMPT_TEMPLATE.format(name=name, profile_yaml=profile_yaml)
+    return SYSTEM_PROMPT_TEMPLATE.format(
+        name=name, profile_yaml=profile_yaml, email=email or "the one in your profile"
+    )
+
+
+RETRIEVED_SECTIONS_TEMPLATE = """=== PROFILE (sections relevant to this question) ===
+{sections}
+=== END PROFILE ===
+
+These sections are part of your PROFILE. Other sections exist but were not retrieved for this question."""
+
+
+def build_retrieved_sections_block(sections_text: str) -> str:
+    """Per-turn profile excerpt used in retrieval mode."""
+    return RETRIEVED_SECTIONS_TEMPLATE.format(sections=sections_text)
+
+
+HISTORY_SUMMARY_PROMPT = """You compress the earlier part of a conversation between a visitor (often a recruiter or hiring manager) and an interactive professional profile.
+
+Write a compact summary, at most 150 words, in plain sentences. Always keep:
+- who the visitor is: name, company, role they are hiring for, contact email, if stated
+- what they asked about and what was already answered
+- any commitments or next steps that were agreed
+
+Drop pleasantries and anything repeated. Do not invent details. Output only the summary."""
+
+
+def build_history_summary_request(previous_summary: str, transcript: str) -> str:
+    """User-turn text asking for an updated rolling summary."""
+    if previous_summary:
+        return (
+            f"Existing summary:\n{previous_summary}\n\n"
+            f"Newer conversation to fold in:\n{transcript}"
+        )
+    return f"Conversation:\n{transcript}"
@@ -0,0 +1,145 @@
+"""
+registry.py
+Purpose: Process-wide registry of parsed profiles and built system prompts
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping
+
+import compiler
+from tools import parse_profile_yaml
+from prompts import build_system_prompt
+
+
+@dataclass(frozen=True)
+class CompiledProfile:
+    """Immutable bundle shared by every agent serving the same profile file."""
+    path: str
+    content_hash: str
+    profile: Mapping[str, Any]
+    profile_yaml: str
+    system_prompt: str
+    sections: Mapping[str, str]        # canonical text per top-level profile section
+    section_tokens: Mapping[str, int]
+    prompt_tokens: int
+
+    @property
+    def name(self) -> str:
+        return self.profile.get('name', 'Unknown')
+
+    @property
+    def email(self):
+        return (self.profile.get('contact') or {}).get('email')
+
+    @property
+    def over_budget(self) -> bool:
+        budget = compiler.PROMPT_TOKEN_BUDGET
+        return bool(budget) and self.prompt_tokens > budget
+
+
+_lock = threading.Lock()
+_entries = {}      # (resolved path, sha256) -> CompiledProfile
+_stat_index = {}   # resolved path -> ((mtime_ns, size), sha256)
+
+
+def _freeze(value):
+    """Recursively convert dicts/lists into read-only mappings/tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _compile(path: str, raw: bytes, content_hash: str) -> CompiledProfile:
+    """Parse, canonicalize and budget-check one profile version.
+
+    The prompt embeds the compiled sections rather than the raw YAML, so
+    comments and formatting cost no tokens and cannot bust the prompt cache.
+    """
+    profile_yaml = raw.decode('utf-8')
+    profile = parse_profile_yaml(profile_yaml)
+    name = profile.get('name', 'Unknown')
+    sections = compiler.compile_profile(profile)
+    email = (profile.get('contact') or {}).get('email')
+    system_prompt = build_system_prompt(compiler.profile_text(sections), name, email)
+    return CompiledProfile(
+        path=path,
+        content_hash=content_hash,
+        profile=_freeze(profile),
+        profile_yaml=profile_yaml,
+        system_prompt=system_prompt,
+        sections=MappingProxyType(sections),
+        section_tokens=MappingProxyType(compiler.section_token_counts(sections)),
+        prompt_tokens=compiler.estimate_tokens(system_prompt),
+    )
+
+
+def _within_budget(entry: CompiledProfile, enforce_budget: bool) -> CompiledProfile:
+    if enforce_budget:
+        compiler.check_budget(entry.system_prompt, compiler.PROMPT_TOKEN_BUDGET, entry.sections)
+    return entry
+
+
+def get_compiled_profile(profile_path: str = "profile.yaml",
+                         enforce_budget: bool = False) -> CompiledProfile:
+    """Return the shared CompiledProfile for a file, building it at most once per content.
+
+    A stat() on the hot path decides whether the cached hash is still current;
+    the file is only re-read and re-hashed when its mtime or size changes.
+    With enforce_budget (the compiler.py build step) an over-budget prompt
+    raises PromptBudgetExceeded; at runtime callers check over_budget instead,
+    so one oversized profile edit cannot take down every page load.
+    """
+    path = Path(profile_path).resolve()
+    if not path.exists():
+        raise FileNotFoundError(f"Profile file not found: {profile_path}")
+    key_path = str(path)
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _stat_index.get(key_path)
+    if cached and cached[0] == signature:
+        entry = _entries.get((key_path, cached[1]))
+        if entry is not None:
+            return _within_budget(entry, enforce_budget)
+
+    raw = path.read_bytes()
+    content_hash = hashlib.sha256(raw).hexdigest()
+
+    with _lock:
+        entry = _entries.get((key_path, content_hash))
+        if entry is None:
+            entry = _compile(key_path, raw, content_hash)
+            # drop stale versions of this file so edits don't accumulate
+            for stale in [k for k in _entries if k[0] == key_path]:
+                del _entries[stale]
+            _entries[(key_path, content_hash)] = entry
+            if entry.over_budget:
+                print(f"[REGISTRY WARNING] {key_path} compiles to ~{entry.prompt_tokens} tokens, "
+                      f"over PROMPT_TOKEN_BUDGET={compiler.PROMPT_TOKEN_BUDGET}; "
+                      f"serving it in retrieval mode")
+        _stat_index[key_path] = (signature, content_hash)
+    return _within_budget(entry, enforce_budget)
+
+
+def evict_profile(profile_path: str) -> None:
+    """Forget every compiled version of one profile file (catalog eviction)."""
+    key_path = str(Path(profile_path).resolve())
+    with _lock:
+        for stale in [k for k in _entries if k[0] == key_path]:
+            del _entries[stale]
+        _stat_index.pop(key_path, None)
+
+
+def clear_registry() -> None:
+    """Forget every compiled profile (tests and hot-reload tooling)."""
+    with _lock:
+        _entries.clear()
+        _stat_index.clear()
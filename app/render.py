@@ -0,0 +1,83 @@
+"""
+render.py
+Purpose: Frame-coalescing renderer for streamed chat responses
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import os
+import time
+from typing import Callable, Iterable, Optional
+
+
+STREAM_RENDER_FPS = float(os.getenv('STREAM_RENDER_FPS', '12'))
+SENTENCE_ENDINGS = ('.', '!', '?', ':', '\n')
+
+
+class FrameCoalescer:
+    """Batch streamed deltas into UI frames instead of re-rendering per delta.
+
+    Every render re-sends the whole growing markdown, so deltas are held until a
+    frame is due: the first token renders at once (perceived latency), later
+    frames go out at most fps times per second, preferring word or sentence
+    boundaries, and close() guarantees the last frame is the full text.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[str], None],
+        fps: float = STREAM_RENDER_FPS,
+        on_first_token: Optional[Callable[[], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.render = render
+        self.frame_interval = 1.0 / fps
+        self.on_first_token = on_first_token
+        self.clock = clock
+        self.frames = 0
+        self.deltas = 0
+        self._parts = []
+        self._rendered_parts = 0
+        self._last_frame = None
+
+    def _due(self, delta: str, now: float) -> bool:
+        elapsed = now - self._last_frame
+        if elapsed >= 2 * self.frame_interval:
+            return True
+        if elapsed < self.frame_interval:
+            return elapsed >= self.frame_interval / 2 and delta.rstrip(' ').endswith(SENTENCE_ENDINGS)
+        return delta[-1:].isspace() or delta.rstrip(' ').endswith(SENTENCE_ENDINGS)
+
+    def _frame(self, now: float) -> None:
+        self.render("".join(self._parts))
+        self._rendered_parts = len(self._parts)
+        self._last_frame = now
+        self.frames += 1
+
+    def push(self, delta: str) -> None:
+        if not delta:
+            return
+        self._parts.append(delta)
+        self.deltas += 1
+        now = self.clock()
+        if self._last_frame is None:
+            if self.on_first_token:
+                self.on_first_token()
+            self._frame(now)
+        elif self._due(delta, now):
+            self._frame(now)
+
+    def close(self) -> str:
+        """Render whatever is still pending and return the full text."""
+        text = "".join(self._parts)
+        if self._rendered_parts != len(self._parts) or self.frames == 0:
+            if self._last_frame is None and self.on_first_token:
+                self.on_first_token()
+            self.render(text)
+            self.frames += 1
+        return text
+
+    def consume(self, chunks: Iterable[str]) -> str:
+        for chunk in chunks:
+            self.push(chunk)
+        return self.close()
@@ -0,0 +1,177 @@
+"""
+retrieval.py
+Purpose: Optional BM25 section retrieval so large profiles inject only relevant sections
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from compiler import canonical_section, compile_profile, profile_text
+from prompts import build_retrieved_sections_block, build_system_prompt
+
+
+# 'off' injects the whole compiled profile (default); 'bm25' injects the top-k sections
+PROFILE_RETRIEVAL = os.getenv('PROFILE_RETRIEVAL', 'off').lower()
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '4'))
+# always injected as the system prompt
+CORE_SECTIONS = ('name', 'headline', 'location', 'contact', 'summary')
+# list entries with one of these keys are split one sub-entry per section
+SPLIT_KEYS = ('projects',)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[+#][a-z0-9+#]*)?")
+STOPWORDS = frozenset(
+    "a an and are about as at be by can describe did do does for from had has have "
+    "how i in is it its me more my of on or so tell that the their there this to us "
+    "was we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+@dataclass(frozen=True)
+class Section:
+    key: str   # e.g. "experience[0].projects[2]", "publications[1]", "skills.languages"
+    text: str  # canonical text, including the parent entry's header fields
+
+
+def _plain(value):
+    """MappingProxy/tuple (registry-frozen) -> dict/list, so the compiler sees plain types."""
+    if isinstance(value, Mapping):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def split_sections(profile: Mapping) -> List[Section]:
+    """Split every non-core section into independently retrievable entries."""
+    sections = []
+    for key, value in _plain(profile).items():
+        if key in CORE_SECTIONS or not value:
+            continue
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                sections.append(Section(f"{key}.{sub_key}",
+                                        canonical_section(key, {sub_key: sub_value})))
+        elif isinstance(value, list):
+            for index, entry in enumerate(value):
+                split_key = next((k for k in SPLIT_KEYS
+                                  if isinstance(entry, dict) and isinstance(entry.get(k), list)), None)
+                if split_key is None:
+                    sections.append(Section(f"{key}[{index}]", canonical_section(key, [entry])))
+                    continue
+                header = {k: v for k, v in entry.items() if k != split_key}
+                for sub_index, child in enumerate(entry[split_key]):
+                    sections.append(Section(
+                        f"{key}[{index}].{split_key}[{sub_index}]",
+                        canonical_section(key, [dict(header, **{split_key: [child]})]),
+                    ))
+        else:
+            sections.append(Section(key, canonical_section(key, value)))
+    return sections
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents, backed by an inverted index."""
+
+    def __init__(self, documents: List[str], k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}  # term -> [(doc, tf)]
+        self.lengths = []
+        for doc_id, document in enumerate(documents):
+            terms = tokenize(document)
+            self.lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings.setdefault(term, []).append((doc_id, frequency))
+        count = len(documents)
+        self.average_length = (sum(self.lengths) / count) if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (doc id, score) with score > 0, best first."""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, frequency in self.postings[term]:
+                norm = 1 - self.b + self.b * self.lengths[doc_id] / (self.average_length or 1)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * norm
+                )
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+class ProfileRetriever:
+    """Core-header system prompt plus a BM25 index over the remaining sections.
+
+    Built once per compiled profile (see get_retriever). The core prompt is
+    what gets cached; each turn adds an uncached block of the top-k sections.
+    """
+
+    def __init__(self, compiled, top_k: int = RETRIEVAL_TOP_K):
+        self.top_k = top_k
+        profile = _plain(compiled.profile)
+        core = {key: profile[key] for key in CORE_SECTIONS if key in profile}
+        self.system_prompt = build_system_prompt(
+            profile_text(compile_profile(core)), compiled.name, compiled.email
+        )
+        self.sections = split_sections(profile)
+        self.index = BM25Index([section.text for section in self.sections])
+
+    def search(self, query: str, k: Optional[int] = None) -> List[Section]:
+        """Top-k sections for query; with no term overlap, the first k in authored order."""
+        k = k or self.top_k
+        hits = self.index.search(query, k)
+        if not hits:
+            return self.sections[:k]
+        return [self.sections[doc_id] for doc_id, _ in hits]
+
+    def sections_block(self, sections: List[Section]) -> Optional[dict]:
+        """Text block carrying this turn's retrieved sections (sent in the user turn)."""
+        if not sections:
+            return None
+        return {
+            "type": "text",
+            "text": build_retrieved_sections_block("\n".join(s.text for s in sections)),
+        }
+
+
+_lock = threading.Lock()
+_retrievers = {}  # (path, content hash, top_k) -> ProfileRetriever
+
+
+def get_retriever(compiled, top_k: int = RETRIEVAL_TOP_K) -> ProfileRetriever:
+    """Shared retriever for a compiled profile version, built at most once."""
+    key = (compiled.path, compiled.content_hash, top_k)
+    retriever = _retrievers.get(key)
+    if retriever is None:
+        with _lock:
+            retriever = _retrievers.get(key)
+            if retriever is None:
+                for stale in [k for k in _retrievers if k[0] == compiled.path]:
+                    del _retrievers[stale]
+                retriever = _retrievers[key] = ProfileRetriever(compiled, top_k)
+    return retriever
+
+
+def evict_retriever(profile_path: str) -> None:
+    """Drop the retrievers built for one profile file (catalog eviction)."""
+    with _lock:
+        for stale in [k for k in _retrievers if k[0] == profile_path]:
+            del _retrievers[stale]
@@ -0,0 +1,378 @@
+"""
+scheduler.py
+Purpose: Process-wide rate-limit-aware admission control in front of the Anthropic API
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+try:
+    from anthropic import APIConnectionError
+except ImportError:
+    APIConnectionError = None
+
+
+# set these to the organization's limits; 0 leaves that bucket unlimited
+RATE_LIMIT_REQUESTS_PER_MINUTE = float(os.getenv('RATE_LIMIT_REQUESTS_PER_MINUTE', '0'))
+RATE_LIMIT_INPUT_TOKENS_PER_MINUTE = float(os.getenv('RATE_LIMIT_INPUT_TOKENS_PER_MINUTE', '0'))
+SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv('SCHEDULER_MAX_WAIT_SECONDS', '90'))
+SCHEDULER_MAX_RETRIES = int(os.getenv('SCHEDULER_MAX_RETRIES', '4'))
+# 429 rate limited, 529 overloaded
+RETRYABLE_STATUS = (429, 529)
+# the SDK's own retries are off (see client.py), so the other failures it retried are retried here
+TRANSIENT_STATUS = (408, 409, 500, 502, 503, 504)
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError) + ((APIConnectionError,) if APIConnectionError else ())
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_CAP_SECONDS = 30.0
+# a retry waits the server's delay plus up to this share more, so replicas don't retry in lockstep
+BACKOFF_JITTER = 0.5
+# upper bound on how long a waiter sleeps before re-checking its place in line
+POLL_SECONDS = 0.25
+PRIORITY_ACTIVE = 0      # conversation already under way (and retries)
+PRIORITY_NEW = 1         # first turn of a conversation
+PRIORITY_BACKGROUND = 2  # history summaries and other off-path calls
+QUEUE_TIMEOUT_MESSAGE = ("We're handling a lot of conversations right now — "
+                         "please try again in a minute.")
+
+
+class QueueTimeout(RuntimeError):
+    """Raised when a request waited SCHEDULER_MAX_WAIT_SECONDS without being admitted."""
+
+
+def retry_after_seconds(error) -> Optional[float]:
+    """Server-requested delay from an API error's retry-after(-ms) header, if any."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers['retry-after-ms']) / 1000.0
+    except (KeyError, TypeError, ValueError):
+        pass
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def queue_notice(position: int, wait_seconds: float) -> str:
+    """Visitor-facing wait message; position 0 means a rate-limited call is about to retry."""
+    seconds = max(math.ceil(wait_seconds), 1)
+    if position <= 1:
+        return f"High demand right now — starting in about {seconds}s…"
+    return f"You're #{position} in line — about {seconds}s…"
+
+
+class TokenBucket:
+    """Refills rate_per_minute / 60 units per second, up to capacity; rate 0 is unlimited.
+
+    Not thread-safe on its own; the Scheduler guards it with its lock. The
+    level may go negative when a request turns out to cost more than its
+    estimate, which simply delays the next admission.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self.clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount units are available (0 when unlimited)."""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        return max((amount - self.level) / self.rate, 0.0)
+
+    def take(self, amount: float) -> None:
+        if self.rate:
+            self._refill()
+            self.level -= amount
+
+    def give(self, amount: float) -> None:
+        """Return (or, if negative, additionally charge) units."""
+        if self.rate:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    """One queued or admitted API call: its token estimate and place in line."""
+
+    def __init__(self, tokens: float, priority: int, seq: int, enqueued_at: float):
+        self.tokens = tokens
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = enqueued_at
+        self.waited = 0.0
+        self.queued = False
+
+    def __lt__(self, other: "Ticket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Scheduler:
+    """Admits API calls in priority order within request and input-token budgets.
+
+    Callers wait in one process-wide line: active conversations ahead of new
+    ones, first come first served within a priority. Only the head of the
+    line is admitted, once both buckets have room and no retry-after pause
+    is in effect, so a burst of visitors becomes a short queue instead of a
+    burst of 429s. When the API does answer 429/529, backoff() pauses every
+    admission for the server's retry-after and returns the jittered delay
+    the failed call should sleep before re-queueing.
+    """
+
+    def __init__(self, requests_per_minute: float = RATE_LIMIT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = RATE_LIMIT_INPUT_TOKENS_PER_MINUTE,
+                 max_wait_seconds: float = SCHEDULER_MAX_WAIT_SECONDS,
+                 max_retries: int = SCHEDULER_MAX_RETRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.requests = TokenBucket(requests_per_minute, clock=clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock)
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self.clock = clock
+        self.paused_until = 0.0
+        self.stats = {'admitted': 0, 'queued': 0, 'retries': 0, 'timeouts': 0, 'wait_seconds': 0.0}
+        self._waiting = []
+        self._seq = itertools.count()
+        self._changed = threading.Condition()
+
+    def _enqueue(self, tokens: float, priority: int, seq: Optional[int]) -> Ticket:
+        # a single request can never need more than a full bucket
+        if self.tokens.rate:
+            tokens = min(tokens, self.tokens.capacity)
+        ticket = Ticket(tokens, priority, next(self._seq) if seq is None else seq, self.clock())
+        with self._changed:
+            heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _drop(self, ticket: Ticket) -> None:
+        with self._changed:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._changed.notify_all()
+
+    def _eta(self, ticket: Ticket) -> float:
+        """Seconds until ticket could go, if everything ahead of it goes first."""
+        ahead = [waiting for waiting in self._waiting if not ticket < waiting]
+        return max(self.paused_until - self.clock(),
+                   self.requests.wait_time(len(ahead)),
+                   self.tokens.wait_time(sum(waiting.tokens for waiting in ahead)))
+
+    def _poll(self, ticket: Ticket):
+        """(None, 0) once admitted, else ((position, eta), seconds to sleep); raises QueueTimeout."""
+        with self._changed:
+            now = self.clock()
+            if self._waiting[0] is ticket:
+                wait = max(self.paused_until - now, self.requests.wait_time(1),
+                           self.tokens.wait_time(ticket.tokens))
+                if wait <= 0:
+                    heapq.heappop(self._waiting)
+                    self.requests.take(1)
+                    self.tokens.take(ticket.tokens)
+                    ticket.waited = now - ticket.enqueued_at
+                    self.stats['admitted'] += 1
+                    if ticket.queued:
+                        self.stats['wait_seconds'] += ticket.waited
+                    self._changed.notify_all()
+                    return None, 0.0
+            else:
+                wait = POLL_SECONDS
+            if not ticket.queued:
+                ticket.queued = True
+                self.stats['queued'] += 1
+            remaining = ticket.enqueued_at + self.max_wait_seconds - now
+            if remaining <= 0:
+                self.stats['timeouts'] += 1
+                raise QueueTimeout(QUEUE_TIMEOUT_MESSAGE)
+            position = 1 + sum(1 for waiting in self._waiting if waiting < ticket)
+            return (position, self._eta(ticket)), min(wait, remaining, POLL_SECONDS)
+
+    def admit(self, tokens: float, priority: int = PRIORITY_NEW,
+              on_wait: Optional[Callable[[int, float], None]] = None,
+              seq: Optional[int] = None) -> Ticket:
+        """Block until admitted; on_wait(position, eta seconds) is called as the wait changes.
+
+        seq keeps a retried call's original place in line. on_wait runs in
+        the calling thread, outside the scheduler's lock.
+        """
+        ticket = self._enqueue(tokens, priority, seq)
+        reported = None
+        try:
+            while True:
+                status, sleep = self._poll(ticket)
+                if status is None:
+                    return ticket
+                if on_wait is not None and (status[0], math.ceil(status[1])) != reported:
+                    reported = (status[0], math.ceil(status[1]))
+                    on_wait(*status)
+                with self._changed:
+                    self._changed.wait(sleep)
+        except BaseException:
+            self._drop(ticket)
+            raise
+
+    async def aadmit(self, tokens: float, priority: int = PRIORITY_NEW,
+                     on_wait: Optional[Callable[[int, float], None]] = None,
+                     seq: Optional[int] = None) -> Ticket:
+        """admit() for an event loop: waits by polling with asyncio.sleep."""
+        ticket = self._enqueue(tokens, priority, seq)
+        reported = None
+        try:
+            while True:
+                status, sleep = self._poll(ticket)
+                if status is None:
+                    return ticket
+                if on_wait is not None and (status[0], math.ceil(status[1])) != reported:
+                    reported = (status[0], math.ceil(status[1]))
+                    on_wait(*status)
+                await asyncio.sleep(sleep)
+        except BaseException:
+            self._drop(ticket)
+            raise
+
+    def backoff(self, error: Exception, attempt: int, ticket: Ticket) -> Optional[float]:
+        """Seconds the failed call should sleep before re-queueing, or None to give up.
+
+        429/529 and transient failures (connection errors, timeouts, 5xx) are
+        retried, at most max_retries times, and the failed call's tokens are
+        refunded. A 429/529 pause applies to every admission (the limit is per
+        organization, not per caller); a transient failure only delays this call.
+        """
+        status = getattr(error, 'status_code', None)
+        throttled = status in RETRYABLE_STATUS
+        transient = status in TRANSIENT_STATUS or (status is None and isinstance(error, TRANSIENT_ERRORS))
+        if not (throttled or transient) or attempt >= self.max_retries:
+            return None
+        server_delay = retry_after_seconds(error)
+        base = (server_delay if server_delay is not None
+                else min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+        delay = base * (1 + random.uniform(0, BACKOFF_JITTER))
+        with self._changed:
+            if throttled:
+                self.paused_until = max(self.paused_until, self.clock() + base)
+            self.tokens.give(ticket.tokens)
+            self.stats['retries'] += 1
+            self._changed.notify_all()
+        reason = f"API returned {status}" if status else f"{type(error).__name__}"
+        print(f"[SCHEDULER] {reason}; retrying in {delay:.1f}s (attempt {attempt + 1})")
+        return delay
+
+    def run(self, call: Callable, tokens: float, priority: int = PRIORITY_NEW,
+            on_wait: Optional[Callable[[int, float], None]] = None,
+            ticket: Optional[Ticket] = None):
+        """call() once admitted, retrying 429/529 and transient failures; returns (result, ticket).
+
+        A retry keeps its original place in line and is promoted ahead of new
+        conversations. An already admitted ticket skips the first wait. The
+        returned ticket's waited is the time this call spent queued or
+        backing off; on_wait(0, delay) announces each backoff.
+        """
+        attempt, seq, waited = 0, None, 0.0
+        while True:
+            if ticket is None:
+                ticket = self.admit(tokens, priority, on_wait, seq)
+                waited += ticket.waited
+            try:
+                result = call()
+            except Exception as error:
+                delay = self.backoff(error, attempt, ticket)
+                if delay is None:
+                    raise
+                attempt, seq, ticket = attempt + 1, ticket.seq, None
+                priority = PRIORITY_ACTIVE if priority == PRIORITY_NEW else priority
+                if on_wait is not None:
+                    on_wait(0, delay)
+                time.sleep(delay)
+                waited += delay
+                continue
+            ticket.waited = waited
+            return result, ticket
+
+    async def arun(self, call: Callable, tokens: float, priority: int = PRIORITY_NEW,
+                   on_wait: Optional[Callable[[int, float], None]] = None):
+        """run() for an event loop; call() returns an awaitable."""
+        attempt, seq, waited = 0, None, 0.0
+        while True:
+            ticket = await self.aadmit(tokens, priority, on_wait, seq)
+            waited += ticket.waited
+            try:
+                result = await call()
+            except Exception as error:
+                delay = self.backoff(error, attempt, ticket)
+                if delay is None:
+                    raise
+                attempt, seq = attempt + 1, ticket.seq
+                priority = PRIORITY_ACTIVE if priority == PRIORITY_NEW else priority
+                if on_wait is not None:
+                    on_wait(0, delay)
+                await asyncio.sleep(delay)
+                waited += delay
+                continue
+            ticket.waited = waited
+            return result, ticket
+
+    def settle(self, ticket: Ticket, actual_tokens: float) -> None:
+        """Correct the token bucket once the call's real input-token count is known."""
+        with self._changed:
+            self.tokens.give(ticket.tokens - actual_tokens)
+            self._changed.notify_all()
+
+    def release(self, ticket: Ticket) -> None:
+        """Refund an admitted call that was never sent."""
+        with self._changed:
+            self.requests.give(1)
+            self.tokens.give(ticket.tokens)
+            self._changed.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    def gauges(self) -> dict:
+        """Headline numbers, exported as telemetry gauges."""
+        with self._changed:
+            return {
+                'scheduler_queue_depth': len(self._waiting),
+                'scheduler_paused_seconds': max(self.paused_until - self.clock(), 0.0),
+                'scheduler_queued_total': self.stats['queued'],
+                'scheduler_retries_total': self.stats['retries'],
+                'scheduler_timeouts_total': self.stats['timeouts'],
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Process-wide Scheduler shared by every session's agent."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler()
+    return _scheduler
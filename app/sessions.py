@@ -0,0 +1,261 @@
+"""
+sessions.py
+Purpose: Per-session memory accounting and idle-session agent eviction
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from typing import Callable, Optional
+
+
+SESSION_IDLE_SECONDS = float(os.getenv('SESSION_IDLE_SECONDS', '1800'))
+SESSION_SWEEP_SECONDS = float(os.getenv('SESSION_SWEEP_SECONDS', '60'))
+# tracemalloc only sees allocations made after it starts; set to trace from boot
+SESSION_TRACEMALLOC = os.getenv('SESSION_TRACEMALLOC', '').lower() in ('1', 'true', 'yes')
+TRACEMALLOC_TOP = 10
+# agent attributes shared across sessions (registry, client pool, estimator) — not per-session cost
+SHARED_AGENT_ATTRIBUTES = ('compiled', 'profile', 'profile_yaml', 'system_prompt', 'client',
+                           'async_client', 'retriever', 'estimator', 'flights', 'scheduler')
+
+
+def approx_size(root, exclude=()) -> int:
+    """Deep sys.getsizeof over containers and instance attributes, each object once.
+
+    Objects whose id is in exclude (and everything only reachable through
+    them) are skipped, as are modules, classes and functions.
+    """
+    seen = set(exclude)
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, type(sys)) or callable(obj):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj, 0)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float, bool)):
+            attributes = getattr(obj, '__dict__', None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(obj), '__slots__', ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return total
+
+
+def agent_session_bytes(agent) -> int:
+    """Approximate bytes one agent holds for its session alone (history, usage, summary)."""
+    shared = [getattr(agent, name, None) for name in SHARED_AGENT_ATTRIBUTES]
+    return approx_size(agent, exclude={id(item) for item in shared if item is not None})
+
+
+def process_rss_bytes() -> int:
+    """Resident set size (Linux /proc), falling back to peak RSS from getrusage."""
+    try:
+        with open('/proc/self/statm', 'r', encoding='ascii') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+class AgentSlot:
+    """One session's agent, built on first use and releasable while the session is idle.
+
+    Sessions keep the slot (not the agent) in their state, so the registry
+    can drop an idle agent from another thread; the next get() rebuilds it
+    with the factory, which restores the conversation from its store.
+    """
+
+    def __init__(self, factory: Callable, session_id: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.factory = factory
+        self.session_id = session_id or uuid.uuid4().hex
+        self.clock = clock
+        self.last_active = clock()
+        self.builds = 0
+        self.evictions = 0
+        self._agent = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The agent, rebuilding it if it was evicted; marks the session active."""
+        with self._lock:
+            self.last_active = self.clock()
+            if self._agent is None:
+                self._agent = self.factory()
+                self.builds += 1
+            return self._agent
+
+    def peek(self):
+        """The agent if resident, else None; does not count as activity."""
+        return self._agent
+
+    def touch(self) -> None:
+        self.last_active = self.clock()
+
+    def idle_seconds(self) -> float:
+        return self.clock() - self.last_active
+
+    def release(self) -> bool:
+        with self._lock:
+            if self._agent is None:
+                return False
+            self._agent = None
+            self.evictions += 1
+            return True
+
+
+class SessionRegistry:
+    """Tracks live AgentSlots (weakly), evicts idle agents and reports memory.
+
+    A slot disappears from the registry when its session state is garbage
+    collected, so closed tabs need no explicit unregister. A background
+    thread sweeps every sweep_seconds; a turn already streaming keeps its own
+    reference to the agent, so eviction never interrupts one. The sweep also
+    measures every resident agent, and gauges() reports those numbers, so a
+    metrics scrape never walks live session state itself.
+    """
+
+    def __init__(self, idle_seconds: float = SESSION_IDLE_SECONDS,
+                 sweep_seconds: float = SESSION_SWEEP_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.sweep_seconds = sweep_seconds
+        self.stats = {'registered': 0, 'evictions': 0, 'sweeps': 0}
+        self._slots = weakref.WeakSet()
+        self._sizes = {}  # session id -> bytes at the last sweep
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, slot: AgentSlot) -> AgentSlot:
+        with self._lock:
+            self._slots.add(slot)
+            self.stats['registered'] += 1
+        return slot
+
+    def slots(self) -> list:
+        with self._lock:
+            return list(self._slots)
+
+    def sweep(self) -> int:
+        """Release agents of sessions idle longer than idle_seconds; returns how many."""
+        released = sum(1 for slot in self.slots()
+                       if slot.idle_seconds() > self.idle_seconds and slot.release())
+        sizes = self.session_bytes()
+        with self._lock:
+            self.stats['evictions'] += released
+            self.stats['sweeps'] += 1
+            self._sizes = sizes
+        if released:
+            print(f"[SESSIONS] Released {released} idle agent(s)")
+        return released
+
+    def session_bytes(self) -> dict:
+        """session id -> approximate per-session bytes (0 while its agent is evicted).
+
+        Walks each resident agent; one whose history changes mid-walk keeps
+        its size from the last sweep.
+        """
+        sizes = {}
+        for slot in self.slots():
+            agent = slot.peek()
+            try:
+                sizes[slot.session_id] = agent_session_bytes(agent) if agent is not None else 0
+            except RuntimeError:  # a container changed size during the walk
+                sizes[slot.session_id] = self._sizes.get(slot.session_id, 0)
+        return sizes
+
+    def gauges(self) -> dict:
+        """Headline numbers, exported as telemetry gauges (sizes as of the last sweep)."""
+        slots = self.slots()
+        with self._lock:
+            sizes = dict(self._sizes)
+        return {
+            'sessions': len(slots),
+            'sessions_resident': sum(1 for slot in slots if slot.peek() is not None),
+            'session_bytes_total': sum(sizes.get(slot.session_id, 0) for slot in slots),
+            'session_evictions_total': self.stats['evictions'],
+            'process_rss_bytes': process_rss_bytes(),
+        }
+
+    def report(self, trace: bool = False, top: int = TRACEMALLOC_TOP) -> dict:
+        """Per-session and process memory; trace=True starts tracemalloc if needed.
+
+        Per-session figures come from a deep getsizeof walk of each resident
+        agent, excluding state shared across sessions. Process figures add
+        RSS and, while tracemalloc is tracing, a snapshot's traced total and
+        top allocation sites by file.
+        """
+        sizes = self.session_bytes()
+        report = {
+            'sessions': len(sizes),
+            'sessions_resident': sum(1 for size in sizes.values() if size),
+            'session_bytes': sizes,
+            'session_bytes_total': sum(sizes.values()),
+            'stats': dict(self.stats),
+            'process_rss_bytes': process_rss_bytes(),
+        }
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            report['tracemalloc'] = {'started': True}
+        elif tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            report['tracemalloc'] = {
+                'traced_bytes': current,
+                'traced_peak_bytes': peak,
+                'top': [
+                    {'file': str(stat.traceback[0].filename), 'bytes': stat.size, 'count': stat.count}
+                    for stat in snapshot.statistics('filename')[:top]
+                ],
+            }
+        return report
+
+    def start(self) -> "SessionRegistry":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.sweep_seconds):
+            self.sweep()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_session_registry() -> SessionRegistry:
+    """Process-wide SessionRegistry (tracemalloc starts here if SESSION_TRACEMALLOC)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                if SESSION_TRACEMALLOC and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                _registry = SessionRegistry()
+    return _registry
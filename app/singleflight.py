@@ -0,0 +1,155 @@
+"""
+singleflight.py
+Purpose: Share one upstream generation among identical concurrent chat requests
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Iterator, Optional, Tuple
+
+from history import message_text
+
+
+SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', '1').lower() in ('1', 'true', 'yes')
+# keep a finished flight joinable this long, so a click just after the answer ends still shares it
+SINGLE_FLIGHT_LINGER_SECONDS = float(os.getenv('SINGLE_FLIGHT_LINGER_SECONDS', '0'))
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form, so 'What's your email?' variants match."""
+    return " ".join(text.casefold().split())
+
+
+def conversation_key(profile_hash: str, request: dict) -> str:
+    """Flight key: profile version + everything that shapes the reply, messages normalized."""
+    material = [
+        profile_hash,
+        request.get("model"),
+        request.get("max_tokens"),
+        [block["text"] for block in request.get("system", [])],
+        [(message["role"], normalize_text(message_text(message)))
+         for message in request.get("messages", [])],
+    ]
+    return hashlib.sha256(json.dumps(material).encode('utf-8')).hexdigest()
+
+
+class Flight:
+    """One upstream generation; any number of subscribers replay and follow its chunks.
+
+    The producer appends visible chunks and finally the raw text and usage
+    (or an error). Each subscriber iterates independently from chunk 0, so a
+    late joiner first catches up on what was already streamed, and a
+    subscriber that stops reading never holds back the others.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks = []
+        self.raw_text: Optional[str] = None
+        self.usage = None
+        self.error: Optional[Exception] = None
+        self.done = False
+        self.subscribers = 0
+        self._changed = threading.Condition()
+
+    def publish(self, chunk: str) -> None:
+        with self._changed:
+            self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    def finish(self, raw_text: str, usage) -> None:
+        with self._changed:
+            self.raw_text = raw_text
+            self.usage = usage
+            self.done = True
+            self._changed.notify_all()
+
+    def fail(self, error: Exception) -> None:
+        with self._changed:
+            self.error = error
+            self.done = True
+            self._changed.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        """Every chunk from the start, blocking for new ones until the flight is done."""
+        position = 0
+        while True:
+            with self._changed:
+                while position >= len(self.chunks) and not self.done:
+                    self._changed.wait()
+                pending = self.chunks[position:]
+                finished = self.done
+            position += len(pending)
+            yield from pending
+            if finished and position >= len(self.chunks):
+                return
+
+
+class FlightGroup:
+    """Registry of in-progress flights by key; the first caller's producer runs for all."""
+
+    def __init__(self, linger_seconds: float = SINGLE_FLIGHT_LINGER_SECONDS):
+        self.linger_seconds = linger_seconds
+        self.stats = {'flights': 0, 'shared': 0}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def joinable(self, key: str) -> bool:
+        """Whether join(key) would currently follow an existing flight."""
+        with self._lock:
+            flight = self._flights.get(key)
+            return flight is not None and not flight.error
+
+    def join(self, key: str, produce: Callable[[Flight], None]) -> Tuple[Flight, bool]:
+        """(flight, is_leader). The leader's produce(flight) runs on a daemon thread."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.error:
+                flight.subscribers += 1
+                self.stats['shared'] += 1
+                return flight, False
+            flight = self._flights[key] = Flight(key)
+            flight.subscribers = 1
+            self.stats['flights'] += 1
+        threading.Thread(target=self._run, args=(flight, produce), daemon=True).start()
+        return flight, True
+
+    def _run(self, flight: Flight, produce: Callable[[Flight], None]) -> None:
+        try:
+            produce(flight)
+        except Exception as error:
+            flight.fail(error)
+        if not flight.done:
+            flight.fail(RuntimeError("upstream ended without a final message"))
+        if self.linger_seconds > 0 and not flight.error:
+            timer = threading.Timer(self.linger_seconds, self._forget, args=(flight,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._forget(flight)
+
+    def _forget(self, flight: Flight) -> None:
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+
+_group = None
+_group_lock = threading.Lock()
+
+
+def get_flight_group() -> FlightGroup:
+    """Process-wide FlightGroup shared by every session's agent."""
+    global _group
+    if _group is None:
+        with _group_lock:
+            if _group is None:
+                _group = FlightGroup()
+    return _group
@@ -0,0 +1,197 @@
+"""
+telemetry.py
+Purpose: Aggregate per-turn agent metrics; export Prometheus text and rotating JSONL
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Dict, List, Optional, Sequence
+
+from agent import METRICS_LISTENERS
+
+
+TELEMETRY_JSONL_PATH = os.getenv('TELEMETRY_JSONL_PATH')  # unset: no JSONL export
+TELEMETRY_JSONL_MAX_BYTES = int(os.getenv('TELEMETRY_JSONL_MAX_BYTES', str(10 * 1024 * 1024)))
+TELEMETRY_JSONL_BACKUPS = int(os.getenv('TELEMETRY_JSONL_BACKUPS', '5'))
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0: no /metrics endpoint
+
+METRIC_PREFIX = 'profile_agent'
+TOKEN_FIELDS = (
+    'input_tokens',
+    'output_tokens',
+    'cache_read_input_tokens',
+    'cache_creation_input_tokens',
+)
+# histogram name -> (metrics field, upper bounds)
+HISTOGRAMS = {
+    'ttft_seconds': ('ttft_seconds', (0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)),
+    'generation_seconds': ('generation_seconds', (1.0, 2.0, 5.0, 10.0, 20.0, 40.0, 60.0)),
+    'output_tokens_per_second': ('output_tokens_per_second', (10.0, 20.0, 40.0, 60.0, 80.0, 120.0, 200.0)),
+    'lead_log_seconds': ('lead_log_seconds', (0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)),
+    'queue_seconds': ('queue_seconds', (0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition model."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.observations = 0
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        self.counts[index] += 1
+        self.total += value
+        self.observations += 1
+
+    def lines(self, name: str, labels: str) -> list:
+        out, cumulative = [], 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            out.append(f'{name}_bucket{{{labels}le="{le}"}} {cumulative}')
+        out.append(f'{name}_sum{{{labels.rstrip(",")}}} {self.total!r}')
+        out.append(f'{name}_count{{{labels.rstrip(",")}}} {self.observations}')
+        return out
+
+
+class Telemetry:
+    """Listener for agent.METRICS_LISTENERS that aggregates turns per mode.
+
+    Counters and histograms are kept in memory (a few hundred numbers) and
+    rendered on demand as Prometheus text; each raw turn can also be appended
+    to a size-rotated JSONL file for offline percentile analysis.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = TELEMETRY_JSONL_PATH,
+                 max_bytes: int = TELEMETRY_JSONL_MAX_BYTES,
+                 backups: int = TELEMETRY_JSONL_BACKUPS):
+        self._lock = threading.Lock()
+        self.turns: Dict[str, int] = {}
+        self.tokens: Dict[str, Dict[str, int]] = {}
+        self.histograms: Dict[str, Dict[str, Histogram]] = {}
+        # callables returning {name: value}, rendered as gauges on every scrape
+        self.gauge_sources: List[Callable[[], Dict[str, float]]] = []
+        self._jsonl = None
+        if jsonl_path:
+            self._jsonl = logging.getLogger(f"telemetry.jsonl.{id(self)}")
+            self._jsonl.propagate = False
+            self._jsonl.setLevel(logging.INFO)
+            handler = RotatingFileHandler(jsonl_path, maxBytes=max_bytes,
+                                          backupCount=backups, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._jsonl.addHandler(handler)
+
+    def __call__(self, agent, metrics: dict) -> None:
+        self.record(metrics, profile=getattr(agent, 'name', ''))
+
+    def record(self, metrics: dict, profile: str = '') -> None:
+        mode = metrics.get('mode', 'unknown')
+        with self._lock:
+            self.turns[mode] = self.turns.get(mode, 0) + 1
+            tokens = self.tokens.setdefault(mode, dict.fromkeys(TOKEN_FIELDS, 0))
+            for field in TOKEN_FIELDS:
+                tokens[field] += metrics.get(field, 0) or 0
+            per_mode = self.histograms.setdefault(
+                mode, {name: Histogram(bounds) for name, (_, bounds) in HISTOGRAMS.items()}
+            )
+            for name, (field, _) in HISTOGRAMS.items():
+                value = metrics.get(field)
+                if value is not None:
+                    per_mode[name].observe(value)
+        if self._jsonl is not None:
+            self._jsonl.info(json.dumps(dict(metrics, profile=profile), separators=(',', ':')))
+
+    def cache_hit_ratio(self) -> float:
+        """Share of prompt tokens served from the prompt cache, across all turns."""
+        with self._lock:
+            read = sum(t['cache_read_input_tokens'] for t in self.tokens.values())
+            total = sum(t['input_tokens'] + t['cache_read_input_tokens']
+                        + t['cache_creation_input_tokens'] for t in self.tokens.values())
+        return read / total if total else 0.0
+
+    def prometheus(self) -> str:
+        """Current aggregates in the Prometheus text exposition format (v0.0.4)."""
+        p = METRIC_PREFIX
+        lines = [
+            f'# HELP {p}_turns_total Completed agent turns.',
+            f'# TYPE {p}_turns_total counter',
+        ]
+        with self._lock:
+            for mode, count in sorted(self.turns.items()):
+                lines.append(f'{p}_turns_total{{mode="{mode}"}} {count}')
+            for field in TOKEN_FIELDS:
+                lines.append(f'# TYPE {p}_{field}_total counter')
+                for mode, tokens in sorted(self.tokens.items()):
+                    lines.append(f'{p}_{field}_total{{mode="{mode}"}} {tokens[field]}')
+            for name in HISTOGRAMS:
+                lines.append(f'# TYPE {p}_{name} histogram')
+                for mode, per_mode in sorted(self.histograms.items()):
+                    lines.extend(per_mode[name].lines(f'{p}_{name}', f'mode="{mode}",'))
+        lines.append(f'# HELP {p}_cache_hit_ratio Cached share of prompt tokens.')
+        lines.append(f'# TYPE {p}_cache_hit_ratio gauge')
+        lines.append(f'{p}_cache_hit_ratio {self.cache_hit_ratio()!r}')
+        for source in list(self.gauge_sources):
+            try:
+                gauges = source()
+            except Exception as error:
+                print(f"[TELEMETRY ERROR] gauge source failed: {error}")
+                continue
+            for name, value in gauges.items():
+                lines.append(f'# TYPE {p}_{name} gauge')
+                lines.append(f'{p}_{name} {value!r}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+        """Expose GET /metrics on a daemon thread."""
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[TELEMETRY] Serving /metrics on port {server.server_address[1]}")
+        return server
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry() -> Telemetry:
+    """Process-wide Telemetry, registered as an agent metrics listener (and /metrics if METRICS_PORT)."""
+    global _telemetry
+    if _telemetry is None:
+        with _telemetry_lock:
+            if _telemetry is None:
+                telemetry = Telemetry()
+                METRICS_LISTENERS.append(telemetry)
+                if METRICS_PORT:
+                    try:
+                        telemetry.serve(METRICS_PORT)
+                    except OSError as error:
+                        print(f"[TELEMETRY ERROR] /metrics not started: {error}")
+                _telemetry = telemetry
+    return _telemetry
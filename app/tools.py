@@ -9,12 +9,16 @@ import os
 import yaml
 import smtplib
 import threading
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from typing import Optional
 from pathlib import Path
 
+from mailer import SMTP_HOST, SMTP_PORT, build_lead_email, get_email_worker, make_lead
+from tracing import traced
+
+# libyaml-backed loader is several times faster; fall back to pure python
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 # google api is optional dependency
 try:
     from google.oauth2 import service_account
@@ -31,8 +35,12 @@ def load_profile(profile_path: str = "profile.yaml") -> dict:
         raise FileNotFoundError(f"Profile file not found: {profile_path}")
 
     with open(path, 'r', encoding='utf-8') as file:
-        data = yaml.safe_load(file)
+        return parse_profile_yaml(file.read())
+
 
+def parse_profile_yaml(profile_yaml: str) -> dict:
+    """Parse profile YAML text, unwrapping the top-level 'profile' key if present."""
+    data = yaml.load(profile_yaml, Loader=YAML_LOADER)
     return data.get('profile', data)
 
 
@@ -69,26 +77,64 @@ def validate_email(email: str) -> bool:
     return True
 
 
+_sheets_services = {}  # credentials file -> built service
+_sheets_lock = threading.Lock()
+
+
+@traced("tools.get_sheets_service")
 def get_sheets_service():
-    """Initialize and return Google Sheets API service."""
+    """Return the Google Sheets API service, building it once per credentials file."""
     if not GOOGLE_SHEETS_AVAILABLE:
         return None
 
     creds_file = os.getenv('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
+    service = _sheets_services.get(creds_file)
+    if service is not None:
+        return service
+
     if not Path(creds_file).exists():
         return None
 
-    try:
-        scopes = ['https://www.googleapis.com/auth/spreadsheets']
-        creds = service_account.Credentials.from_service_account_file(
-            creds_file, scopes=scopes
-        )
-        service = build('sheets', 'v4', credentials=creds)
+    with _sheets_lock:
+        service = _sheets_services.get(creds_file)
+        if service is not None:
+            return service
+        try:
+            scopes = ['https://www.googleapis.com/auth/spreadsheets']
+            creds = service_account.Credentials.from_service_account_file(
+                creds_file, scopes=scopes
+            )
+            service = build('sheets', 'v4', credentials=creds)
+        except Exception:
+            return None
+        _sheets_services[creds_file] = service
         return service
-    except Exception:
-        return None
 
 
+def build_lead_row(
+    company: Optional[str],
+    contact_name: Optional[str],
+    contact_email: Optional[str],
+    role_title: Optional[str],
+    notes: Optional[str],
+    status: str = 'New',
+    profile: str = ''
+) -> list:
+    """Row layout for the Leads!A:H sheet (H: the hosted profile the lead came in on)."""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        timestamp,
+        company or '',
+        contact_name or '',
+        contact_email or '',
+        role_title or '',
+        notes or '',
+        status,
+        profile
+    ]
+
+
+@traced("tools.append_lead_to_sheet")
 def append_lead_to_sheet(
     company: Optional[str],
     contact_name: Optional[str],
@@ -109,21 +155,12 @@ def append_lead_to_sheet(
     if contact_email and not validate_email(contact_email):
         return {'status': 'error', 'message': f'Invalid email format: {contact_email}'}
 
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    row = [
-        timestamp,
-        company or '',
-        contact_name or '',
-        contact_email or '',
-        role_title or '',
-        notes or '',
-        'New'
-    ]
+    row = build_lead_row(company, contact_name, contact_email, role_title, notes)
 
     try:
         result = service.spreadsheets().values().append(
             spreadsheetId=sheet_id,
-            range='Leads!A:G',
+            range='Leads!A:H',
             valueInputOption='USER_ENTERED',
             insertDataOption='INSERT_ROWS',
             body={'values': [row]}
@@ -139,6 +176,7 @@ def append_lead_to_sheet(
         return {'status': 'error', 'message': f'Failed to append: {str(error)}'}
 
 
+@traced("tools.send_lead_email")
 def send_lead_email(
     company: Optional[str],
     contact_name: Optional[str],
@@ -146,7 +184,10 @@ def send_lead_email(
     role_title: Optional[str],
     notes: Optional[str]
 ) -> dict:
-    """Send email notification for new lead."""
+    """Send email notification for new lead on a one-off connection.
+
+    The app path uses the pooled EmailWorker (see simulate_lead_logging).
+    """
     smtp_email = os.getenv('SMTP_EMAIL')
     smtp_password = os.getenv('SMTP_PASSWORD')
     notification_email = os.getenv('NOTIFICATION_EMAIL', smtp_email)
@@ -154,31 +195,12 @@ def send_lead_email(
     if not smtp_email or not smtp_password:
         return {'status': 'error', 'message': 'Email not configured'}
 
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-    subject = f"New Lead: {company or 'Unknown Company'}"
-    body = f"""
-New lead from Interactive AI Agent Demo!
-
-Timestamp: {timestamp}
-Company: {company or 'Not provided'}
-Contact Name: {contact_name or 'Not provided'}
-Contact Email: {contact_email or 'Not provided'}
-Role/Position: {role_title or 'Not provided'}
-Notes: {notes or 'None'}
-
----
-This lead was captured from your HuggingFace demo.
-    """
+    lead = make_lead(company, contact_name, contact_email, role_title, notes)
 
     try:
-        msg = MIMEMultipart()
-        msg['From'] = smtp_email
-        msg['To'] = notification_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
+        msg = build_lead_email(lead, smtp_email, notification_email)
 
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
+        with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
             server.login(smtp_email, smtp_password)
             server.send_message(msg)
 
@@ -189,12 +211,14 @@ This lead was captured from your HuggingFace demo.
         return {'status': 'error', 'message': f'Email failed: {str(error)}'}
 
 
+@traced("tools.simulate_lead_logging")
 def simulate_lead_logging(
     company: Optional[str],
     contact_name: Optional[str],
     contact_email: Optional[str],
     role_title: Optional[str],
-    notes: Optional[str]
+    notes: Optional[str],
+    profile: str = ''
 ) -> dict:
     """Log lead - sends email in background, returns immediately."""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -206,18 +230,16 @@ def simulate_lead_logging(
         'contact_email': contact_email or 'N/A',
         'role_title': role_title or 'N/A',
         'notes': notes or 'N/A',
-        'status': 'New'
+        'status': 'New',
+        'profile': profile or 'N/A'
     }
 
-    # send email in background thread (non-blocking)
+    # queue for the shared SMTP worker (non-blocking, bounded)
     smtp_email = os.getenv('SMTP_EMAIL')
     if smtp_email:
-        thread = threading.Thread(
-            target=send_lead_email,
-            args=(company, contact_name, contact_email, role_title, notes)
+        get_email_worker().submit(
+            make_lead(company, contact_name, contact_email, role_title, notes, profile)
         )
-        thread.daemon = True
-        thread.start()
         return {
             'status': 'ok',
             'message': 'Lead logged',
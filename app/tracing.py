@@ -0,0 +1,206 @@
+"""
+tracing.py
+Purpose: Optional nested tracing spans exported as OpenTelemetry (OTLP/JSON) lines
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH')  # unset: tracing disabled
+TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'interactive-ai-agent')
+SCOPE_NAME = 'app.tracing'
+
+SPAN_KIND_INTERNAL = 1
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def _attribute(key: str, value) -> dict:
+    """One OTLP KeyValue; bool must be checked before int."""
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+class Span:
+    """One timed operation. Children buffer on their root until the trace ends."""
+
+    __slots__ = ('tracer', 'name', 'trace_id', 'span_id', 'parent', 'root', 'attributes',
+                 'events', 'start_ns', 'end_ns', 'error', 'finished', '_previous')
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.root = parent.root if parent is not None else self
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = attributes
+        self.events = []
+        self.error = None
+        self.start_ns = self.end_ns = 0
+        self.finished = [] if parent is None else None  # root only
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        self.events.append((time.time_ns(), name, attributes))
+
+    def __enter__(self) -> "Span":
+        self._previous = self.tracer._current.get()
+        self.tracer._current.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end_ns = time.time_ns()
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.error = f"{exc_type.__name__}: {exc}"
+        # restore rather than ContextVar.reset: generators may close in another context
+        self.tracer._current.set(self._previous)
+        self.root.finished.append(self)
+        if self.root is self:
+            self.tracer.export(self.finished)
+        return False
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': SPAN_KIND_INTERNAL,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            'status': ({'code': STATUS_ERROR, 'message': self.error} if self.error
+                       else {'code': STATUS_OK}),
+        }
+        if self.parent is not None:
+            span['parentSpanId'] = self.parent.span_id
+        if self.events:
+            span['events'] = [
+                {'timeUnixNano': str(at), 'name': name,
+                 'attributes': [_attribute(k, v) for k, v in attributes.items()]}
+                for at, name, attributes in self.events
+            ]
+        return span
+
+
+class _NoopSpan:
+    """Shared stand-in returned while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Creates nested spans and appends each finished trace to a JSONL file.
+
+    The current span lives in a ContextVar, so nesting follows the call stack
+    and survives asyncio tasks and asyncio.to_thread. Work handed to other
+    threads (the lead sink, the email worker) starts its own trace. Each line
+    of the export file is one OTLP/JSON ExportTraceServiceRequest, the format
+    the OpenTelemetry Collector's file receiver and otel-desktop-viewer read.
+    """
+
+    def __init__(self, export_path: Optional[str] = TRACE_EXPORT_PATH,
+                 service_name: str = TRACE_SERVICE_NAME):
+        self.export_path = export_path
+        self.enabled = bool(export_path)
+        self.service_name = service_name
+        self.exported = 0
+        self._current = ContextVar(f'current_span_{id(self)}', default=None)
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, self._current.get(), attributes)
+
+    def current_span(self):
+        return self._current.get() if self.enabled else NOOP_SPAN
+
+    def export(self, spans: list) -> None:
+        record = {'resourceSpans': [{
+            'resource': {'attributes': [_attribute('service.name', self.service_name)]},
+            'scopeSpans': [{
+                'scope': {'name': SCOPE_NAME},
+                'spans': [span.to_otlp() for span in spans],
+            }],
+        }]}
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        try:
+            with self._lock:
+                with open(self.export_path, 'a', encoding='utf-8') as export:
+                    export.write(line)
+                self.exported += 1
+        except OSError as error:
+            print(f"[TRACE ERROR] export failed: {error}")
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def configure_tracing(export_path: Optional[str]) -> Tracer:
+    """Replace the process tracer (None disables tracing); returns the new one."""
+    global _tracer
+    _tracer = Tracer(export_path)
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """Context manager for a span under the current one; a shared no-op when disabled."""
+    return _tracer.span(name, **attributes)
+
+
+def current_span():
+    return _tracer.current_span()
+
+
+def traced(name: Optional[str] = None):
+    """Decorator: run the function inside a span named name (default: qualified name)."""
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with _tracer.span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,217 @@
+"""
+warmer.py
+Purpose: Optional prompt-cache pre-warming and keep-alive scheduler
+Author: Gregory E. Schwartz (gregory.e.schwartz@gmail.com)
+Date: 2026-10-17
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from agent import AgenticProfileAgent, MODEL_ID, USAGE_LISTENERS, usage_to_dict
+
+
+CACHE_WARM_ENABLED = os.getenv('CACHE_WARM_ENABLED', '').lower() in ('1', 'true', 'yes')
+# local-time windows such as "08:00-12:00,13:00-19:00"; empty means always
+CACHE_WARM_WINDOWS = os.getenv('CACHE_WARM_WINDOWS', '')
+CACHE_TTL_SECONDS = 300.0
+REFRESH_MARGIN_SECONDS = 30.0
+# failed warm attempts (no client, API errors) back off exponentially up to one TTL
+WARM_RETRY_BASE_SECONDS = 5.0
+WARM_RETRY_CAP_SECONDS = CACHE_TTL_SECONDS
+TRAFFIC_LOOKBACK_SECONDS = float(os.getenv('CACHE_WARM_LOOKBACK_SECONDS', '1800'))
+MIN_RECENT_TURNS = int(os.getenv('CACHE_WARM_MIN_TURNS', '1'))
+# rough prefill speed used to turn rescued cache tokens into seconds of TTFT
+PREFILL_SECONDS_PER_KTOKEN = float(os.getenv('PREFILL_SECONDS_PER_KTOKEN', '0.05'))
+
+# USD per million tokens for the chat model
+PRICE_INPUT = 3.00
+PRICE_CACHE_WRITE = 3.75
+PRICE_CACHE_READ = 0.30
+PRICE_OUTPUT = 15.00
+
+
+def parse_windows(spec: str) -> List[Tuple[int, int]]:
+    """'08:00-12:00,13:30-19:00' -> [(480, 720), (810, 1140)] in minutes after midnight."""
+    windows = []
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        start, end = part.split('-')
+        windows.append((_minutes(start), _minutes(end)))
+    return windows
+
+
+def _minutes(clock: str) -> int:
+    hours, minutes = clock.strip().split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def usage_cost(usage: dict) -> float:
+    """USD cost of one request from its usage counts."""
+    return (
+        usage['input_tokens'] * PRICE_INPUT
+        + usage['cache_creation_input_tokens'] * PRICE_CACHE_WRITE
+        + usage['cache_read_input_tokens'] * PRICE_CACHE_READ
+        + usage['output_tokens'] * PRICE_OUTPUT
+    ) / 1_000_000
+
+
+class CacheWarmer:
+    """Keep the system-prompt cache entry alive while visitors are around.
+
+    Warms once at startup, then - inside configured traffic windows and only
+    while real turns keep arriving - re-touches the cache shortly before the
+    ephemeral TTL would lapse. Real turns count as touches, so no warm request
+    is sent while traffic alone keeps the cache hot.
+    """
+
+    def __init__(
+        self,
+        profile_path: str,
+        client=None,
+        windows: Optional[List[Tuple[int, int]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.agent = AgenticProfileAgent(profile_path)
+        self.client = client or self.agent.client
+        self.windows = parse_windows(CACHE_WARM_WINDOWS) if windows is None else windows
+        self.clock = clock
+        self.last_touch = None
+        self.last_warm = None
+        self.next_attempt = None
+        self._failures = 0
+        self._turns = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {
+            'warm_requests': 0,
+            'warm_failures': 0,
+            'warm_cost_usd': 0.0,
+            'warm_cache_write_tokens': 0,
+            'warm_cache_read_tokens': 0,
+            'rescued_turns': 0,
+            'rescued_cache_tokens': 0,
+        }
+
+    def _attempt_failed(self) -> None:
+        """Schedule the next attempt with capped exponential backoff (caller holds _lock)."""
+        self._failures += 1
+        delay = min(WARM_RETRY_BASE_SECONDS * 2 ** (self._failures - 1), WARM_RETRY_CAP_SECONDS)
+        self.next_attempt = self.clock() + delay
+
+    def warm_once(self) -> Optional[dict]:
+        """Send a 1-token request carrying the exact cached system blocks."""
+        if self.client is None:
+            with self._lock:
+                self._attempt_failed()
+            return None
+        try:
+            response = self.client.messages.create(
+                model=MODEL_ID,
+                max_tokens=1,
+                system=self.agent._system_blocks(),
+                messages=[{"role": "user", "content": "."}],
+            )
+        except Exception:
+            with self._lock:
+                self.stats['warm_failures'] += 1
+                self._attempt_failed()
+            return None
+        usage = usage_to_dict(response.usage)
+        with self._lock:
+            self.last_touch = self.last_warm = self.clock()
+            self.next_attempt = None
+            self._failures = 0
+            self.stats['warm_requests'] += 1
+            self.stats['warm_cost_usd'] += usage_cost(usage)
+            self.stats['warm_cache_write_tokens'] += usage['cache_creation_input_tokens']
+            self.stats['warm_cache_read_tokens'] += usage['cache_read_input_tokens']
+        return usage
+
+    def observe_turn(self, agent, usage: dict) -> None:
+        """USAGE_LISTENERS hook: record a real turn and whether warming kept its cache hot."""
+        if agent.system_prompt != self.agent.system_prompt:
+            return
+        now = self.clock()
+        with self._lock:
+            # rescued: real traffic alone would have let the cache lapse, a warm kept it
+            previous_real = self._turns[-1] if self._turns else None
+            lapsed = previous_real is None or now - previous_real > CACHE_TTL_SECONDS
+            warmed = self.last_warm is not None and (
+                previous_real is None or self.last_warm > previous_real
+            )
+            if lapsed and warmed and usage['cache_read_input_tokens'] > 0:
+                self.stats['rescued_turns'] += 1
+                self.stats['rescued_cache_tokens'] += usage['cache_read_input_tokens']
+            self._turns.append(now)
+            self.last_touch = now
+
+    def in_window(self, now: float) -> bool:
+        if not self.windows:
+            return True
+        local = datetime.fromtimestamp(now)
+        minute = local.hour * 60 + local.minute
+        return any(start <= minute < end for start, end in self.windows)
+
+    def traffic_active(self, now: float) -> bool:
+        with self._lock:
+            while self._turns and now - self._turns[0] > TRAFFIC_LOOKBACK_SECONDS:
+                self._turns.popleft()
+            return len(self._turns) >= MIN_RECENT_TURNS
+
+    def tick(self) -> bool:
+        """One scheduling step; returns True if a warm request was sent."""
+        now = self.clock()
+        if self.next_attempt is not None and now < self.next_attempt:
+            return False
+        if self.last_touch is None:
+            return self.warm_once() is not None
+        if not (self.in_window(now) and self.traffic_active(now)):
+            return False
+        if now < self.last_touch + CACHE_TTL_SECONDS - REFRESH_MARGIN_SECONDS:
+            return False
+        return self.warm_once() is not None
+
+    def seconds_until_due(self) -> float:
+        """Never 0, so _run cannot spin while warming keeps failing."""
+        if self.next_attempt is not None:
+            return max(self.next_attempt - self.clock(), 1.0)
+        if self.last_touch is None:
+            return 1.0
+        due = self.last_touch + CACHE_TTL_SECONDS - REFRESH_MARGIN_SECONDS
+        return min(max(due - self.clock(), 1.0), REFRESH_MARGIN_SECONDS)
+
+    def report(self) -> dict:
+        """Warm-up spend against the cache-creation latency and cost it avoided."""
+        with self._lock:
+            report = dict(self.stats)
+        rescued = report['rescued_cache_tokens']
+        report['estimated_ttft_saved_seconds'] = rescued / 1000 * PREFILL_SECONDS_PER_KTOKEN
+        # each rescued turn read at cache price instead of re-writing the cache
+        report['estimated_cost_saved_usd'] = rescued * (PRICE_CACHE_WRITE - PRICE_CACHE_READ) / 1_000_000
+        report['net_cost_usd'] = report['warm_cost_usd'] - report['estimated_cost_saved_usd']
+        return report
+
+    def start(self) -> "CacheWarmer":
+        if self._thread is not None:
+            return self
+        USAGE_LISTENERS.append(self.observe_turn)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self.observe_turn in USAGE_LISTENERS:
+            USAGE_LISTENERS.remove(self.observe_turn)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.seconds_until_due())
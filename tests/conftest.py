@@ -30,3 +30,70 @@ def live_api_key() -> str:
     if not key:
         pytest.skip("ANTHROPIC_API_KEY not set — skipping live tests")
     return key
+
+
+class FakeUsage:
+    def __init__(self, **counts):
+        self.input_tokens = counts.get("input_tokens", 0)
+        self.output_tokens = counts.get("output_tokens", 0)
+        self.cache_creation_input_tokens = counts.get("cache_creation_input_tokens", 0)
+        self.cache_read_input_tokens = counts.get("cache_read_input_tokens", 0)
+
+
+class FakeMessage:
+    def __init__(self, text, usage):
+        self.content = [type("TextBlock", (), {"text": text, "type": "text"})()]
+        self.usage = usage
+
+
+class FakeMessageStream:
+    """Minimal stand-in for the SDK's MessageStream context manager."""
+
+    def __init__(self, deltas, usage=None):
+        self._deltas = list(deltas)
+        self._usage = usage or FakeUsage(output_tokens=len(self._deltas))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def text_stream(self):
+        return iter(self._deltas)
+
+    def get_final_message(self):
+        return FakeMessage("".join(self._deltas), self._usage)
+
+
+class FakeMessages:
+    def __init__(self, deltas, usage=None):
+        self.deltas = list(deltas)
+        self.usage = usage
+        self.calls = []
+
+    def stream(self, **kwargs):
+        self.calls.append(kwargs)
+        return FakeMessageStream(self.deltas, self.usage)
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return FakeMessageStream(self.deltas, self.usage).get_final_message()
+
+
+class FakeClient:
+    """Stand-in for anthropic.Anthropic that replays a fixed list of deltas."""
+
+    def __init__(self, deltas=(), usage=None):
+        self.messages = FakeMessages(deltas, usage)
+
+
+@pytest.fixture
+def fake_client_factory():
+    return FakeClient
+
+
+@pytest.fixture
+def fake_usage_factory():
+    return FakeUsage
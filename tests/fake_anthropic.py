@@ -0,0 +1,216 @@
+"""
+fake_anthropic.py
+Local stand-in for the Messages API, speaking the same JSON and SSE streaming
+protocol as the real endpoint. Runs an asyncio server on a background thread so
+both the sync and async SDK clients can be pointed at it via base_url.
+"""
+
+import asyncio
+import json
+import threading
+
+
+class FakeAnthropicServer:
+    """Configurable fake /v1/messages endpoint.
+
+    ttft: seconds before the first text delta is sent.
+    token_delay: seconds between subsequent text deltas.
+    tokens: text deltas to stream (also concatenated for non-streaming replies).
+    length: if set, stream this many generated one-word deltas instead of tokens.
+    usage: extra usage fields merged into message_start / the JSON response,
+        e.g. {"cache_read_input_tokens": 4000} to mimic a warm prompt cache.
+    prefill_per_token: extra seconds of time-to-first-token per input token,
+        modelling prompt processing so prompt size shows up in TTFT.
+    rate_limited: answer this many requests with a 429 (and retry-after-ms)
+        before serving normally.
+    """
+
+    def __init__(self, tokens=("Hello", " from", " the", " fake", " server."),
+                 ttft=0.0, token_delay=0.0, usage=None, prefill_per_token=0.0, length=None,
+                 rate_limited=0):
+        self.tokens = list(tokens) if length is None else [f" word{i}" for i in range(length)]
+        self.ttft = ttft
+        self.prefill_per_token = prefill_per_token
+        self.token_delay = token_delay
+        self.usage = dict(usage or {})
+        self.rate_limited = rate_limited
+        self.requests = []
+        self.active_streams = 0
+        self.peak_streams = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._handlers = set()
+        self.port = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "FakeAnthropicServer":
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=1024)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            for task in list(self._handlers):
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @staticmethod
+    def _input_tokens(body: dict) -> int:
+        system = body.get("system") or ""
+        if isinstance(system, list):
+            system = "".join(block.get("text", "") for block in system)
+        messages = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+        return (len(system) + messages) // 4
+
+    def _ttft(self, body: dict) -> float:
+        return self.ttft + self.prefill_per_token * self._input_tokens(body)
+
+    def _usage(self, body: dict) -> dict:
+        usage = {
+            "input_tokens": self._input_tokens(body),
+            "output_tokens": len(self.tokens),
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
+        usage.update(self.usage)
+        return usage
+
+    def _message(self, body: dict, text: str) -> dict:
+        return {
+            "id": f"msg_fake_{len(self.requests)}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": text}] if text is not None else [],
+            "stop_reason": "end_turn" if text is not None else None,
+            "stop_sequence": None,
+            "usage": self._usage(body),
+        }
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                raw = await reader.readexactly(length) if length else b""
+                body = json.loads(raw) if raw else {}
+                self.requests.append(body)
+
+                if self.rate_limited > 0:
+                    self.rate_limited -= 1
+                    await self._reject(writer)
+                elif body.get("stream"):
+                    await self._stream(body, writer)
+                else:
+                    await self._respond(body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _respond(self, body, writer):
+        await asyncio.sleep(self._ttft(body) + self.token_delay * max(len(self.tokens) - 1, 0))
+        payload = json.dumps(self._message(body, "".join(self.tokens))).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+            + f"content-length: {len(payload)}\r\n\r\n".encode()
+            + payload
+        )
+        await writer.drain()
+
+    async def _reject(self, writer):
+        payload = json.dumps({"type": "error", "error": {
+            "type": "rate_limit_error", "message": "Number of request tokens has exceeded your rate limit"
+        }}).encode()
+        writer.write(
+            b"HTTP/1.1 429 Too Many Requests\r\ncontent-type: application/json\r\n"
+            b"retry-after-ms: 20\r\n"
+            + f"content-length: {len(payload)}\r\n\r\n".encode()
+            + payload
+        )
+        await writer.drain()
+
+    async def _stream(self, body, writer):
+        self.active_streams += 1
+        self.peak_streams = max(self.peak_streams, self.active_streams)
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\n"
+                b"cache-control: no-cache\r\ntransfer-encoding: chunked\r\n\r\n"
+            )
+            start = self._message(body, None)
+            start["usage"]["output_tokens"] = 1
+            await self._event(writer, "message_start", {"type": "message_start", "message": start})
+            await self._event(writer, "content_block_start", {
+                "type": "content_block_start", "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            })
+            await asyncio.sleep(self._ttft(body))
+            for position, token in enumerate(self.tokens):
+                if position and self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+                await self._event(writer, "content_block_delta", {
+                    "type": "content_block_delta", "index": 0,
+                    "delta": {"type": "text_delta", "text": token},
+                })
+            await self._event(writer, "content_block_stop", {"type": "content_block_stop", "index": 0})
+            await self._event(writer, "message_delta", {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": len(self.tokens)},
+            })
+            await self._event(writer, "message_stop", {"type": "message_stop"})
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            self.active_streams -= 1
+
+    async def _event(self, writer, name, data):
+        chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+        writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        await writer.drain()
+
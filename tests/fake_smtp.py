@@ -0,0 +1,71 @@
+"""
+fake_smtp.py
+Minimal local SMTP stand-in (plain TCP, AUTH PLAIN) that records connections,
+logins and delivered messages. Enough of RFC 5321 for smtplib.
+"""
+
+import socketserver
+import threading
+from email import message_from_bytes
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server.fake
+        server.connections += 1
+        self._reply("220 fake-smtp ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-fake-smtp")
+                self._reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                server.logins += 1
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if line in (b".\r\n", b""):
+                        break
+                    lines.append(line[1:] if line.startswith(b"..") else line)
+                server.messages.append(message_from_bytes(b"".join(lines)))
+                self._reply("250 OK queued")
+                if server.drop_after_each:
+                    return
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class FakeSMTPServer:
+    def __init__(self, drop_after_each=False):
+        self.connections = 0
+        self.logins = 0
+        self.messages = []
+        self.drop_after_each = drop_after_each
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -6,7 +6,13 @@ Unit + live tests for AgenticProfileAgent.
 import os
 import pytest
 
-from agent import AgenticProfileAgent, MODEL_ID, LEAD_LOG_PATTERN
+from agent import (
+    AgenticProfileAgent,
+    HISTORY_CACHE_BREAKPOINTS,
+    LeadLogScanner,
+    MODEL_ID,
+    LEAD_LOG_PATTERN,
+)
 
 
 def test_agent_initializes_without_api_key(monkeypatch, profile_path):
@@ -32,6 +38,44 @@ def test_system_blocks_include_cache_control(profile_path):
     assert blocks[0]["cache_control"] == {"type": "ephemeral"}
 
 
+def _breakpoints(request):
+    count = sum(1 for block in request["system"] if "cache_control" in block)
+    for message in request["messages"]:
+        if isinstance(message["content"], list):
+            count += sum(1 for block in message["content"] if "cache_control" in block)
+    return count
+
+
+def test_history_breakpoints_roll_forward(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    for turn in range(4):
+        agent.history.append({"role": "user", "content": f"question {turn}"})
+        agent.history.append({"role": "assistant", "content": f"answer {turn}"})
+    agent.history.append({"role": "user", "content": "question 4"})
+
+    request = agent._request_kwargs()
+    messages = request["messages"]
+    marked = [i for i, m in enumerate(messages) if isinstance(m["content"], list)]
+    assert marked == [6, 8]
+    assert messages[8]["content"][0]["text"] == "question 4"
+    assert _breakpoints(request) == 1 + HISTORY_CACHE_BREAKPOINTS <= 4
+    assert all(isinstance(m["content"], str) for m in agent.history)
+
+
+def test_chat_stream_records_cache_usage(profile_path, fake_client_factory, fake_usage_factory):
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = fake_client_factory(
+        ["Hi", " there."],
+        usage=fake_usage_factory(input_tokens=12, output_tokens=2,
+                                 cache_creation_input_tokens=40,
+                                 cache_read_input_tokens=4000),
+    )
+    "".join(agent.chat_stream("hello"))
+    assert agent.last_usage["cache_read_input_tokens"] == 4000
+    assert agent.last_usage["cache_creation_input_tokens"] == 40
+    assert len(agent.turn_usage) == 1
+
+
 def test_model_id_is_sonnet_4_5():
     assert MODEL_ID == "claude-sonnet-4-5-20250929"
 
@@ -61,6 +105,43 @@ def test_finalize_strips_lead_log(profile_path):
     assert "[[LEAD_LOG]]" not in agent.history[-1]["content"]
 
 
+def test_scanner_withholds_marker_split_across_deltas():
+    scanner = LeadLogScanner()
+    deltas = ["Happy to talk! [", "[LEAD", "_LOG]", "] {\"company\": \"Acme\"}"]
+    visible = "".join(scanner.feed(d) for d in deltas) + scanner.flush()
+    assert visible == "Happy to talk! "
+    assert scanner.marker_seen
+    assert scanner.text() == "".join(deltas)
+
+
+def test_scanner_releases_false_prefix_on_flush():
+    scanner = LeadLogScanner()
+    visible = scanner.feed("see [[LEAD")
+    assert visible == "see "
+    assert scanner.flush() == "[[LEAD"
+    assert not scanner.marker_seen
+
+
+def test_scanner_passes_brackets_that_cannot_start_marker():
+    scanner = LeadLogScanner()
+    assert scanner.feed("[[x]] and [y]") == "[[x]] and [y]"
+
+
+def test_chat_stream_hides_lead_log(profile_path, fake_client_factory):
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = fake_client_factory([
+        "Thanks for", " reaching out!\n[[LEAD_",
+        'LOG]] {"company": "Acme", "contact_name": null,',
+        ' "contact_email": null, "role_title": null, "notes": null}',
+    ])
+    logged = []
+    agent._log_lead = logged.append
+    streamed = "".join(agent.chat_stream("We are hiring at Acme"))
+    assert streamed == "Thanks for reaching out!\n"
+    assert agent.history[-1]["content"] == "Thanks for reaching out!"
+    assert logged and logged[0]["company"] == "Acme"
+
+
 def test_reset_conversation(profile_path):
     agent = AgenticProfileAgent(profile_path)
     agent.history.append({"role": "user", "content": "hi"})
@@ -0,0 +1,112 @@
+"""
+test_answers.py
+Unit tests for the precomputed example-question answer cache.
+"""
+
+import shutil
+import time
+
+from agent import AgenticProfileAgent
+from answers import AnswerCache, LocalBatches, precompute_answers
+
+
+def test_lookup_is_normalized_and_keyed_by_prompt_hash():
+    cache = AnswerCache()
+    cache.put("hash-a", "What's your email?", "gregory.e.schwartz@gmail.com")
+    assert cache.get("hash-a", "  what's your EMAIL ") == "gregory.e.schwartz@gmail.com"
+    assert cache.get("hash-b", "What's your email?") is None
+
+
+def test_ttl_expiry():
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put("h", "q", "old answer", created_at=time.time() - 120)
+    assert cache.get("h", "q") is None
+    assert len(cache) == 0
+
+
+def test_size_eviction_drops_least_recently_used():
+    cache = AnswerCache(max_bytes=25)
+    cache.put("h", "one", "a" * 10)
+    cache.put("h", "two", "b" * 10)
+    cache.get("h", "one")
+    cache.put("h", "three", "c" * 10)
+    assert cache.get("h", "two") is None
+    assert cache.get("h", "one") == "a" * 10
+    assert cache.get("h", "three") == "c" * 10
+
+
+def test_precompute_through_local_batches(tmp_path, profile_path, fake_client_factory):
+    client = fake_client_factory(['Precomputed reply.\n[[LEAD_LOG]] {"company": null}'])
+    cache = AnswerCache(str(tmp_path / "answers.json"))
+    questions = ["Tell me about your background", "What's your email?"]
+
+    result = precompute_answers(profile_path, cache, questions, client=client,
+                                use_batches=True, batches=LocalBatches(client))
+    assert result == {"stored": 2, "failed": []}
+
+    request = client.messages.calls[0]
+    assert request["messages"][0]["content"][0]["text"] == questions[0]
+    assert request["system"][0]["cache_control"] == {"type": "ephemeral"}
+
+    reloaded = AnswerCache(str(tmp_path / "answers.json")).load()
+    prompt_hash = AgenticProfileAgent(profile_path).prompt_hash
+    assert reloaded.get(prompt_hash, questions[1]) == "Precomputed reply."
+
+
+def test_profile_change_invalidates_answers(tmp_path, profile_path, fake_client_factory):
+    copy = tmp_path / "profile.yaml"
+    shutil.copy(profile_path, copy)
+    client = fake_client_factory(["First version."])
+    cache = AnswerCache()
+    precompute_answers(str(copy), cache, ["What's your email?"], client=client)
+    old_hash = AgenticProfileAgent(str(copy)).prompt_hash
+
+    # a comment-only edit compiles to the same prompt, so its answers still hold
+    copy.write_text(copy.read_text(encoding="utf-8") + "\n# edited\n", encoding="utf-8")
+    assert AgenticProfileAgent(str(copy)).prompt_hash == old_hash
+    copy.write_text(copy.read_text(encoding="utf-8").replace("Systems Architect", "Architect"),
+                    encoding="utf-8")
+    new_hash = AgenticProfileAgent(str(copy)).prompt_hash
+    assert new_hash != old_hash
+    assert cache.get(new_hash, "What's your email?") is None
+
+    precompute_answers(str(copy), cache, ["What's your email?"], client=client)
+    assert cache.get(old_hash, "What's your email?") is None
+    assert cache.get(new_hash, "What's your email?") == "First version."
+
+
+def test_prompt_template_and_retrieval_mode_change_the_key(monkeypatch, profile_path):
+    import agent as agent_module
+    import registry
+
+    full = AgenticProfileAgent(profile_path).prompt_hash
+    assert AgenticProfileAgent(profile_path).prompt_hash == full
+    assert AgenticProfileAgent(profile_path, retrieval="bm25").prompt_hash != full
+    monkeypatch.setattr(agent_module, "MAX_TOKENS", 512)
+    assert AgenticProfileAgent(profile_path).prompt_hash != full
+    monkeypatch.undo()
+
+    template = registry.build_system_prompt
+    monkeypatch.setattr(registry, "build_system_prompt",
+                        lambda *args: template(*args) + "\nNever share an email address.")
+    registry.clear_registry()
+    try:
+        assert AgenticProfileAgent(profile_path).prompt_hash != full
+    finally:
+        monkeypatch.undo()
+        registry.clear_registry()
+
+
+def test_replay_answer_records_turn(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    chunks = list(agent.replay_answer("What's your email?", "gregory.e.schwartz@gmail.com"))
+    assert "".join(chunks) == "gregory.e.schwartz@gmail.com"
+    assert [m["role"] for m in agent.history] == ["user", "assistant"]
+
+
+def test_replay_answer_over_budget_yields_the_notice(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    agent.input_budget = 100
+    reply = "".join(agent.replay_answer("What's your email?", "gregory.e.schwartz@gmail.com"))
+    assert "gregory" not in reply and reply
+    assert agent.history == [] and agent.turns_committed == 0
@@ -0,0 +1,56 @@
+"""
+test_assets.py
+Unit tests for the content-hashed static asset layer.
+"""
+
+import base64
+import os
+
+import pytest
+
+from assets import clear_assets, get_asset
+
+
+@pytest.fixture(autouse=True)
+def fresh_assets():
+    clear_assets()
+    yield
+    clear_assets()
+
+
+def test_asset_loaded_once_and_published(tmp_path):
+    source = tmp_path / "hero.png"
+    source.write_bytes(b"png-bytes")
+    published = tmp_path / "published"
+    first = get_asset(source, published)
+    assert get_asset(source, published) is first
+    assert first.mime == "image/png"
+    assert first.filename == f"hero.{first.content_hash[:12]}.png"
+    assert first.url.endswith(f"/_assets/{first.filename}")
+    assert (published / first.filename).read_bytes() == b"png-bytes"
+    assert first.data_uri == "data:image/png;base64," + base64.b64encode(b"png-bytes").decode()
+
+
+def test_changed_file_gets_new_name(tmp_path):
+    source = tmp_path / "cv.pdf"
+    source.write_bytes(b"v1")
+    first = get_asset(source, tmp_path)
+    source.write_bytes(b"version 2")
+    os.utime(source, ns=(1, 1))
+    second = get_asset(source, tmp_path)
+    assert second.data == b"version 2"
+    assert second.filename != first.filename
+    assert (tmp_path / first.filename).exists() and (tmp_path / second.filename).exists()
+
+
+def test_missing_asset_is_none(tmp_path):
+    assert get_asset(tmp_path / "missing.png", tmp_path) is None
+
+
+def test_unwritable_publish_dir_falls_back(tmp_path):
+    source = tmp_path / "a.png"
+    source.write_bytes(b"x")
+    blocker = tmp_path / "blocker"
+    blocker.write_text("not a directory")
+    asset = get_asset(source, blocker / "sub")
+    assert asset is not None and not asset.published
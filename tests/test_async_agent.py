@@ -0,0 +1,83 @@
+"""
+test_async_agent.py
+Async API tests (achat / achat_stream) against the local fake Messages server.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agent import AgenticProfileAgent
+from client import reset_shared_client
+from tests.fake_anthropic import FakeAnthropicServer
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    server = FakeAnthropicServer(
+        tokens=["Thanks", " for", " asking!", "\n[[LEAD_LOG]] ",
+                '{"company": "Acme", "contact_name": null, "contact_email": null,'
+                ' "role_title": null, "notes": null}'],
+    ).start()
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", server.base_url)
+    reset_shared_client()
+    yield server
+    reset_shared_client()
+    server.stop()
+
+
+def test_achat_stream_matches_sync_semantics(fake_server, profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    logged = []
+    agent._log_lead = logged.append
+
+    async def run():
+        return [chunk async for chunk in agent.achat_stream("We're hiring at Acme")]
+
+    streamed = "".join(asyncio.run(run()))
+    assert streamed == "Thanks for asking!\n"
+    assert agent.history[-1] == {"role": "assistant", "content": "Thanks for asking!"}
+    assert logged[0]["company"] == "Acme"
+
+    sync_agent = AgenticProfileAgent(profile_path)
+    sync_agent._log_lead = lambda parsed: None
+    assert "".join(sync_agent.chat_stream("We're hiring at Acme")) == streamed
+
+
+def test_achat_returns_clean_text(fake_server, profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    agent._log_lead = lambda parsed: None
+    reply = asyncio.run(agent.achat("Hello"))
+    assert reply == "Thanks for asking!"
+    assert [m["role"] for m in agent.history] == ["user", "assistant"]
+
+
+def test_achat_without_api_key(monkeypatch, profile_path):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    agent = AgenticProfileAgent(profile_path)
+    assert "not configured" in asyncio.run(agent.achat("Hello")).lower()
+
+
+def test_one_loop_serves_more_streams_than_thread_pool(fake_server, profile_path):
+    """150 concurrent streams on one loop overlap far beyond the default executor size."""
+    fake_server.ttft = 1.0
+    sessions = 150
+
+    async def one_session():
+        agent = AgenticProfileAgent(profile_path)
+        agent._log_lead = lambda parsed: None
+        return "".join([chunk async for chunk in agent.achat_stream("hi")])
+
+    async def run():
+        return await asyncio.gather(*(one_session() for _ in range(sessions)))
+
+    start = time.perf_counter()
+    replies = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert all(reply == "Thanks for asking!\n" for reply in replies)
+    assert fake_server.peak_streams > 32
+    # serialized through a 32-thread pool this would take at least 5 rounds of 1s
+    assert elapsed < 3.0, f"{sessions} streams took {elapsed:.2f}s"
@@ -0,0 +1,170 @@
+"""
+test_benchmarks.py
+Offline benchmark suite against the local fake streaming server. Each metric is
+compared with tests/benchmark_baselines.json and fails on a regression beyond
+BENCHMARK_TOLERANCE (a ratio, default 3x, to absorb machine-to-machine noise).
+Refresh the baselines after an intentional change with:
+    BENCHMARK_UPDATE=1 python -m pytest tests/test_benchmarks.py
+"""
+
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from agent import AgenticProfileAgent
+from client import reset_shared_client
+from tests.conftest import FakeClient
+from tests.fake_anthropic import FakeAnthropicServer
+
+pytestmark = pytest.mark.benchmark
+
+BASELINE_PATH = Path(__file__).parent / "benchmark_baselines.json"
+TOLERANCE = float(os.getenv("BENCHMARK_TOLERANCE", "3.0"))
+UPDATE = os.getenv("BENCHMARK_UPDATE") == "1"
+
+STREAM_DELTAS = 2000
+SERVER_TTFT = 0.05
+CONCURRENT_SESSIONS = 100
+# metric -> True when larger is better
+HIGHER_IS_BETTER = {
+    "stream_us_per_delta": False,
+    "stream_overhead_us_per_delta": False,
+    "ttft_overhead_ms": False,
+    "finalize_us": False,
+    "concurrent_turns_per_second": True,
+}
+
+
+@pytest.fixture(scope="module")
+def server():
+    patch = pytest.MonkeyPatch()
+    fake = FakeAnthropicServer(length=STREAM_DELTAS).start()
+    patch.setenv("ANTHROPIC_API_KEY", "test-key")
+    patch.setenv("ANTHROPIC_BASE_URL", fake.base_url)
+    reset_shared_client()
+    yield fake
+    reset_shared_client()
+    fake.stop()
+    patch.undo()
+
+
+def _agent(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    agent._log_lead = lambda parsed: None
+    return agent
+
+
+def _best(measure, repeats=3):
+    return min(measure() for _ in range(repeats))
+
+
+def _stream_seconds(agent):
+    agent.reset_conversation()
+    start = time.perf_counter()
+    for _ in agent.chat_stream("hi"):
+        pass
+    return time.perf_counter() - start
+
+
+def measure_stream(server, profile_path):
+    """Seconds per delta for chat_stream end to end over HTTP/SSE from the fake server."""
+    server.tokens = [f" word{i}" for i in range(STREAM_DELTAS)]
+    server.ttft = 0.0
+    agent = _agent(profile_path)
+    return _best(lambda: _stream_seconds(agent)) / STREAM_DELTAS
+
+
+def measure_stream_overhead(profile_path):
+    """Seconds per delta spent in chat_stream itself, with the SDK replaced by an in-memory stream."""
+    agent = _agent(profile_path)
+    deltas = ["word[ " if i % 50 == 0 else "word " for i in range(STREAM_DELTAS)]
+    agent.client = FakeClient(deltas)
+    return _best(lambda: _stream_seconds(agent), repeats=5) / STREAM_DELTAS
+
+
+def measure_ttft_overhead(server, profile_path):
+    """Seconds from chat_stream() to first visible chunk, beyond the server's own TTFT."""
+    server.tokens = ["Hello", " there."]
+    server.ttft = SERVER_TTFT
+    agent = _agent(profile_path)
+
+    def first_chunk():
+        agent.reset_conversation()
+        start = time.perf_counter()
+        chunks = agent.chat_stream("hi")
+        next(chunks)
+        elapsed = time.perf_counter() - start
+        for _ in chunks:
+            pass
+        return elapsed - SERVER_TTFT
+
+    return _best(first_chunk, repeats=5)
+
+
+def measure_finalize(profile_path, calls=200):
+    """Mean seconds per _finalize on a long reply ending in a lead marker."""
+    agent = _agent(profile_path)
+    raw = ("I built retrieval pipelines and agent systems. " * 80 + "\n[[LEAD_LOG]] "
+           '{"company": "Acme", "contact_name": "Jane", "contact_email": null,'
+           ' "role_title": "ML Engineer", "notes": null}')
+
+    def batch():
+        start = time.perf_counter()
+        for _ in range(calls):
+            agent.history = [{"role": "user", "content": "hi"}]
+            agent._finalize(raw)
+        return (time.perf_counter() - start) / calls
+
+    return _best(batch)
+
+
+def measure_concurrency(server, profile_path):
+    """Completed turns per second for many simultaneous async sessions."""
+    server.tokens = [f" word{i}" for i in range(20)]
+    server.ttft = SERVER_TTFT
+
+    async def one_session():
+        agent = _agent(profile_path)
+        return "".join([chunk async for chunk in agent.achat_stream("hi")])
+
+    async def run():
+        return await asyncio.gather(*(one_session() for _ in range(CONCURRENT_SESSIONS)))
+
+    def once():
+        start = time.perf_counter()
+        asyncio.run(run())
+        return time.perf_counter() - start
+
+    return CONCURRENT_SESSIONS / _best(once, repeats=2)
+
+
+@pytest.fixture(scope="module")
+def results(server, profile_path):
+    measured = {
+        "stream_us_per_delta": measure_stream(server, profile_path) * 1e6,
+        "stream_overhead_us_per_delta": measure_stream_overhead(profile_path) * 1e6,
+        "ttft_overhead_ms": measure_ttft_overhead(server, profile_path) * 1e3,
+        "finalize_us": measure_finalize(profile_path) * 1e6,
+        "concurrent_turns_per_second": measure_concurrency(server, profile_path),
+    }
+    print("\n" + "\n".join(f"{name:<30} {value:10.2f}" for name, value in measured.items()))
+    if UPDATE:
+        BASELINE_PATH.write_text(json.dumps(
+            {name: round(value, 2) for name, value in measured.items()}, indent=2
+        ) + "\n", encoding="utf-8")
+    return measured
+
+
+@pytest.mark.parametrize("metric", sorted(HIGHER_IS_BETTER))
+def test_no_regression_against_baseline(results, metric):
+    baselines = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    measured, baseline = results[metric], baselines[metric]
+    if HIGHER_IS_BETTER[metric]:
+        assert measured >= baseline / TOLERANCE, f"{metric}: {measured:.2f} vs baseline {baseline}"
+    else:
+        # 1.0 absolute slack keeps near-zero overheads from failing on jitter alone
+        assert measured <= baseline * TOLERANCE + 1.0, f"{metric}: {measured:.2f} vs baseline {baseline}"
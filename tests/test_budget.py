@@ -0,0 +1,135 @@
+"""
+test_budget.py
+Unit tests for the calibrated token estimator and pre-flight input budget enforcement.
+"""
+
+import math
+
+import pytest
+
+from agent import AgenticProfileAgent
+from budget import InputBudgetExceeded, TokenEstimator, trim_text
+from scheduler import PRIORITY_ACTIVE, PRIORITY_BACKGROUND, PRIORITY_NEW, Scheduler
+
+
+def _agent(profile_path, fake_client_factory, policy="compact", **limits):
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = fake_client_factory(["Sure."])
+    agent.estimator = TokenEstimator()
+    agent.budget_policy = policy
+    agent.input_budget = limits.get("budget", agent.input_budget)
+    agent.user_message_limit = limits.get("user_limit", agent.user_message_limit)
+    return agent
+
+
+def _fill_history(agent, turns, words=300):
+    for turn in range(turns):
+        agent.history.append({"role": "user", "content": f"question {turn} " + "word " * words})
+        agent.history.append({"role": "assistant", "content": "answer " * words})
+
+
+def test_estimator_caches_and_calibrates():
+    estimator = TokenEstimator(cache_size=2)
+    assert estimator.raw_count("a" * 400) == 100
+    assert estimator.raw_count("x = f(a, b);") == 9  # one per word or symbol
+    estimator.raw_count("third")
+    assert list(estimator._cache) == ["x = f(a, b);", "third"]
+    estimator.observe(1000, 1200)
+    assert estimator.ratio == pytest.approx(1.2)
+    estimator.observe(1000, 1000)
+    assert 1.0 < estimator.ratio < 1.2
+    assert estimator.estimate("a" * 400) == math.ceil(100 * estimator.ratio)
+
+
+def test_usage_calibrates_the_agent_estimator(profile_path, fake_client_factory, fake_usage_factory):
+    agent = _agent(profile_path, fake_client_factory)
+    raw = agent.estimator.raw_request(*agent._request_texts("hello"))
+    agent.client = fake_client_factory(["Hi."], usage=fake_usage_factory(
+        input_tokens=10, cache_read_input_tokens=raw * 2 - 10, output_tokens=2))
+    agent.chat("hello")
+    assert agent.estimator.ratio == pytest.approx(2.0)
+    agent.reset_conversation()
+    assert agent.preflight("hello").estimated_tokens == pytest.approx(2 * raw, abs=1)
+
+
+def test_preflight_reports_without_side_effects(profile_path, fake_client_factory):
+    agent = _agent(profile_path, fake_client_factory, user_limit=100)
+    check = agent.preflight("word " * 500)
+    assert check.user_over_limit and check.action == "trim"
+    assert "trimmed" in check.notice
+    assert agent.history == []
+    assert agent.preflight("short question").action == "ok"
+
+
+def test_long_message_is_trimmed(profile_path, fake_client_factory):
+    agent = _agent(profile_path, fake_client_factory, policy="trim", user_limit=100)
+    agent.chat("START " + "filler " * 1000 + "END")
+    sent = agent.history[0]["content"]
+    assert sent.startswith("START") and sent.endswith("END")
+    assert "tokens trimmed to fit the input budget" in sent
+    assert agent.estimator.estimate(sent) <= 110
+
+
+def test_reject_policy_skips_the_api(profile_path, fake_client_factory):
+    agent = _agent(profile_path, fake_client_factory, policy="reject", user_limit=100)
+    reply = "".join(agent.chat_stream("filler " * 1000))
+    assert "too long" in reply
+    assert agent.history == [] and agent.client.messages.calls == []
+
+
+def test_compact_policy_folds_history_before_sending(profile_path, fake_client_factory):
+    agent = _agent(profile_path, fake_client_factory)
+    _fill_history(agent, 8)
+    agent.input_budget = agent.preflight("next?").estimated_tokens - 1000
+    assert agent.preflight("next?").action == "compact"
+    agent.chat("next?")
+    request = agent.client.messages.calls[-1]
+    assert agent.compactor.summary
+    assert len(request["messages"]) < 17
+    assert agent.estimator.raw_request(*agent._request_texts()) <= agent.input_budget
+
+
+def test_compact_policy_summary_runs_at_the_turns_priority(profile_path, fake_client_factory):
+    agent = _agent(profile_path, fake_client_factory)
+    priorities = []
+
+    class RecordingScheduler(Scheduler):
+        def run(self, call, tokens, priority=PRIORITY_NEW, *args, **kwargs):
+            priorities.append(priority)
+            return super().run(call, tokens, priority, *args, **kwargs)
+
+    agent.scheduler = RecordingScheduler()
+    _fill_history(agent, 8)
+    agent.input_budget = agent.preflight("next?").estimated_tokens - 1000
+    agent.chat("next?")
+    # summary first, then the turn itself; neither waits behind background work
+    assert priorities == [PRIORITY_ACTIVE, PRIORITY_ACTIVE]
+    agent._summarize_history("", agent.history[:2])
+    assert priorities[-1] == PRIORITY_BACKGROUND
+
+
+def test_trim_policy_drops_oldest_turns(profile_path, fake_client_factory):
+    agent = _agent(profile_path, fake_client_factory, policy="trim")
+    _fill_history(agent, 6)
+    agent.input_budget = agent.preflight("next?").estimated_tokens - 1000
+    agent.chat("next?")
+    messages = agent.client.messages.calls[-1]["messages"]
+    assert messages[0]["role"] == "user"
+    assert "question 0 " not in str(messages[0]["content"])
+    assert agent.compactor.summary == ""
+
+
+def test_request_over_budget_without_history_is_rejected(profile_path, fake_client_factory):
+    agent = _agent(profile_path, fake_client_factory, budget=100)
+    with pytest.raises(InputBudgetExceeded):
+        agent._begin_turn("hello")
+    assert agent.history == []
+
+
+def test_trim_text_keeps_head_and_tail():
+    estimator = TokenEstimator()
+    text = "alpha " + "beta " * 400 + "omega"
+    trimmed = trim_text(text, 50, estimator)
+    assert trimmed.startswith("alpha") and trimmed.endswith("omega")
+    assert estimator.estimate(trimmed) <= 60
+    assert trim_text("short", 50, estimator) == "short"
@@ -0,0 +1,91 @@
+"""
+test_catalog.py
+Unit tests for the multi-profile catalog (lazy loading, LRU memory cap, slugs).
+"""
+
+import pytest
+
+import compiler
+from assets import clear_assets
+from catalog import DEFAULT_PROFILE_SLUG, ProfileCatalog
+from registry import clear_registry, get_compiled_profile
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    clear_registry()
+    clear_assets()
+    yield
+    clear_registry()
+    clear_assets()
+
+
+def _write_profile(root, slug, name, pdf=False):
+    directory = root / slug
+    directory.mkdir(parents=True)
+    (directory / "profile.yaml").write_text(
+        f"profile:\n  name: {name}\n  contact:\n    email: {slug}@example.com\n"
+        f"  summary: {'Long summary. ' * 50}\n",
+        encoding="utf-8",
+    )
+    if pdf:
+        (directory / f"{slug}_cv.pdf").write_bytes(b"%PDF-1.4 fake")
+
+
+@pytest.fixture
+def catalog(tmp_path, profile_path):
+    for slug, name in (("ada", "Ada Lovelace"), ("alan", "Alan Turing"), ("grace", "Grace Hopper")):
+        _write_profile(tmp_path, slug, name, pdf=slug == "ada")
+    return ProfileCatalog(root=tmp_path, default_profile=profile_path, default_pdf=None)
+
+
+def test_profiles_load_lazily_and_hit_afterwards(catalog):
+    assert len(catalog) == 0
+    entry = catalog.get("ada")
+    assert entry.compiled.name == "Ada Lovelace"
+    assert entry.pdf_filename == "ada_cv.pdf"
+    assert "ada@example.com" in entry.compiled.system_prompt
+    assert catalog.get("ADA") is entry
+    assert catalog.stats == {"loads": 1, "hits": 1, "evictions": 0, "rejected": 0}
+
+
+def test_default_and_unknown_slugs(catalog):
+    assert catalog.get(None).slug == DEFAULT_PROFILE_SLUG
+    assert catalog.get("").slug == DEFAULT_PROFILE_SLUG
+    assert catalog.get("nobody") is None
+    assert catalog.get("../etc") is None
+
+
+def test_memory_cap_evicts_least_recently_used(catalog):
+    ada = catalog.get("ada")
+    catalog.max_bytes = int(ada.size_bytes * 2.5)
+    catalog.get("alan")
+    catalog.get("ada")       # ada is now most recent
+    catalog.get("grace")     # over the cap: alan goes
+    assert "alan" not in catalog and "ada" in catalog and "grace" in catalog
+    assert catalog.stats["evictions"] == 1
+    assert catalog.loaded_bytes <= catalog.max_bytes
+
+
+def test_edited_profile_is_reloaded(catalog, tmp_path):
+    first = catalog.get("alan")
+    path = tmp_path / "alan" / "profile.yaml"
+    path.write_text(path.read_text().replace("Alan Turing", "A. M. Turing"), encoding="utf-8")
+    second = catalog.get("alan")
+    assert second is not first
+    assert second.compiled.name == "A. M. Turing"
+    assert get_compiled_profile(second.profile_path) is second.compiled
+
+
+def test_over_budget_profile_is_flagged_or_dropped_alone(catalog, monkeypatch):
+    ada = catalog.get("ada")
+    monkeypatch.setattr(compiler, "PROMPT_TOKEN_BUDGET", ada.compiled.prompt_tokens + 50)
+    path = catalog.root / "alan" / "profile.yaml"
+    path.write_text(path.read_text().replace("Long summary. ", "Much longer summary. " * 3),
+                    encoding="utf-8")
+    assert catalog.get("alan").over_budget and not catalog.get("ada").over_budget
+
+    catalog.enforce_budget = True
+    assert catalog.get("alan") is None
+    assert "alan" not in catalog and catalog.stats["rejected"] == 1
+    assert catalog.get("ada") is ada and catalog.get("grace").compiled.name == "Grace Hopper"
@@ -0,0 +1,75 @@
+"""
+test_client.py
+Unit tests for the shared, pooled Anthropic client.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent import AgenticProfileAgent
+from client import (
+    build_http_client,
+    connection_stats,
+    get_shared_client,
+    reset_shared_client,
+)
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_client():
+    reset_shared_client()
+    connection_stats.reset()
+    yield
+    reset_shared_client()
+
+
+def test_agents_share_one_client(monkeypatch, profile_path):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    first = AgenticProfileAgent(profile_path)
+    second = AgenticProfileAgent(profile_path)
+    assert first.client is not None
+    assert first.client is second.client
+
+
+def test_no_client_without_api_key(monkeypatch):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    assert get_shared_client() is None
+
+
+def test_pooled_http_client_reuses_connections(local_server):
+    http_client = build_http_client(pool_size=4, keepalive_seconds=30)
+    try:
+        for _ in range(5):
+            assert http_client.get(local_server).status_code == 200
+    finally:
+        http_client.close()
+    stats = connection_stats.snapshot()
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 4
@@ -0,0 +1,80 @@
+"""
+test_compiler.py
+Unit tests for the profile-to-prompt compiler and its token budget.
+"""
+
+from pathlib import Path
+
+import pytest
+
+import compiler
+from agent import AgenticProfileAgent
+from compiler import PromptBudgetExceeded, check_budget, compile_profile, profile_text
+from registry import clear_registry, get_compiled_profile
+from tools import parse_profile_yaml
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    clear_registry()
+    yield
+    clear_registry()
+
+
+def test_formatting_and_comments_do_not_change_output():
+    first = parse_profile_yaml(
+        "profile:\n  name: 'Ada'\n  # comment\n  skills: [python,  rust]\n"
+        "  summary: |\n    Builds   things\n    well.\n"
+    )
+    second = parse_profile_yaml(
+        'profile:\n  name: Ada\n  skills:\n    - python\n    - rust\n'
+        '  summary: "Builds things well."\n'
+    )
+    assert profile_text(compile_profile(first)) == profile_text(compile_profile(second))
+    assert profile_text(compile_profile(first)) == (
+        "name: Ada\nskills: python, rust\nsummary: Builds things well."
+    )
+
+
+def test_nested_lists_and_empty_values():
+    sections = compile_profile({
+        "experience": [{"company": "Acme", "dates": None, "projects": [{"name": "X", "tags": []}]}],
+        "awards": [],
+    })
+    assert list(sections) == ["experience"]
+    assert sections["experience"] == (
+        "experience:\n - company: Acme\n   projects:\n    - name: X"
+    )
+
+
+def test_compiled_profile_is_smaller_than_raw_yaml(profile_path):
+    compiled = get_compiled_profile(profile_path)
+    assert "=== PROFILE ===" in compiled.system_prompt
+    assert "#" not in compiled.sections["name"]
+    raw_tokens = compiler.estimate_tokens(compiled.profile_yaml)
+    assert sum(compiled.section_tokens.values()) < 0.95 * raw_tokens
+    assert len(profile_text(compiled.sections)) < 0.95 * len(compiled.profile_yaml)
+    assert set(compiled.section_tokens) == set(compiled.sections)
+
+
+def test_shipped_profiles_fit_the_budget(profile_path):
+    shipped = [Path(profile_path)] + sorted(Path(profile_path).parent.glob("profiles/*/profile.yaml"))
+    for path in shipped:
+        compiled = get_compiled_profile(str(path), enforce_budget=True)
+        assert not compiled.over_budget, path
+
+
+def test_budget_exceeded_fails_the_build(monkeypatch, profile_path):
+    with pytest.raises(PromptBudgetExceeded, match="experience"):
+        check_budget("x" * 4000, budget=10, sections={"experience": "x" * 400, "name": "x"})
+    monkeypatch.setattr(compiler, "PROMPT_TOKEN_BUDGET", 100)
+    with pytest.raises(PromptBudgetExceeded):
+        get_compiled_profile(profile_path, enforce_budget=True)
+
+
+def test_over_budget_profile_falls_back_to_retrieval_at_runtime(monkeypatch, profile_path):
+    monkeypatch.setattr(compiler, "PROMPT_TOKEN_BUDGET", 100)
+    assert get_compiled_profile(profile_path).over_budget
+    agent = AgenticProfileAgent(profile_path, retrieval="off")
+    assert agent.retriever is not None
+    assert agent.system_prompt == agent.retriever.system_prompt
@@ -0,0 +1,121 @@
+"""
+test_conversations.py
+Unit tests for the persistent conversation store and resuming an agent from it.
+"""
+
+from agent import AgenticProfileAgent
+from conversations import SQLiteConversationStore, sign_resume_token, verify_resume_token
+
+
+def _talk(store, conversation_id, turns):
+    for turn in range(turns):
+        store.append(conversation_id, "user", f"question {turn}")
+        store.append(conversation_id, "assistant", f"answer {turn}")
+
+
+def test_recent_window_starts_at_a_user_turn():
+    store = SQLiteConversationStore(None)
+    conversation_id = store.create("default")
+    _talk(store, conversation_id, 10)
+    assert store.count(conversation_id) == 20
+    recent = store.recent(conversation_id, 5)
+    assert [m["content"] for m in recent] == ["question 8", "answer 8", "question 9", "answer 9"]
+    assert store.recent(store.create("default")) == []
+
+
+def test_conversations_survive_reopening(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    store = SQLiteConversationStore(path)
+    conversation_id = store.create("ada")
+    _talk(store, conversation_id, 2)
+    store.save_summary(conversation_id, "Visitor asked about graphs.")
+    store.close()
+
+    reopened = SQLiteConversationStore(path)
+    assert reopened.profile_of(conversation_id) == "ada"
+    assert reopened.profile_of("missing") is None
+    assert reopened.recent(conversation_id)[-1] == {"role": "assistant", "content": "answer 1"}
+    assert reopened.summary(conversation_id) == "Visitor asked about graphs."
+
+
+def test_clear_forgets_messages_and_summary():
+    store = SQLiteConversationStore(None)
+    conversation_id = store.create("default")
+    _talk(store, conversation_id, 3)
+    store.save_summary(conversation_id, "summary")
+    store.clear(conversation_id)
+    assert store.count(conversation_id) == 0 and store.summary(conversation_id) == ""
+    assert store.profile_of(conversation_id) == "default"
+
+
+def test_agent_resumes_window_and_summary(profile_path, fake_client_factory):
+    store = SQLiteConversationStore(None)
+    conversation_id = store.create("default")
+    _talk(store, conversation_id, 3)
+    store.append(conversation_id, "user", "unanswered")  # visitor left mid-response
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = fake_client_factory(["Sure."])
+    agent.load_history(store.recent(conversation_id, 4), "earlier summary")
+    assert [m["content"] for m in agent.history] == ["question 2", "answer 2"]
+    assert agent.compactor.summary == "earlier summary"
+
+    agent.chat("next question")
+    request = agent.client.messages.calls[-1]
+    assert [m["role"] for m in request["messages"]] == ["user", "assistant", "user"]
+    assert "earlier summary" in request["system"][-1]["text"]
+
+
+def test_resume_loads_every_turn_the_summary_does_not_cover(tmp_path, profile_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    store = SQLiteConversationStore(path)
+    conversation_id = store.create("default")
+    _talk(store, conversation_id, 15)  # longer than the window, never compacted
+    assert len(store.recent(conversation_id)) == 20
+    unsummarized = store.unsummarized(conversation_id)
+    assert len(unsummarized) == 30 and unsummarized[0]["content"] == "question 0"
+
+    store.save_summary(conversation_id, "Visitor asked 12 questions.", covered=24)
+    store.close()
+    reopened = SQLiteConversationStore(path)
+    agent = AgenticProfileAgent(profile_path)
+    agent.load_history(reopened.unsummarized(conversation_id), reopened.summary(conversation_id))
+    assert [m["content"] for m in agent.history][:2] == ["question 12", "answer 12"]
+    assert len(agent.history) == 6 and agent.compactor.summary == "Visitor asked 12 questions."
+    reopened.clear(conversation_id)
+    assert reopened.unsummarized(conversation_id) == []
+
+
+def test_resume_tokens_are_signed_and_expire(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    store = SQLiteConversationStore(path)
+    conversation_id = store.create("ada")
+    token = store.resume_token(conversation_id)
+    assert conversation_id in token and token != conversation_id
+    assert store.resolve(token) == conversation_id
+    assert store.resolve(conversation_id) is None  # the bare id no longer resumes
+    forged = sign_resume_token("guess", conversation_id, int(token.split(".")[1]))
+    assert store.resolve(forged) is None
+    assert store.resolve(store.resume_token(conversation_id, ttl_seconds=-7200)) is None
+    assert store.resolve(store.resume_token("missing")) is None
+    assert verify_resume_token(store.secret, "not.a.token.at.all") is None
+    store.close()
+    # the generated secret is kept, so links survive restarts
+    assert SQLiteConversationStore(path).resolve(token) == conversation_id
+
+
+def test_only_answered_turns_are_committed(profile_path, fake_client_factory):
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = fake_client_factory(["Sure."])
+    "".join(agent.chat_stream("hello"))
+    assert agent.turns_committed == 1
+
+    def unavailable(**kwargs):
+        raise RuntimeError("API down")
+
+    agent.client.messages.stream = unavailable
+    assert "Error" in "".join(agent.chat_stream("again?"))
+    agent.budget_policy = "reject"
+    agent.input_budget = 10
+    assert "".join(agent.chat_stream("and again?"))
+    assert agent.turns_committed == 1
+    assert [m["content"] for m in agent.history] == ["hello", "Sure."]
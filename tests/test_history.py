@@ -0,0 +1,112 @@
+"""
+test_history.py
+Unit tests for token-budgeted history compaction.
+"""
+
+import threading
+
+from agent import AgenticProfileAgent
+from history import HistoryCompactor, estimate_history_tokens
+
+
+def _conversation(turns, filler=200):
+    history = [
+        {"role": "user", "content": "I'm Jane from Acme, hiring a staff ML engineer."},
+        {"role": "assistant", "content": "Great to meet you, Jane!"},
+    ]
+    for turn in range(turns - 1):
+        history.append({"role": "user", "content": f"question {turn} " + "x" * filler})
+        history.append({"role": "assistant", "content": f"answer {turn} " + "y" * filler})
+    return history
+
+
+def test_under_budget_is_left_alone():
+    compactor = HistoryCompactor(token_budget=10_000, keep_recent_turns=2)
+    history = _conversation(turns=3)
+    assert compactor.maybe_compact(history, background=False) is False
+    assert len(history) == 6
+    assert compactor.summary == ""
+
+
+def test_over_budget_folds_old_turns_into_summary():
+    compactor = HistoryCompactor(token_budget=300, keep_recent_turns=2)
+    history = _conversation(turns=8)
+    recent = history[-4:]
+    assert compactor.maybe_compact(history, background=False)
+    assert history == recent
+    assert history[0]["role"] == "user"
+    assert "Acme" in compactor.summary
+    assert estimate_history_tokens(history) < estimate_history_tokens(_conversation(turns=8))
+
+
+def test_compaction_runs_in_background():
+    release = threading.Event()
+
+    def slow_summary(previous, messages):
+        release.wait(5)
+        return "Jane from Acme is hiring."
+
+    compactor = HistoryCompactor(summarize=slow_summary, token_budget=300, keep_recent_turns=2)
+    history = _conversation(turns=8)
+    assert compactor.maybe_compact(history)
+    assert len(history) == 16  # untouched until the summary lands
+    release.set()
+    compactor.wait(5)
+    assert len(history) == 16 and compactor.summary == ""  # the owner applies it
+    assert compactor.apply(history)
+    assert len(history) == 4
+    assert compactor.summary == "Jane from Acme is hiring."
+
+
+def test_summary_is_dropped_if_history_changed_meanwhile():
+    release = threading.Event()
+    compactor = HistoryCompactor(
+        summarize=lambda previous, messages: release.wait(5) and "Jane from Acme.",
+        token_budget=300, keep_recent_turns=2,
+    )
+    history = _conversation(turns=8)
+    compactor.maybe_compact(history)
+    del history[:2]  # the agent trims the oldest exchange while the summary runs
+    release.set()
+    compactor.wait(5)
+    assert len(history) == 14
+    assert compactor.apply(history) is False
+    assert compactor.summary == "" and len(history) == 14
+    assert compactor.maybe_compact(history, background=False)
+    assert compactor.summary == "Jane from Acme." and len(history) == 4
+
+
+def test_reset_discards_in_flight_summary():
+    release = threading.Event()
+    compactor = HistoryCompactor(
+        summarize=lambda previous, messages: release.wait(5) and "stale",
+        token_budget=300, keep_recent_turns=2,
+    )
+    history = _conversation(turns=8)
+    compactor.maybe_compact(history)
+    compactor.reset()
+    release.set()
+    compactor.wait(5)
+    assert compactor.summary == ""
+    assert len(history) == 16
+
+
+def test_agent_sends_summary_after_cached_system_block(monkeypatch, profile_path):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    agent = AgenticProfileAgent(profile_path)
+    agent.compactor.token_budget = 300
+    agent.compactor.keep_recent_turns = 2
+    agent.history.extend(_conversation(turns=8)[:-1])
+    agent._finalize("Happy to go deeper on that.")
+    agent.compactor.wait(5)
+    assert len(agent.history) == 16
+
+    agent._begin_turn("And the team size?")
+    blocks = agent._system_blocks()
+    assert blocks[0]["cache_control"] == {"type": "ephemeral"}
+    assert "Acme" in blocks[1]["text"]
+    assert "cache_control" not in blocks[1]
+    assert len(agent.history) == 5
+
+    agent.reset_conversation()
+    assert len(agent._system_blocks()) == 1
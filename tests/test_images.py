@@ -0,0 +1,63 @@
+"""
+test_images.py
+Unit tests for the build-time image variant pipeline and runtime variant lookup.
+"""
+
+import json
+
+import pytest
+
+from images import build_variants, clear_image_caches, pick_variant, srcset
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    clear_image_caches()
+    yield
+    clear_image_caches()
+
+
+@pytest.fixture
+def built(tmp_path):
+    source = tmp_path / "hero.png"
+    Image.new("RGB", (200, 100), (200, 40, 40)).save(source)
+    variants_dir = tmp_path / "variants"
+    manifest = build_variants({"hero.png": 60}, tmp_path, variants_dir)
+    return source, variants_dir / "manifest.json", manifest
+
+
+def test_build_writes_every_variant_and_manifest(built):
+    source, manifest_path, manifest = built
+    entry = manifest["hero.png"]
+    assert json.loads(manifest_path.read_text()) == manifest
+    assert {(v["scale"], v["format"], v["width"]) for v in entry["variants"]} == {
+        (1, "webp", 60), (1, "png", 60), (2, "webp", 120), (2, "png", 120),
+    }
+    assert all((manifest_path.parent / v["file"]).exists() for v in entry["variants"])
+    assert all(v["height"] == v["width"] // 2 for v in entry["variants"])
+
+
+def test_variants_never_upscale(tmp_path):
+    Image.new("RGB", (50, 50)).save(tmp_path / "small.png")
+    manifest = build_variants({"small.png": 40}, tmp_path, tmp_path / "variants")
+    assert max(v["width"] for v in manifest["small.png"]["variants"]) == 50
+
+
+def test_pick_variant_prefers_smallest_matching(built):
+    source, manifest_path, manifest = built
+    chosen = pick_variant(source, scale=2, manifest_path=manifest_path)
+    sizes = {v["file"]: v["bytes"] for v in manifest["hero.png"]["variants"] if v["scale"] == 2}
+    assert chosen.name == min(sizes, key=sizes.get)
+    png = pick_variant(source, scale=1, formats=("png",), manifest_path=manifest_path)
+    assert png.suffix == ".png"
+    assert [scale for _, scale in srcset(source, "webp", manifest_path)] == [1, 2]
+
+
+def test_stale_or_missing_manifest_falls_back_to_source(built, tmp_path):
+    source, manifest_path, _ = built
+    Image.new("RGB", (200, 100), (0, 0, 255)).save(source)
+    clear_image_caches()
+    assert pick_variant(source, manifest_path=manifest_path) == source
+    assert pick_variant(source, manifest_path=tmp_path / "none.json") == source
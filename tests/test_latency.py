@@ -3,11 +3,39 @@ test_latency.py
 Live test that prompt caching is actually wired — checks usage.cache_read_input_tokens
 on the second request, which is the authoritative signal from the API.
 Wall-clock latency is too noisy to assert on; token accounting is deterministic.
+Offline microbenchmarks assert on scaling (cost ratios), never on absolute times.
 """
 
+import time
+import uuid
+
 import pytest
 
-from agent import AgenticProfileAgent, MAX_TOKENS, MODEL_ID
+from agent import AgenticProfileAgent, LeadLogScanner, MAX_TOKENS, MODEL_ID
+
+
+def _per_delta_seconds(token_count: int, repeats: int = 5) -> float:
+    """Best-of-N mean cost of LeadLogScanner.feed for a response of token_count deltas."""
+    deltas = ["word[ " if i % 50 == 0 else "word " for i in range(token_count)]
+    best = float("inf")
+    for _ in range(repeats):
+        scanner = LeadLogScanner()
+        start = time.perf_counter()
+        for delta in deltas:
+            scanner.feed(delta)
+        scanner.flush()
+        best = min(best, time.perf_counter() - start)
+    return best / token_count
+
+
+def test_scanner_per_delta_cost_is_flat():
+    """Microbenchmark: per-delta scan cost must not grow with response length."""
+    costs = {n: _per_delta_seconds(n) for n in (1_000, 4_000, 16_000)}
+    print("\n" + " | ".join(
+        f"{n} tokens: {cost * 1e6:.2f}us/delta" for n, cost in costs.items()
+    ))
+    # a quadratic scan would be ~16x slower per delta at 16k than at 1k
+    assert costs[16_000] < costs[1_000] * 3
 
 
 @pytest.mark.live
@@ -45,3 +73,22 @@ def test_cache_read_tokens_on_second_call(live_api_key, profile_path):
     assert second_cache_read > 0, (
         f"second call did not read from cache (got {second_cache_read} tokens)"
     )
+
+
+@pytest.mark.live
+def test_history_prefix_read_from_cache(live_api_key, profile_path):
+    """Turn two should read turn one (not just the system prompt) back from cache."""
+    agent = AgenticProfileAgent(profile_path)
+    # a pasted job description long enough to span whole cache blocks; the nonce keeps
+    # an earlier run's cache entry from already covering turn one
+    nonce = uuid.uuid4().hex
+    posting = " ".join(f"Responsibility {i}: build reliable agent systems." for i in range(300))
+    agent.chat(f"Job posting {nonce}: {posting}\nIn one sentence, does it fit you?")
+    agent.chat("In one sentence, what are you working on now?")
+    first, second = agent.turn_usage
+    print(f"\nturn usage: {agent.turn_usage}")
+    assert first["cache_creation_input_tokens"] > 0
+    # everything turn one read or wrote is now a cached prefix of turn two
+    assert second["cache_read_input_tokens"] >= (
+        first["cache_read_input_tokens"] + first["cache_creation_input_tokens"]
+    )
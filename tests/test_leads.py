@@ -0,0 +1,248 @@
+"""
+test_leads.py
+Unit tests for the batched, spooled Google Sheets lead sink (fake Sheets service)
+and the persistent lead dedupe index.
+"""
+
+import sqlite3
+import threading
+
+from agent import AgenticProfileAgent
+from leads import LeadIndex, LeadSink, normalize_company
+
+
+class FakeSheetsService:
+    """Records values.append bodies; can fail a number of calls first."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.appends = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def append(self, **kwargs):
+        self._pending = kwargs
+        return self
+
+    def execute(self):
+        self.gate.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sheets unavailable")
+        self.appends.append(self._pending)
+        return {"updates": {"updatedRows": len(self._pending["body"]["values"])}}
+
+
+def _lead(i):
+    return (f"Company {i}", "Jane", f"jane{i}@example.com", "ML Engineer", "")
+
+
+def _sink(tmp_path, service, **kwargs):
+    kwargs.setdefault("linger_seconds", 0.2)
+    return LeadSink(spool_path=str(tmp_path / "spool.jsonl"),
+                    service_factory=lambda: service, sheet_id="sheet", **kwargs)
+
+
+def test_burst_is_batched_into_one_append(tmp_path):
+    service = FakeSheetsService()
+    sink = _sink(tmp_path, service)
+    for i in range(5):
+        assert sink.submit(*_lead(i))["status"] == "ok"
+    sink.start()
+    assert sink.flush(5)
+    sink.close()
+    assert len(service.appends) == 1
+    assert [row[1] for row in service.appends[0]["body"]["values"]] == [f"Company {i}" for i in range(5)]
+    assert (tmp_path / "spool.jsonl").read_text() == ""
+
+
+def test_failures_are_retried_with_backoff(tmp_path):
+    service = FakeSheetsService(failures=2)
+    sink = _sink(tmp_path, service, backoff_base=0.01).start()
+    sink.submit(*_lead(1))
+    assert sink.flush(5)
+    sink.close()
+    assert sink.stats["failures"] == 2
+    assert len(service.appends) == 1
+
+
+def test_batch_that_keeps_failing_is_dead_lettered(tmp_path):
+    import json
+    service = FakeSheetsService(failures=3)
+    sink = _sink(tmp_path, service, backoff_base=0.01, max_attempts=3, linger_seconds=0).start()
+    sink.submit(*_lead(1))
+    assert sink.flush(5)  # the poison batch no longer holds up flush()
+    sink.submit(*_lead(2))
+    assert sink.flush(5)
+    sink.close()
+    assert sink.stats["dead_lettered"] == 1
+    assert [row[1] for call in service.appends for row in call["body"]["values"]] == ["Company 2"]
+    dead = [json.loads(line) for line in (tmp_path / "spool.dead.jsonl").read_text().splitlines()]
+    assert [record["row"][1] for record in dead] == ["Company 1"]
+    assert (tmp_path / "spool.jsonl").read_text() == ""
+
+
+def test_concurrent_submits_are_queued_in_seq_order(tmp_path):
+    sink = _sink(tmp_path, FakeSheetsService())
+    threads = [threading.Thread(target=lambda: [sink.submit(*_lead(i)) for i in range(50)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seqs = [seq for seq, _ in list(sink._queue.queue)]
+    assert seqs == sorted(seqs) and len(seqs) == 200
+
+
+def test_unacked_leads_survive_restart(tmp_path):
+    down = FakeSheetsService(failures=10_000)
+    sink = _sink(tmp_path, down, backoff_base=0.01).start()
+    sink.submit(*_lead(1))
+    sink.submit(*_lead(2))
+    sink.close(timeout=0.3)
+    assert sink.pending == 2
+
+    service = FakeSheetsService()
+    restarted = _sink(tmp_path, service).start()
+    assert restarted.pending == 2
+    assert restarted.flush(5)
+    restarted.close()
+    rows = [row for call in service.appends for row in call["body"]["values"]]
+    assert [row[1] for row in rows] == ["Company 1", "Company 2"]
+
+
+def test_submit_returns_before_sheets_call(tmp_path):
+    service = FakeSheetsService()
+    service.gate.clear()
+    sink = _sink(tmp_path, service, linger_seconds=0).start()
+    result = sink.submit(*_lead(1))
+    assert result["status"] == "ok"
+    assert service.appends == []
+    service.gate.set()
+    assert sink.flush(5)
+    sink.close()
+
+
+def test_invalid_email_rejected(tmp_path):
+    sink = _sink(tmp_path, FakeSheetsService())
+    assert sink.submit("Acme", "Jane", "not-an-email", None, None)["status"] == "error"
+
+
+def test_agent_routes_sheets_leads_through_sink(monkeypatch, tmp_path, profile_path):
+    import leads
+
+    service = FakeSheetsService()
+    sink = _sink(tmp_path, service).start()
+    monkeypatch.setattr(leads, "_sink", sink)
+    monkeypatch.setattr(leads, "_index", LeadIndex(None))
+    monkeypatch.setenv("GOOGLE_SHEETS_ID", "sheet")
+    agent = AgenticProfileAgent(profile_path)
+    agent._log_lead({"company": "Acme", "contact_email": "jane@acme.com"})
+    agent._log_lead({"company": "Acme", "contact_email": "jane@acme.com"})
+    agent._log_lead({"company": "Acme", "contact_email": "jane@acme.com", "role_title": "CTO"})
+    # the same recruiter writing to a second hosted profile is that profile's lead
+    AgenticProfileAgent(profile_path, profile_slug="ada")._log_lead(
+        {"company": "Acme", "contact_email": "jane@acme.com"})
+    assert sink.flush(5)
+    sink.close()
+    rows = [row for call in service.appends for row in call["body"]["values"]]
+    assert [(row[1], row[6], row[7]) for row in rows] == [
+        ("Acme", "New", "default"), ("Acme", "Updated", "default"), ("Acme", "New", "ada")]
+    assert rows[1][4] == "CTO"
+
+
+def test_normalize_company():
+    assert normalize_company("Acme, Inc.") == normalize_company("ACME") == "acme"
+    assert normalize_company("Blue  Sky Co") == "blue sky"
+
+
+def test_index_dedupes_and_merges():
+    index = LeadIndex(None)
+    first = index.record({"company": "Acme Inc", "contact_email": "Jane@Acme.com"})
+    assert first["status"] == "new"
+    assert index.record({"company": "ACME", "contact_email": "jane@acme.com"})["status"] == "duplicate"
+    merged = index.record({"contact_email": "jane@acme.com", "contact_name": "Jane",
+                           "notes": "Hiring for RAG"})
+    assert merged["status"] == "updated"
+    assert set(merged["changed"]) == {"contact_name", "notes"}
+    assert merged["lead"]["company"] == "Acme Inc"
+    # same email at a different company is a different lead
+    assert index.record({"company": "Globex", "contact_email": "jane@acme.com"})["status"] == "new"
+    assert index.record({"notes": "no keys"})["status"] == "unkeyed"
+    assert len(index) == 2
+
+
+def test_index_matches_emailless_leads_by_company():
+    index = LeadIndex(None)
+    assert index.record({"company": "Initech", "contact_name": "Bill"})["status"] == "new"
+    assert index.record({"company": "Initech LLC"})["status"] == "duplicate"
+
+
+def test_index_attaches_later_email_to_company_lead(tmp_path):
+    path = str(tmp_path / "leads.sqlite3")
+    index = LeadIndex(path)
+    assert index.record({"company": "Acme"})["status"] == "new"
+    outcome = index.record({"company": "Acme", "contact_email": "jo@acme.com"})
+    assert outcome["status"] == "updated" and outcome["changed"] == ["contact_email"]
+    assert len(index) == 1
+    # re-keyed by email: the next turn matches on it, even without a company
+    assert index.record({"contact_email": "JO@acme.com"})["status"] == "duplicate"
+    # a different contact at the same company is now a separate lead
+    assert index.record({"company": "Acme", "contact_email": "kim@acme.com"})["status"] == "new"
+    index.close()
+    reopened = LeadIndex(path)
+    assert reopened.record({"contact_email": "jo@acme.com"})["status"] == "duplicate"
+
+
+def test_index_keeps_colleagues_at_one_company_apart():
+    index = LeadIndex(None)
+    index.record({"company": "Acme", "contact_name": "Alice"})
+    bob = index.record({"company": "Acme Inc.", "contact_name": "Bob",
+                        "contact_email": "bob@acme.com"})
+    assert bob["status"] == "new" and bob["lead"]["contact_name"] == "Bob"
+    carol = index.record({"company": "Acme", "contact_name": "Carol"})
+    assert carol["status"] == "new"
+    # the same (or an unnamed) contact still merges into the email-less lead
+    assert index.record({"company": "ACME", "contact_name": "alice"})["status"] == "duplicate"
+    alice = index.record({"company": "Acme", "contact_name": "Alice", "contact_email": "al@acme.com"})
+    assert alice["status"] == "updated" and alice["lead"]["contact_name"] == "Alice"
+    assert len(index) == 3
+
+
+def test_index_dedupes_per_profile(tmp_path):
+    path = str(tmp_path / "leads.sqlite3")
+    legacy = sqlite3.connect(path)
+    legacy.execute(
+        "CREATE TABLE leads (id INTEGER PRIMARY KEY, email_key TEXT, company_key TEXT,"
+        " company TEXT, contact_name TEXT, contact_email TEXT, role_title TEXT,"
+        " notes TEXT, first_seen TEXT, last_seen TEXT, times_seen INTEGER)")
+    legacy.execute("INSERT INTO leads (email_key, company_key, company, contact_email, times_seen)"
+                   " VALUES ('jane@acme.com', 'acme', 'Acme', 'jane@acme.com', 1)")
+    legacy.commit()
+    legacy.close()
+
+    index = LeadIndex(path)  # rows from before hosted profiles belong to the default one
+    lead = {"company": "Acme", "contact_email": "jane@acme.com"}
+    assert index.record(lead)["status"] == "duplicate"
+    assert index.record(lead, "ada")["status"] == "new"
+    assert index.record({"company": "Initech"}, "ada")["status"] == "new"
+    assert index.record({"company": "Initech"}, "alan")["status"] == "new"
+    assert index.record(lead, "ada")["status"] == "duplicate"
+    assert len(index) == 4
+
+
+def test_index_survives_restart(tmp_path):
+    path = str(tmp_path / "leads.sqlite3")
+    index = LeadIndex(path)
+    index.record({"company": "Acme", "contact_email": "jane@acme.com"})
+    index.close()
+    reopened = LeadIndex(path)
+    outcome = reopened.record({"company": "Acme", "contact_email": "jane@acme.com"})
+    assert outcome["status"] == "duplicate"
+    assert outcome["lead"]["times_seen"] == 2
@@ -0,0 +1,82 @@
+"""
+test_mailer.py
+Unit tests for the bounded SMTP worker against a local SMTP stand-in.
+"""
+
+import smtplib
+
+from mailer import EmailWorker, build_lead_email, make_lead
+from tests.fake_smtp import FakeSMTPServer
+
+
+def _worker(server, **kwargs):
+    kwargs.setdefault("digest_window", 0)
+    return EmailWorker(
+        sender="me@example.com", password="secret", recipient="me@example.com",
+        connect=lambda: smtplib.SMTP("127.0.0.1", server.port, timeout=5),
+        **kwargs,
+    )
+
+
+def _lead(i):
+    return make_lead(f"Company {i}", "Jane", f"jane{i}@example.com", "ML Engineer", None)
+
+
+def test_connection_is_reused_across_emails():
+    with FakeSMTPServer() as server:
+        worker = _worker(server).start()
+        for i in range(3):
+            worker.submit(_lead(i))
+            worker.flush()
+        worker.close()
+    assert len(server.messages) == 3
+    assert server.connections == 1
+    assert server.logins == 1
+    assert worker.stats["emails"] == 3
+
+
+def test_burst_becomes_one_digest():
+    with FakeSMTPServer() as server:
+        worker = _worker(server, digest_window=0.5)
+        for i in range(4):
+            worker.submit(_lead(i))
+        worker.start()
+        worker.flush()
+        worker.close()
+    assert len(server.messages) == 1
+    message = server.messages[0]
+    assert message["Subject"].startswith("4 New Leads")
+    body = message.get_payload()[0].get_payload()
+    assert all(f"Company {i}" in body for i in range(4))
+
+
+def test_reconnects_when_server_drops_connection():
+    with FakeSMTPServer(drop_after_each=True) as server:
+        worker = _worker(server).start()
+        for i in range(2):
+            worker.submit(_lead(i))
+            worker.flush()
+        worker.close()
+    assert len(server.messages) == 2
+    assert server.connections == 2
+    assert worker.stats["failures"] == 0
+
+
+def test_full_queue_applies_backpressure():
+    with FakeSMTPServer() as server:
+        worker = _worker(server, queue_size=2, put_timeout=0.01)  # not started
+        results = [worker.submit(_lead(i))["status"] for i in range(3)]
+    assert results == ["ok", "ok", "error"]
+    assert worker.stats["rejected"] == 1
+
+
+def test_unconfigured_worker_rejects():
+    worker = EmailWorker(sender="", password="")
+    assert worker.submit(_lead(1))["status"] == "error"
+
+
+def test_lead_email_names_the_profile():
+    lead = make_lead("Acme", "Jane", "jane@acme.com", None, None, profile="ada")
+    body = build_lead_email(lead, "me@example.com", "me@example.com").get_payload()[0].get_payload()
+    assert "Profile: ada" in body
+    assert "Profile:" not in build_lead_email(_lead(1), "a@b.c", "a@b.c").get_payload()[0].get_payload()
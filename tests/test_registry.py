@@ -0,0 +1,56 @@
+"""
+test_registry.py
+Unit tests for the process-wide compiled profile registry.
+"""
+
+import time
+
+import pytest
+
+from agent import AgenticProfileAgent
+from registry import get_compiled_profile, clear_registry
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    clear_registry()
+    yield
+    clear_registry()
+
+
+def test_agents_share_one_compiled_profile(profile_path):
+    first = AgenticProfileAgent(profile_path)
+    second = AgenticProfileAgent(profile_path)
+    assert first.compiled is second.compiled
+    assert first.system_prompt is second.system_prompt
+    assert first.profile_yaml is second.profile_yaml
+
+
+def test_compiled_profile_is_read_only(profile_path):
+    compiled = get_compiled_profile(profile_path)
+    with pytest.raises(TypeError):
+        compiled.profile["name"] = "Someone Else"
+    assert isinstance(compiled.profile["experience"], tuple)
+
+
+def test_content_change_rebuilds_entry(tmp_path):
+    path = tmp_path / "profile.yaml"
+    path.write_text('profile:\n  name: "Ada"\n', encoding="utf-8")
+    before = get_compiled_profile(str(path))
+    assert before.name == "Ada"
+
+    path.write_text('profile:\n  name: "Grace Hopper"\n', encoding="utf-8")
+    after = get_compiled_profile(str(path))
+    assert after.name == "Grace Hopper"
+    assert after.content_hash != before.content_hash
+    assert "Grace Hopper" in after.system_prompt
+
+
+def test_warm_lookup_is_microseconds(profile_path):
+    get_compiled_profile(profile_path)
+    iterations = 2_000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        get_compiled_profile(profile_path)
+    per_lookup = (time.perf_counter() - start) / iterations
+    assert per_lookup < 200e-6, f"warm lookup took {per_lookup * 1e6:.1f}us"
@@ -0,0 +1,71 @@
+"""
+test_render.py
+Unit tests for the frame-coalescing stream renderer (fake clock).
+"""
+
+from render import FrameCoalescer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _tokens(count):
+    return [f"word{i} " for i in range(count)]
+
+
+def test_first_token_renders_immediately_and_clears_indicator():
+    frames, cleared = [], []
+    clock = Clock()
+    renderer = FrameCoalescer(frames.append, fps=10, on_first_token=lambda: cleared.append(True), clock=clock)
+    renderer.push("Hello")
+    assert frames == ["Hello"]
+    assert cleared == [True]
+
+
+def test_far_fewer_frames_than_deltas():
+    frames = []
+    clock = Clock()
+    renderer = FrameCoalescer(frames.append, fps=10, clock=clock)
+    for token in _tokens(500):
+        clock.now += 0.01  # 100 deltas per second
+        renderer.push(token)
+    text = renderer.close()
+    assert frames[-1] == text == "".join(_tokens(500))
+    assert renderer.deltas == 500
+    assert renderer.frames <= 60
+
+
+def test_prefers_word_boundaries():
+    frames = []
+    clock = Clock()
+    renderer = FrameCoalescer(frames.append, fps=10, clock=clock)
+    renderer.push("Hi ")
+    clock.now += 0.15
+    renderer.push("partial")
+    assert len(frames) == 1  # mid-word and not yet overdue
+    clock.now += 0.01
+    renderer.push("word ")
+    assert frames[-1] == "Hi partialword "
+
+
+def test_close_renders_pending_tail_once():
+    frames = []
+    clock = Clock()
+    renderer = FrameCoalescer(frames.append, fps=10, clock=clock)
+    renderer.push("Hello ")
+    renderer.push("there")
+    assert renderer.close() == "Hello there"
+    assert frames == ["Hello ", "Hello there"]
+
+
+def test_empty_stream_still_renders_and_clears():
+    frames, cleared = [], []
+    renderer = FrameCoalescer(frames.append, on_first_token=lambda: cleared.append(True))
+    assert renderer.consume([]) == ""
+    assert frames == [""]
+    assert cleared == [True]
@@ -0,0 +1,138 @@
+"""
+test_retrieval.py
+Unit tests for BM25 section retrieval, plus an offline benchmark comparing full
+injection with retrieval mode across profile sizes on the fake streaming server.
+"""
+
+import time
+
+import pytest
+import yaml
+
+from agent import AgenticProfileAgent
+from registry import clear_registry
+from retrieval import BM25Index, split_sections
+from tests.fake_anthropic import FakeAnthropicServer
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    clear_registry()
+    yield
+    clear_registry()
+
+
+def test_bm25_ranks_matching_document_first():
+    index = BM25Index([
+        "neo4j knowledge graph guardrails",
+        "retrieval augmented generation rag pipeline",
+        "graph neural networks pytorch geometric",
+    ])
+    hits = index.search("What is your RAG pipeline?", 2)
+    assert hits[0][0] == 1
+    assert index.search("completely unrelated", 3) == []
+
+
+def test_split_sections_keeps_parent_header():
+    sections = split_sections({
+        "name": "Ada",
+        "experience": [{"company": "Acme", "projects": [{"name": "One"}, {"name": "Two"}]}],
+        "publications": [{"title": "Paper"}],
+        "skills": {"languages": ["python"], "tools": ["git"]},
+    })
+    keys = [section.key for section in sections]
+    assert keys == ["experience[0].projects[0]", "experience[0].projects[1]",
+                    "publications[0]", "skills.languages", "skills.tools"]
+    assert "company: Acme" in sections[1].text and "name: Two" in sections[1].text
+    assert "One" not in sections[1].text
+
+
+def test_retrieval_mode_sends_core_prompt_plus_sections(profile_path):
+    agent = AgenticProfileAgent(profile_path, retrieval="bm25")
+    agent._begin_turn("Tell me about your publications")
+    request = agent._request_kwargs()
+    assert len(request["system"]) == 1
+    assert "experience:" not in request["system"][0]["text"]
+    # the core header is below the minimum cacheable length: no dead breakpoint
+    assert "cache_control" not in request["system"][0]
+    newest = request["messages"][-1]["content"]
+    assert newest[0]["cache_control"] == {"type": "ephemeral"}
+    assert "publications:" in newest[1]["text"] and "cache_control" not in newest[1]
+    assert len(request["system"][0]["text"]) + len(newest[1]["text"]) < len(agent.compiled.system_prompt)
+
+
+def test_retrieved_sections_stay_out_of_the_cached_prefix(profile_path):
+    agent = AgenticProfileAgent(profile_path, retrieval="bm25")
+    agent._begin_turn("Tell me about your publications")
+    first = agent._request_kwargs()["messages"]
+    agent.history.append({"role": "assistant", "content": "Here they are."})
+    agent._begin_turn("And your skills?")
+    second = agent._request_kwargs()["messages"]
+    # turn one's breakpoint block is re-sent unchanged, so its cache entry is read back
+    assert second[0]["content"] == first[0]["content"][:1]
+    assert "skills" in second[-1]["content"][-1]["text"]
+
+
+def test_full_injection_is_default(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    agent._begin_turn("Tell me about your publications")
+    assert len(agent._request_kwargs()["system"]) == 1
+    assert agent.system_prompt == agent.compiled.system_prompt
+
+
+def _scaled_profile(tmp_path, source_path, factor):
+    """The real profile with its experience section repeated factor times."""
+    data = yaml.safe_load(open(source_path, encoding="utf-8"))
+    experience = data["profile"]["experience"]
+    data["profile"]["experience"] = [
+        dict(job, company=f"{job.get('company', '')} ({copy})")
+        for copy in range(factor) for job in experience
+    ]
+    path = tmp_path / f"profile_x{factor}.yaml"
+    path.write_text(yaml.safe_dump(data, sort_keys=False), encoding="utf-8")
+    return str(path)
+
+
+def _turn(agent, question):
+    start = time.perf_counter()
+    chunks = agent.chat_stream(question)
+    next(chunks)
+    ttft = time.perf_counter() - start
+    for _ in chunks:
+        pass
+    return ttft, agent.last_usage["input_tokens"]
+
+
+def test_benchmark_full_vs_retrieval_by_profile_size(monkeypatch, tmp_path, profile_path):
+    """Benchmark: retrieval keeps tokens/turn and TTFT flat as the profile grows.
+
+    The fake server charges 20us of TTFT per input token to model prefill.
+    """
+    with FakeAnthropicServer(tokens=["ok"], prefill_per_token=20e-6) as server:
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", server.base_url)
+        from client import reset_shared_client
+        reset_shared_client()
+        results = {}
+        for factor in (1, 4, 16):
+            path = _scaled_profile(tmp_path, profile_path, factor)
+            for mode in ("off", "bm25"):
+                agent = AgenticProfileAgent(path, retrieval=mode)
+                if mode == "off" and agent.retriever is not None:
+                    results[(factor, mode)] = None  # over budget: fell back to retrieval
+                    continue
+                agent._log_lead = lambda parsed: None
+                results[(factor, mode)] = _turn(agent, "Describe your RAG system work")
+        reset_shared_client()
+
+    print()
+    for (factor, mode), result in results.items():
+        label = "over budget" if result is None else f"ttft={result[0] * 1000:.0f}ms tokens={result[1]}"
+        print(f"profile x{factor:<2} {mode:<4} {label}")
+
+    full_1x, bm25_1x, bm25_16x = results[(1, "off")], results[(1, "bm25")], results[(16, "bm25")]
+    assert bm25_1x[1] < full_1x[1]
+    # full injection grows with the profile (or falls back over budget); retrieval stays bounded
+    assert results[(16, "off")] is None or results[(16, "off")][1] > 10 * full_1x[1]
+    assert bm25_16x[1] < 2 * bm25_1x[1]
+    assert bm25_16x[1] < full_1x[1]
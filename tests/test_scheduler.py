@@ -0,0 +1,222 @@
+"""
+test_scheduler.py
+Unit tests for rate-limit-aware admission control in front of the Anthropic API.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent import AgenticProfileAgent
+from scheduler import (
+    PRIORITY_ACTIVE, PRIORITY_NEW, QueueTimeout, Scheduler, TokenBucket, queue_notice,
+    retry_after_seconds,
+)
+from tests.conftest import FakeClient
+from tests.fake_anthropic import FakeAnthropicServer
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimited(Exception):
+    """Stand-in for anthropic.RateLimitError: status_code + response headers."""
+
+    def __init__(self, headers=None, status_code=429):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+class FlakyMessages:
+    """Fails the first `failures` calls with a 429, then behaves like FakeMessages."""
+
+    def __init__(self, deltas, failures=1, headers=None):
+        self.inner = FakeClient(deltas).messages
+        self.failures = failures
+        self.headers = headers or {"retry-after-ms": "10"}
+        self.calls = 0
+
+    def _attempt(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RateLimited(self.headers)
+
+    def stream(self, **kwargs):
+        self._attempt()
+        return self.inner.stream(**kwargs)
+
+    def create(self, **kwargs):
+        self._attempt()
+        return self.inner.create(**kwargs)
+
+
+def test_token_bucket_refills_at_rate():
+    clock = Clock()
+    bucket = TokenBucket(60, clock=clock)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.wait_time(30) == 0.0
+    bucket.give(-40)
+    assert bucket.wait_time(1) == pytest.approx(11.0)
+    assert TokenBucket(0).wait_time(10 ** 9) == 0.0
+
+
+def test_active_conversations_go_first_and_see_their_position():
+    scheduler = Scheduler()
+    scheduler.paused_until = time.monotonic() + 0.3
+    admitted, notices = [], []
+
+    def visitor(name, priority):
+        scheduler.admit(10, priority, on_wait=lambda *status: notices.append((name, status)))
+        admitted.append(name)
+
+    threads = []
+    for name, priority in (("new-a", PRIORITY_NEW), ("new-b", PRIORITY_NEW),
+                           ("active", PRIORITY_ACTIVE)):
+        threads.append(threading.Thread(target=visitor, args=(name, priority)))
+        threads[-1].start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join(5)
+
+    assert admitted == ["active", "new-a", "new-b"]
+    assert ("new-b", 2) in [(name, status[0]) for name, status in notices]
+    assert scheduler.stats["queued"] == 3 and len(scheduler) == 0
+
+
+def test_requests_per_minute_spaces_out_a_burst():
+    scheduler = Scheduler(requests_per_minute=600)  # 10/s after a 600 burst
+    scheduler.requests.level = 1
+    started = time.monotonic()
+    for _ in range(3):
+        scheduler.admit(0)
+    assert time.monotonic() - started >= 0.15
+
+
+def test_backoff_honours_retry_after_and_pauses_everyone():
+    scheduler = Scheduler(tokens_per_minute=6000, max_retries=2)
+    ticket = scheduler.admit(1000)
+    delay = scheduler.backoff(RateLimited({"retry-after": "2"}), 0, ticket)
+    assert 2.0 <= delay <= 3.0
+    assert scheduler.paused_until - time.monotonic() == pytest.approx(2.0, abs=0.1)
+    assert scheduler.tokens.level == pytest.approx(6000, abs=5)  # rejected call refunded
+    assert scheduler.backoff(RateLimited(status_code=400), 0, ticket) is None
+    assert scheduler.backoff(RateLimited(), 2, ticket) is None
+
+
+def test_transient_failures_retry_without_pausing_everyone():
+    scheduler = Scheduler(max_retries=2)
+    ticket = scheduler.admit(10)
+    assert scheduler.backoff(ConnectionError("reset by peer"), 0, ticket) is not None
+    assert scheduler.backoff(RateLimited({"retry-after-ms": "5"}, status_code=503), 0, ticket)
+    assert scheduler.paused_until <= time.monotonic()
+    assert scheduler.backoff(ValueError("bad request"), 0, ticket) is None
+    assert scheduler.stats["retries"] == 2
+
+
+def test_retry_after_formats():
+    assert retry_after_seconds(RateLimited({"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(RateLimited({"retry-after": "3"})) == 3.0
+    assert retry_after_seconds(RateLimited({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after_seconds(ValueError("no response")) is None
+
+
+def test_queue_times_out_instead_of_waiting_forever():
+    scheduler = Scheduler(max_wait_seconds=0.05)
+    scheduler.paused_until = time.monotonic() + 10
+    with pytest.raises(QueueTimeout):
+        scheduler.admit(1)
+    assert len(scheduler) == 0 and scheduler.stats["timeouts"] == 1
+
+
+def test_settle_corrects_token_estimate():
+    scheduler = Scheduler(tokens_per_minute=1000)
+    ticket = scheduler.admit(800)
+    scheduler.settle(ticket, 100)  # mostly cache reads: 700 of the estimate comes back
+    assert scheduler.tokens.level == pytest.approx(900, abs=5)
+
+
+def test_chat_stream_waits_out_a_rate_limit(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = type("Client", (), {"messages": FlakyMessages(["Still ", "here."])})()
+    agent.scheduler = Scheduler()
+    agent.single_flight = False
+    notices = []
+    agent.on_queue = lambda *status: notices.append(status)
+    assert "".join(agent.chat_stream("Hello")) == "Still here."
+    assert agent.client.messages.calls == 2
+    assert notices and notices[0][0] == 0
+    assert agent.last_metrics["queue_seconds"] >= 0.01
+    assert agent.scheduler.stats["retries"] == 1
+
+
+def test_coalesced_leader_retries_on_its_own_thread(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = type("Client", (), {"messages": FlakyMessages(["ok"])})()
+    agent.scheduler = Scheduler()
+    assert "".join(agent.chat_stream("Hello")) == "ok"
+    assert agent.last_metrics["mode"] == "stream"
+
+
+def test_chat_reports_queue_timeout_without_error_prefix(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = FakeClient(["unused"])
+    agent.scheduler = Scheduler(max_wait_seconds=0.05)
+    agent.scheduler.paused_until = time.monotonic() + 10
+    reply = agent.chat("Hello")
+    assert "try again" in reply and "Error" not in reply
+    assert agent.history == [] and agent.client.messages.calls == []
+
+
+def test_achat_retries_rate_limit(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    messages = FlakyMessages(["Async ok."], headers={"retry-after-ms": "5"})
+
+    class AsyncMessages:
+        async def create(self, **kwargs):
+            return messages.create(**kwargs)
+
+    agent.async_client = type("Client", (), {"messages": AsyncMessages()})()
+    agent.scheduler = Scheduler()
+    assert asyncio.run(agent.achat("Hello")) == "Async ok."
+    assert messages.calls == 2
+
+
+def test_sdk_leaves_a_429_to_the_scheduler(monkeypatch, profile_path):
+    from client import reset_shared_client
+    with FakeAnthropicServer(tokens=["Back ", "again."], rate_limited=1) as server:
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", server.base_url)
+        reset_shared_client()
+        try:
+            agent = AgenticProfileAgent(profile_path)
+            agent._log_lead = lambda parsed: None
+            agent.scheduler = Scheduler()
+            agent.single_flight = False
+            assert agent.client.max_retries == 0
+            assert "".join(agent.chat_stream("Hello")) == "Back again."
+            assert asyncio.run(agent.achat("Still there?")) == "Back again."
+        finally:
+            reset_shared_client()
+    assert len(server.requests) == 3
+    assert agent.scheduler.stats["retries"] == 1
+
+
+def test_queue_notice_text():
+    assert queue_notice(3, 4.2) == "You're #3 in line — about 5s…"
+    assert "starting in about 1s" in queue_notice(0, 0.01)
+
+
+def test_unlimited_scheduler_admits_immediately():
+    scheduler = Scheduler()
+    ticket = scheduler.admit(10 ** 6)
+    assert ticket.waited < 0.05 and scheduler.stats["queued"] == 0
@@ -0,0 +1,109 @@
+"""
+test_sessions.py
+Unit tests for per-session memory accounting and idle-session agent eviction.
+"""
+
+import gc
+import tracemalloc
+
+from agent import AgenticProfileAgent
+from scheduler import Scheduler
+from sessions import AgentSlot, SessionRegistry, agent_session_bytes, approx_size
+from telemetry import Telemetry
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_approx_size_counts_nested_data_once_and_honours_exclude():
+    shared = "x" * 10_000
+    data = {"a": [shared, shared], "b": ("y" * 100,)}
+    assert approx_size(data) > 10_000
+    assert approx_size(data, exclude={id(shared)}) < 2_000
+
+
+def test_session_bytes_grow_with_history_not_profile(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    empty = agent_session_bytes(agent)
+    assert empty < len(agent.system_prompt)  # shared prompt/profile are excluded
+    agent.scheduler = Scheduler()
+    agent.scheduler.padding = "s" * 50_000
+    assert agent_session_bytes(agent) - empty < 1_000  # so is the process-wide scheduler
+    agent.history = [{"role": "user", "content": "q" * 50_000}]
+    assert agent_session_bytes(agent) - empty >= 50_000
+
+
+def test_idle_slots_are_released_and_rebuilt():
+    clock = Clock()
+    built = []
+    factory = lambda: built.append(object()) or built[-1]
+    registry = SessionRegistry(idle_seconds=60)
+    active = registry.register(AgentSlot(factory, clock=clock))
+    idle = registry.register(AgentSlot(factory, clock=clock))
+    first = idle.get()
+    active.get()
+    clock.now += 120
+    active.touch()
+    assert registry.sweep() == 1
+    assert idle.peek() is None and active.peek() is not None
+    assert registry.stats["evictions"] == 1
+    assert idle.get() is not first and idle.builds == 2
+
+
+def test_registry_forgets_collected_sessions():
+    registry = SessionRegistry()
+    slot = registry.register(AgentSlot(object))
+    assert len(registry.slots()) == 1
+    del slot
+    gc.collect()
+    assert registry.slots() == []
+
+
+def test_report_and_gauges(profile_path):
+    registry = SessionRegistry()
+    slot = registry.register(AgentSlot(lambda: AgenticProfileAgent(profile_path)))
+    slot.get()
+    unbuilt = registry.register(AgentSlot(object))  # held here: the registry is weak
+    was_tracing = tracemalloc.is_tracing()
+    try:
+        registry.report(trace=True)
+        report = registry.report()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    assert report["sessions"] == 2 and report["sessions_resident"] == 1
+    assert report["session_bytes"][unbuilt.session_id] == 0
+    assert report["session_bytes"][slot.session_id] > 0
+    assert report["process_rss_bytes"] > 0
+    assert report["tracemalloc"]["traced_bytes"] >= 0 and report["tracemalloc"]["top"]
+
+    telemetry = Telemetry(jsonl_path=None)
+    telemetry.gauge_sources.append(registry.gauges)
+    text = telemetry.prometheus()
+    assert "profile_agent_sessions 2" in text
+    assert "profile_agent_sessions_resident 1" in text
+
+
+def test_gauges_read_sizes_from_the_last_sweep(monkeypatch, profile_path):
+    import sessions
+
+    registry = SessionRegistry()
+    slot = registry.register(AgentSlot(lambda: AgenticProfileAgent(profile_path)))
+    slot.get().history = [{"role": "user", "content": "q" * 50_000}]
+    assert registry.gauges()["session_bytes_total"] == 0  # not measured yet
+    registry.sweep()
+    measured = registry.gauges()["session_bytes_total"]
+    assert measured >= 50_000
+
+    def changed_during_walk(agent):
+        raise RuntimeError("dictionary changed size during iteration")
+
+    monkeypatch.setattr(sessions, "agent_session_bytes", changed_during_walk)
+    assert registry.gauges()["session_bytes_total"] == measured  # a scrape never walks
+    registry.sweep()  # a failed walk keeps the previous size
+    assert registry.gauges()["session_bytes_total"] == measured
@@ -0,0 +1,142 @@
+"""
+test_singleflight.py
+Unit tests for coalescing identical concurrent first-turn streams into one upstream call.
+"""
+
+import threading
+
+from agent import AgenticProfileAgent
+from singleflight import Flight, FlightGroup, conversation_key
+from tests.conftest import FakeClient, FakeMessageStream, FakeUsage
+
+
+class GatedMessages:
+    """messages.stream that holds its deltas until the test opens the gate."""
+
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+        self.gate = threading.Event()
+        self.calls = []
+
+    def stream(self, **kwargs):
+        self.calls.append(kwargs)
+        messages = self
+
+        class Stream(FakeMessageStream):
+            @property
+            def text_stream(self):
+                messages.gate.wait(5)
+                if messages.error:
+                    raise messages.error
+                return iter(self._deltas)
+
+        return Stream(self.deltas, FakeUsage(input_tokens=900, output_tokens=len(self.deltas)))
+
+
+def _agents(profile_path, messages, count):
+    agents = []
+    for _ in range(count):
+        agent = AgenticProfileAgent(profile_path)
+        agent.client = type("Client", (), {"messages": messages})()
+        agent.flights = FlightGroup()
+        agents.append(agent)
+    shared = agents[0].flights
+    for agent in agents:
+        agent.flights = shared
+    return agents
+
+
+def _run_concurrently(agents, questions):
+    replies = [None] * len(agents)
+
+    def visit(index):
+        replies[index] = "".join(agents[index].chat_stream(questions[index]))
+
+    threads = [threading.Thread(target=visit, args=(i,)) for i in range(len(agents))]
+    for thread in threads:
+        thread.start()
+    return threads, replies
+
+
+def _wait_for_subscribers(group, count):
+    for _ in range(500):
+        flights = list(group._flights.values())
+        if sum(flight.subscribers for flight in flights) >= count:
+            return
+        threading.Event().wait(0.01)
+
+
+def test_follow_replays_then_streams():
+    flight = Flight("k")
+    flight.publish("a")
+    late = flight.follow()
+    assert next(late) == "a"
+    flight.publish("b")
+    flight.finish("ab", None)
+    assert list(late) == ["b"]
+    assert list(flight.follow()) == ["a", "b"]
+
+
+def test_identical_first_turns_share_one_upstream_call(profile_path):
+    messages = GatedMessages(["Reach me at ", "greg@example.com."])
+    agents = _agents(profile_path, messages, 5)
+    questions = ["What's your email?", "what's your  email?"] + ["What's your email?"] * 3
+    threads, replies = _run_concurrently(agents, questions)
+    _wait_for_subscribers(agents[0].flights, 5)
+    messages.gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(messages.calls) == 1
+    assert set(replies) == {"Reach me at greg@example.com."}
+    for agent, question in zip(agents, questions):
+        assert agent.history == [{"role": "user", "content": question},
+                                 {"role": "assistant", "content": "Reach me at greg@example.com."}]
+    modes = sorted(agent.last_metrics["mode"] for agent in agents)
+    assert modes == ["stream"] + ["stream_shared"] * 4
+    assert sum(agent.last_usage["input_tokens"] for agent in agents) == 900
+    assert agents[0].flights.stats == {"flights": 1, "shared": 4}
+    assert len(agents[0].flights) == 0
+
+
+def test_different_questions_do_not_share(profile_path):
+    messages = GatedMessages(["ok"])
+    agents = _agents(profile_path, messages, 2)
+    threads, _ = _run_concurrently(agents, ["Tell me about RAG", "Tell me about graphs"])
+    _wait_for_subscribers(agents[0].flights, 2)
+    messages.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(messages.calls) == 2
+
+
+def test_upstream_error_aborts_every_subscriber(profile_path):
+    messages = GatedMessages([], error=RuntimeError("overloaded"))
+    agents = _agents(profile_path, messages, 3)
+    threads, replies = _run_concurrently(agents, ["hi"] * 3)
+    _wait_for_subscribers(agents[0].flights, 3)
+    messages.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(messages.calls) == 1
+    assert all("overloaded" in reply for reply in replies)
+    assert all(agent.history == [] for agent in agents)
+
+
+def test_later_turns_stream_directly(profile_path):
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = FakeClient(["Second."])
+    agent.flights = FlightGroup()
+    agent.history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello."}]
+    assert "".join(agent.chat_stream("more?")) == "Second."
+    assert agent.flights.stats["flights"] == 0
+
+
+def test_key_ignores_case_and_spacing_but_not_profile():
+    request = {"model": "m", "max_tokens": 1, "system": [{"type": "text", "text": "S"}],
+               "messages": [{"role": "user", "content": "What's  your Email?"}]}
+    variant = dict(request, messages=[{"role": "user", "content": [
+        {"type": "text", "text": "what's your email?", "cache_control": {"type": "ephemeral"}}]}])
+    assert conversation_key("p1", request) == conversation_key("p1", variant)
+    assert conversation_key("p1", request) != conversation_key("p2", request)
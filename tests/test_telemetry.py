@@ -0,0 +1,91 @@
+"""
+test_telemetry.py
+Unit tests for per-turn agent metrics and their Prometheus / JSONL export.
+"""
+
+import json
+import urllib.request
+
+from agent import METRICS_LISTENERS, AgenticProfileAgent
+from telemetry import Telemetry
+
+
+def _agent(profile_path, client):
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = client
+    return agent
+
+
+def test_stream_turn_records_metrics(profile_path, fake_client_factory, fake_usage_factory):
+    usage = fake_usage_factory(input_tokens=50, output_tokens=3, cache_read_input_tokens=4000)
+    agent = _agent(profile_path, fake_client_factory(["Hi", " there", "."], usage=usage))
+    seen = []
+    listener = lambda agent, metrics: seen.append(metrics)
+    METRICS_LISTENERS.append(listener)
+    try:
+        assert "".join(agent.chat_stream("hello")) == "Hi there."
+    finally:
+        METRICS_LISTENERS.remove(listener)
+
+    metrics = agent.last_metrics
+    assert seen == [metrics]
+    assert metrics["mode"] == "stream"
+    assert 0 <= metrics["ttft_seconds"] <= metrics["generation_seconds"]
+    assert metrics["output_tokens"] == 3 and metrics["cache_read_input_tokens"] == 4000
+    assert metrics["output_tokens_per_second"] > 0
+    assert metrics["lead_log_seconds"] == 0.0
+
+
+def test_lead_logging_time_is_measured(profile_path, fake_client_factory):
+    reply = 'Sure.\n[[LEAD_LOG]] {"company": "Acme", "contact_name": null, "contact_email": null}'
+    agent = _agent(profile_path, fake_client_factory([reply]))
+    agent._log_lead = lambda parsed: None
+    agent.chat("hello")
+    assert agent.last_metrics["mode"] == "create"
+    assert agent.last_metrics["ttft_seconds"] is None
+    assert agent.last_metrics["lead_log_seconds"] > 0
+    agent.reset_conversation()
+    assert agent.last_metrics == {}
+
+
+def test_prometheus_text_has_histograms_and_cache_ratio():
+    telemetry = Telemetry(jsonl_path=None)
+    for ttft in (0.3, 0.8, 4.0):
+        telemetry.record({"mode": "stream", "ttft_seconds": ttft, "generation_seconds": 2.0,
+                          "output_tokens_per_second": 50.0, "lead_log_seconds": 0.0,
+                          "input_tokens": 100, "output_tokens": 100,
+                          "cache_read_input_tokens": 300, "cache_creation_input_tokens": 0})
+    text = telemetry.prometheus()
+    assert 'profile_agent_turns_total{mode="stream"} 3' in text
+    assert 'profile_agent_ttft_seconds_bucket{mode="stream",le="0.5"} 1' in text
+    assert 'profile_agent_ttft_seconds_bucket{mode="stream",le="1.0"} 2' in text
+    assert 'profile_agent_ttft_seconds_bucket{mode="stream",le="+Inf"} 3' in text
+    assert 'profile_agent_ttft_seconds_count{mode="stream"} 3' in text
+    assert 'profile_agent_cache_read_input_tokens_total{mode="stream"} 900' in text
+    assert telemetry.cache_hit_ratio() == 0.75
+    assert "profile_agent_cache_hit_ratio 0.75" in text
+
+
+def test_jsonl_export_rotates(tmp_path):
+    path = tmp_path / "turns.jsonl"
+    telemetry = Telemetry(jsonl_path=str(path), max_bytes=400, backups=2)
+    for turn in range(20):
+        telemetry.record({"mode": "stream", "ttft_seconds": 0.5, "turn": turn}, profile="ada")
+    rows = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert rows[-1]["turn"] == 19 and rows[-1]["profile"] == "ada"
+    assert (tmp_path / "turns.jsonl.1").exists()
+    assert not (tmp_path / "turns.jsonl.3").exists()
+
+
+def test_metrics_endpoint():
+    telemetry = Telemetry(jsonl_path=None)
+    telemetry.record({"mode": "create", "generation_seconds": 1.2})
+    server = telemetry.serve(0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert 'profile_agent_turns_total{mode="create"} 1' in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
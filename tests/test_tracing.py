@@ -0,0 +1,127 @@
+"""
+test_tracing.py
+Unit tests for optional tracing spans and their OTLP/JSON export.
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+import tracing
+from agent import AgenticProfileAgent
+from client import reset_shared_client
+from leads import LeadIndex
+from tests.fake_anthropic import FakeAnthropicServer
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure_tracing(str(path))
+    yield path
+    tracing.configure_tracing(None)
+
+
+def _spans(path):
+    spans = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        for resource in json.loads(line)["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    return spans
+
+
+def test_disabled_tracing_is_a_shared_noop():
+    tracing.configure_tracing(None)
+    with tracing.span("anything", key="value") as span:
+        span.set_attribute("more", 1)
+    assert span is tracing.NOOP_SPAN
+    calls = 100_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        with tracing.span("hot.path"):
+            pass
+    assert (time.perf_counter() - start) / calls < 5e-6
+
+
+def test_nested_spans_share_a_trace(trace_file):
+    @tracing.traced()
+    def inner():
+        return 42
+
+    with tracing.span("outer", count=3, ratio=0.5, ok=True):
+        assert inner() == 42
+    outer, = [s for s in _spans(trace_file) if s["name"] == "outer"]
+    inner_span, = [s for s in _spans(trace_file) if s["name"].endswith("inner")]
+    assert inner_span["traceId"] == outer["traceId"]
+    assert inner_span["parentSpanId"] == outer["spanId"]
+    assert "parentSpanId" not in outer
+    assert {"key": "count", "value": {"intValue": "3"}} in outer["attributes"]
+    assert {"key": "ok", "value": {"boolValue": True}} in outer["attributes"]
+    assert int(outer["endTimeUnixNano"]) >= int(inner_span["endTimeUnixNano"])
+
+
+def test_exception_marks_span_as_error(trace_file):
+    with pytest.raises(ValueError):
+        with tracing.span("failing"):
+            raise ValueError("boom")
+    span, = _spans(trace_file)
+    assert span["status"] == {"code": 2, "message": "ValueError: boom"}
+
+
+def test_chat_stream_turn_is_one_trace(trace_file, monkeypatch, profile_path, fake_client_factory):
+    monkeypatch.setenv("GOOGLE_SHEETS_ID", "")
+    monkeypatch.setattr("leads._index", LeadIndex(None))
+    reply = ['Noted.', '\n[[LEAD_LOG]] {"company": "Acme", "contact_name": "Jane", '
+                      '"contact_email": null, "role_title": null, "notes": null}']
+    agent = AgenticProfileAgent(profile_path)
+    agent.client = fake_client_factory(reply)
+    with tracing.span("app.pending_prompt"):
+        assert "".join(agent.chat_stream("hello")).strip() == "Noted."
+
+    spans = {span["name"]: span for span in _spans(trace_file)}
+    assert len({span["traceId"] for span in spans.values()}) == 1
+    parents = {name: span.get("parentSpanId") for name, span in spans.items()}
+    ids = {name: span["spanId"] for name, span in spans.items()}
+    assert parents["agent.chat_stream"] == ids["app.pending_prompt"]
+    assert parents["anthropic.messages.stream"] == ids["agent.chat_stream"]
+    assert parents["agent.finalize"] == ids["agent.chat_stream"]
+    assert parents["agent.log_lead"] == ids["agent.finalize"]
+    assert parents["leads.index_record"] == ids["agent.log_lead"]
+    assert parents["tools.simulate_lead_logging"] == ids["agent.log_lead"]
+    assert [e["name"] for e in spans["anthropic.messages.stream"]["events"]] == ["first_token"]
+    assert {"key": "lead.outcome", "value": {"stringValue": "new"}} in spans["agent.log_lead"]["attributes"]
+
+
+def test_achat_stream_turn_is_one_trace(trace_file, monkeypatch, profile_path):
+    server = FakeAnthropicServer(
+        tokens=["Noted.", '\n[[LEAD_LOG]] {"company": "Acme", "contact_name": "Jane", '
+                          '"contact_email": null, "role_title": null, "notes": null}'],
+    ).start()
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", server.base_url)
+    monkeypatch.setenv("GOOGLE_SHEETS_ID", "")
+    monkeypatch.setattr("leads._index", LeadIndex(None))
+    reset_shared_client()
+    try:
+        agent = AgenticProfileAgent(profile_path)
+
+        async def run():
+            return "".join([chunk async for chunk in agent.achat_stream("hello")])
+
+        assert asyncio.run(run()).strip() == "Noted."
+    finally:
+        reset_shared_client()
+        server.stop()
+
+    spans = {span["name"]: span for span in _spans(trace_file)}
+    assert len({span["traceId"] for span in spans.values()}) == 1
+    parents = {name: span.get("parentSpanId") for name, span in spans.items()}
+    ids = {name: span["spanId"] for name, span in spans.items()}
+    assert parents["anthropic.messages.stream"] == ids["agent.achat_stream"]
+    assert parents["agent.finalize"] == ids["agent.achat_stream"]
+    assert parents["agent.log_lead"] == ids["agent.finalize"]
+    assert [e["name"] for e in spans["anthropic.messages.stream"]["events"]] == ["first_token"]
+    assert any(a["key"] == "usage.output_tokens" for a in spans["agent.achat_stream"]["attributes"])
@@ -0,0 +1,107 @@
+"""
+test_warmer.py
+Unit tests for the prompt-cache keep-alive scheduler (fake clock, fake client).
+"""
+
+from agent import AgenticProfileAgent
+from warmer import CACHE_TTL_SECONDS, WARM_RETRY_BASE_SECONDS, CacheWarmer, parse_windows
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _warmer(profile_path, fake_client_factory, fake_usage_factory, **kwargs):
+    client = fake_client_factory(
+        ["."], usage=fake_usage_factory(input_tokens=1, output_tokens=1,
+                                        cache_read_input_tokens=4096),
+    )
+    clock = Clock()
+    return CacheWarmer(profile_path, client=client, clock=clock, **kwargs), client, clock
+
+
+def test_parse_windows():
+    assert parse_windows("08:00-12:00, 13:30-19:00") == [(480, 720), (810, 1140)]
+    assert parse_windows("") == []
+
+
+def test_warm_request_reuses_agent_system_blocks(profile_path, fake_client_factory, fake_usage_factory):
+    warmer, client, _ = _warmer(profile_path, fake_client_factory, fake_usage_factory)
+    assert warmer.tick() is True
+    request = client.messages.calls[0]
+    assert request["max_tokens"] == 1
+    assert request["system"] == AgenticProfileAgent(profile_path)._system_blocks()
+    assert warmer.report()["warm_requests"] == 1
+
+
+def test_refreshes_before_expiry_only_while_traffic(profile_path, fake_client_factory, fake_usage_factory):
+    warmer, client, clock = _warmer(profile_path, fake_client_factory, fake_usage_factory)
+    agent = AgenticProfileAgent(profile_path)
+    warmer.tick()
+
+    clock.now += CACHE_TTL_SECONDS - 10
+    assert warmer.tick() is False  # no recent traffic: let it lapse
+
+    warmer.observe_turn(agent, {"cache_read_input_tokens": 4096})
+    clock.now += 60
+    assert warmer.tick() is False  # real turn just touched the cache
+    clock.now += CACHE_TTL_SECONDS - 60
+    assert warmer.tick() is True
+    assert len(client.messages.calls) == 2
+
+
+def test_outside_window_does_not_warm(profile_path, fake_client_factory, fake_usage_factory):
+    warmer, client, clock = _warmer(profile_path, fake_client_factory, fake_usage_factory,
+                                    windows=[(0, 0)])
+    agent = AgenticProfileAgent(profile_path)
+    warmer.tick()
+    warmer.observe_turn(agent, {"cache_read_input_tokens": 4096})
+    clock.now += CACHE_TTL_SECONDS
+    assert warmer.tick() is False
+    assert len(client.messages.calls) == 1
+
+
+def test_report_credits_rescued_turns(profile_path, fake_client_factory, fake_usage_factory):
+    warmer, _, clock = _warmer(profile_path, fake_client_factory, fake_usage_factory)
+    agent = AgenticProfileAgent(profile_path)
+    warmer.tick()
+    clock.now += 60
+    warmer.observe_turn(agent, {"cache_read_input_tokens": 4096})
+    clock.now += 60
+    warmer.observe_turn(agent, {"cache_read_input_tokens": 4096})  # traffic kept it hot
+
+    report = warmer.report()
+    assert report["rescued_turns"] == 1
+    assert report["rescued_cache_tokens"] == 4096
+    assert report["warm_cost_usd"] > 0
+    assert report["estimated_ttft_saved_seconds"] > 0
+    assert "net_cost_usd" in report
+
+
+def test_failed_warm_backs_off_instead_of_refiring(profile_path, fake_client_factory, fake_usage_factory):
+    warmer, client, clock = _warmer(profile_path, fake_client_factory, fake_usage_factory)
+
+    def unavailable(**kwargs):
+        client.messages.calls.append(kwargs)
+        raise RuntimeError("API down")
+
+    client.messages.create = unavailable
+    assert warmer.tick() is False
+    assert warmer.tick() is False  # still backing off: no second request
+    assert len(client.messages.calls) == 1
+    assert warmer.seconds_until_due() >= WARM_RETRY_BASE_SECONDS - 1
+    clock.now += WARM_RETRY_BASE_SECONDS
+    warmer.tick()
+    assert len(client.messages.calls) == 2
+    assert warmer.seconds_until_due() >= 2 * WARM_RETRY_BASE_SECONDS - 1  # doubled
+
+
+def test_no_client_never_spins(profile_path):
+    warmer = CacheWarmer(profile_path, clock=Clock())
+    warmer.client = None
+    assert warmer.tick() is False
+    assert warmer.seconds_until_due() > 0